@@ -1,9 +1,34 @@
 import streamlit as st
-import pandas as pd
+import math
+import time
 from datetime import datetime
 
+from app.approval_queue import ApprovalQueue
+from app.commit_queue import CommitQueue
+from app.watcher import MasterlistWatcher
+
 st.set_page_config(page_title="Village Approvals", layout="wide")
 
+
+@st.cache_resource
+def get_queue():
+    queue = ApprovalQueue()
+    queue.import_legacy_files()
+    queue.history.import_legacy_file()
+    return queue
+
+
+@st.cache_resource
+def get_watcher():
+    # Shared in-memory masterlist, so approvals never re-read the workbook
+    return MasterlistWatcher().start()
+
+
+@st.cache_resource
+def get_commit_queue():
+    return CommitQueue(get_watcher()).start()
+
+
 # Load secrets
 admin_user = st.secrets["admin"]["username"]
 admin_pass = st.secrets["admin"]["password"]
@@ -16,47 +41,98 @@ password = st.text_input("Password", type="password")
 if username == admin_user and password == admin_pass:
     st.success("✅ Logged in as admin")
 
-    # Load data
-    try:
-        pending_df = pd.read_excel("pending_villages.xlsx")
-    except FileNotFoundError:
-        st.warning("No pending_villages.xlsx found.")
-        pending_df = pd.DataFrame()
+    queue = get_queue()
+
+    # Throughput counter for this review session
+    if "review_started" not in st.session_state:
+        st.session_state["review_started"] = time.time()
+        st.session_state["reviewed_count"] = 0
+
+    def record_decisions(count):
+        st.session_state["reviewed_count"] += count
+
+    total_pending = queue.count("pending")
 
-    if pending_df.empty:
+    if total_pending == 0:
         st.info("✅ No villages pending approval.")
     else:
-        st.subheader("🕓 Pending Villages")
-        selected = st.multiselect("Select Villages to Approve (by index)", pending_df.index.tolist())
+        st.subheader("🔎 Filter Pending Villages")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            enum_filter = st.selectbox("Enumerator", ["All"] + queue.distinct("enumerator"))
+            prov_filter = st.selectbox("Province", ["All"] + queue.distinct("province"))
+        with col2:
+            dist_filter = st.selectbox("District", ["All"] + queue.distinct("district"))
+            name_filter = st.text_input("Village Name Contains")
+        with col3:
+            coords_filter = st.selectbox("Coordinates", ["Any", "Valid only", "Missing/invalid only"])
+            page_size = st.selectbox("Rows per Page", [50, 200, 1000], index=1)
 
-        st.dataframe(pending_df)
+        filters = {
+            "enumerator": None if enum_filter == "All" else enum_filter,
+            "province": None if prov_filter == "All" else prov_filter,
+            "district": None if dist_filter == "All" else dist_filter,
+            "name_contains": name_filter.strip() or None,
+            "valid_coords": {"Any": None, "Valid only": True, "Missing/invalid only": False}[coords_filter],
+        }
+        matching = queue.count("pending", filters)
+        # Filled in at the end so the numbers include this rerun's decisions
+        metrics_slot = st.container()
 
-        if st.button("✅ Approve Selected"):
-            if selected:
-                approved_rows = pending_df.loc[selected]
+        if matching == 0:
+            st.info("No pending villages match these filters.")
+        else:
+            st.subheader("🕓 Pending Villages")
+            pages = math.ceil(matching / page_size)
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+            page_df = queue.fetch("pending", filters=filters, limit=page_size, offset=(page - 1) * page_size)
 
-                try:
-                    master_df = pd.read_excel("data/village_masterlist.xlsx")
-                except FileNotFoundError:
-                    master_df = pd.DataFrame()
+            selected = st.multiselect("Select Villages on This Page (by id)", page_df.index.tolist())
+            st.dataframe(page_df)
 
-                updated_df = pd.concat([master_df, approved_rows], ignore_index=True)
-                updated_df.to_excel("data/village_masterlist.xlsx", index=False)
+            col_a, col_r = st.columns(2)
+            with col_a:
+                if st.button("✅ Approve Selected"):
+                    if selected:
+                        approved = queue.approve(selected, get_commit_queue().commit)
+                        record_decisions(approved)
+                        st.success(f"✅ Approved and moved {approved} villages to masterlist.")
+                    else:
+                        st.warning("⚠️ Please select at least one village.")
+                if st.button(f"✅ Approve All {matching} Matching"):
+                    approved = queue.bulk_approve(filters, get_commit_queue().commit)
+                    record_decisions(approved)
+                    st.success(f"✅ Approved and moved {approved} villages to masterlist.")
+                    if approved < matching:
+                        st.info(f"ℹ️ {matching - approved} of the {matching} matching villages were already "
+                                "approved or rejected in another session and were left as they were.")
 
-                pending_df.drop(index=selected, inplace=True)
-                pending_df.to_excel("pending_villages.xlsx", index=False)
+            with col_r:
+                if st.button("🗑️ Reject Selected"):
+                    if selected:
+                        rejected = queue.reject(selected, f"Rejected on {datetime.today().strftime('%Y-%m-%d')}")
+                        record_decisions(rejected)
+                        st.warning(f"❌ Marked {rejected} villages as rejected.")
+                    else:
+                        st.warning("⚠️ Please select at least one village.")
+                if st.button(f"🗑️ Reject All {matching} Matching"):
+                    rejected = queue.bulk_reject(filters, f"Rejected on {datetime.today().strftime('%Y-%m-%d')}")
+                    record_decisions(rejected)
+                    st.warning(f"❌ Marked {rejected} villages as rejected.")
 
-                st.success(f"✅ Approved and moved {len(selected)} villages to masterlist.")
-            else:
-                st.warning("⚠️ Please select at least one village.")
+        elapsed_hours = max(time.time() - st.session_state["review_started"], 1) / 3600
+        with metrics_slot:
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Pending", queue.count("pending"))
+            m2.metric("Matching Filter", queue.count("pending", filters))
+            m3.metric("Reviewed This Session", st.session_state["reviewed_count"])
+            m4.metric("Reviews / Hour", f"{st.session_state['reviewed_count'] / elapsed_hours:,.0f}")
 
-        if st.button("🗑️ Reject Selected"):
-            if selected:
-                pending_df.loc[selected, "remarks"] = f"Rejected on {datetime.today().strftime('%Y-%m-%d')}"
-                pending_df.to_excel("pending_villages.xlsx", index=False)
-                st.warning(f"❌ Marked {len(selected)} villages as rejected.")
-            else:
-                st.warning("⚠️ Please select at least one village.")
+    with st.expander("📚 Rejection History"):
+        st.write(f"{queue.history.count()} rejected villages on record. Bulk imports skip these automatically.")
+        if st.button("🧹 Compact History"):
+            removed = queue.history.compact()
+            st.success(f"✅ Removed {removed} duplicate entries.")
 
 else:
     if username or password:
@@ -0,0 +1,7 @@
+# app/__main__.py
+
+import sys
+
+from app.cli import main
+
+sys.exit(main())
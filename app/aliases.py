@@ -0,0 +1,192 @@
+# app/aliases.py
+#
+# Maps free-text province/district/tehsil names from uploads and KML files to the
+# registered names, in tiers:
+#
+#   exact       the name as registered
+#   alias       listed in data/admin_aliases.json ("KPK", "Chaghi", "Dera Ismail Khan");
+#               only other spellings of the same unit, not former or merged units
+#               ("FATA", "Hub"), which stay unresolved so someone decides where they go
+#   normalised  equal after dropping case, accents, punctuation, spaces and words like
+#               "district" ("D.I. Khan" -> "D. I. Khan", "Umerkot" -> "Umer Kot")
+#   fuzzy       closest registered name by difflib ratio >= ALIAS_FUZZY_CUTOFF
+#               (provinces and districts only: tehsils are an open set, and a close
+#               spelling there may be a genuinely new tehsil)
+#
+# A NameResolver caches every answer, and `resolve_frame()` resolves the distinct
+# names of a whole upload once instead of row by row.
+
+import difflib
+import json
+import os
+import re
+import unicodedata
+
+import pandas as pd
+
+from app.config import ALIAS_FUZZY_CUTOFF, ALIASES_PATH
+from app.registry import get_registry
+
+FUZZY_LEVELS = {"province", "district"}
+REPORT_COLUMNS = ["level", "original", "resolved", "match"]
+
+_NOISE = re.compile(r"\b(district|distt|dist|agency|tehsil|taluka|province)\b")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalise(name) -> str:
+    """
+    Comparison key: lower-case ASCII letters and digits only, "&" read as "and".
+    """
+    if name is None or (isinstance(name, float) and name != name):
+        return ""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode().lower()
+    text = _NOISE.sub(" ", text.replace("&", " and "))
+    return _NON_ALNUM.sub("", text)
+
+
+def load_aliases(path=ALIASES_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_SEP = "\x1f"
+
+
+def _resolve_scoped(scope, names, resolve) -> pd.Series:
+    """
+    resolve(scope, name) for each distinct (scope, name) pair, mapped back onto the
+    rows; rows it returns None for keep their name.
+    """
+    keys = scope + _SEP + names
+    resolved = {}
+    for key in keys.unique():
+        parent, name = key.split(_SEP, 1)
+        if name:
+            resolved[key] = resolve(parent, name)
+    return keys.map(resolved).fillna(names)
+
+
+class NameResolver:
+    """
+    Resolves admin unit names against the registry. Create one per upload; its cache and
+    `corrections` cover everything resolved through it.
+    """
+
+    def __init__(self, registry=None, aliases=None, cutoff=ALIAS_FUZZY_CUTOFF):
+        self.registry = registry or get_registry()
+        self.aliases = load_aliases() if aliases is None else aliases
+        self.cutoff = cutoff
+        self.corrections = {}
+        self._cache = {}
+        self._indexes = {}
+
+    def _candidates(self, level, parent):
+        if level == "province":
+            return self.registry.provinces()
+        if level == "district":
+            return self.registry.districts(parent)
+        return {self.registry.name(code): code for code in self.registry.children(parent)}
+
+    def _index(self, level, parent):
+        """
+        (candidates, {normalised name or alias: (registered name, tier)}) for one scope.
+        """
+        key = (level, parent)
+        if key not in self._indexes:
+            candidates = self._candidates(level, parent)
+            index = {normalise(name): (name, "normalised") for name in candidates}
+            for alias, target in self.aliases.get(level, {}).items():
+                if target in candidates:
+                    index.setdefault(normalise(alias), (target, "alias"))
+            self._indexes[key] = (candidates, index)
+        return self._indexes[key]
+
+    def _match(self, level, name, parent=None):
+        """
+        Returns (registered name, tier), or (None, None) if nothing matches.
+        """
+        key = (level, parent, name)
+        if key in self._cache:
+            return self._cache[key]
+        candidates, index = self._index(level, parent)
+        result = (None, None)
+        if name in candidates:
+            result = (name, "exact")
+        elif name in self.aliases.get(level, {}) and self.aliases[level][name] in candidates:
+            result = (self.aliases[level][name], "alias")
+        else:
+            norm = normalise(name)
+            if norm in index:
+                result = index[norm]
+            elif norm and level in FUZZY_LEVELS:
+                close = difflib.get_close_matches(norm, list(index), n=1, cutoff=self.cutoff)
+                if close:
+                    result = (index[close[0]][0], "fuzzy")
+        self._cache[key] = result
+        if name and result[1] != "exact":
+            self.corrections[(level, name)] = result
+        return result
+
+    def province(self, name):
+        return self._match("province", name)[0]
+
+    def district(self, name, province=None):
+        """
+        Registered district name; searched within `province` (a registered province
+        name) when given, else across all provinces.
+        """
+        return self._match("district", name, self.registry.code(province) if province else None)[0]
+
+    def tehsil(self, name, district_pcode):
+        return self._match("tehsil", name, district_pcode)[0]
+
+    def uc(self, name, tehsil_pcode):
+        return self._match("uc", name, tehsil_pcode)[0]
+
+    def resolve_frame(self, frame, columns=("province", "district", "tehsil")) -> pd.DataFrame:
+        """
+        Returns a copy of an upload with province/district/tehsil names replaced by their
+        registered form. Names that match nothing are kept as given, so the importer can
+        still report them (or create a new tehsil).
+        """
+        province_col, district_col, tehsil_col = columns
+        out = frame.copy()
+        present = [c for c in columns if c in out.columns]
+        if not present:
+            return out
+        text = {c: out[c].fillna("").astype(str).str.strip() for c in present}
+
+        if province_col in text:
+            provinces = {p: self.province(p) for p in text[province_col].unique() if p}
+            text[province_col] = text[province_col].map(provinces).fillna(text[province_col])
+            out[province_col] = text[province_col]
+
+        if district_col in text:
+            scope = text.get(province_col, pd.Series("", index=out.index))
+            text[district_col] = _resolve_scoped(
+                scope, text[district_col], lambda p, d: self.district(d, p if self.registry.code(p) else None)
+            )
+            out[district_col] = text[district_col]
+
+            if tehsil_col in text:
+                out[tehsil_col] = _resolve_scoped(
+                    text[district_col], text[tehsil_col],
+                    lambda d, t: self.tehsil(t, self.registry.district_code(d)) if self.registry.district_code(d) else None,
+                )
+        return out
+
+    def report(self) -> pd.DataFrame:
+        """
+        Every name that was not an exact match: what it became and by which tier
+        (resolved is empty and match is "not found", or "new" for a tehsil or UC, when
+        nothing matched).
+        """
+        rows = [
+            {"level": level, "original": name, "resolved": resolved or "",
+             "match": tier or ("not found" if level in FUZZY_LEVELS else "new")}
+            for (level, name), (resolved, tier) in self.corrections.items()
+        ]
+        return pd.DataFrame(rows, columns=REPORT_COLUMNS)
@@ -0,0 +1,371 @@
+# app/api.py
+#
+# Small local JSON API so survey tools can look up and allocate P-codes without
+# copying the masterlist around. Built on asyncio from the standard library:
+#
+#   python -m app.api [--host 127.0.0.1] [--port 8765]
+#
+#   GET  /health
+#   GET  /metrics        Prometheus text format (see app/metrics.py)
+#   GET  /villages/<village_pcode>
+#   GET  /search?q=<name>&district=<district>&uc_prefix=<uc_prefix>&limit=50
+#   POST /reservations   {"uc_prefix": "...", "count": 3}
+#   POST /villages       {"villages": [{"uc_prefix": "...", "village_name": "...",
+#                                       "latitude": 24.7, "longitude": 67.9,
+#                                       "village_pcode_new": "<reserved code, optional>"}]}
+#
+# Reads are answered from an in-memory index of the shared masterlist frame. Inserts
+# go through the masterlist CommitQueue, which applies everything waiting in the queue
+# as one batch and saves the workbook once per batch.
+#
+# Reservations are code leases (app/leases.py) held by the team "API", so the app, the
+# admin panel and the CLI allocate above them like above any field team's lease.
+
+import argparse
+import asyncio
+import functools
+import json
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+from app.approval_queue import LAT_RANGE, LON_RANGE
+from app.config import ALLOCATION_POLICY, API_HOST, API_PORT, MASTERLIST_PATH, RESERVATION_TTL
+from app.code_generator import generate_village_code, generate_village_codes
+from app.commit_queue import CommitQueue
+from app.leases import LeaseStore, lease_codes
+from app.metrics import CONTENT_TYPE, counter, histogram, render
+from app.updater import add_new_village, append_villages
+from app.watcher import MasterlistWatcher
+
+SEARCH_FIELDS = ["province", "district", "tehsil", "uc", "uc_prefix"]
+MAX_SEARCH_RESULTS = 1000
+MAX_RESERVATION = 999
+RESERVATION_TEAM = "API"
+ROUTES = ("health", "metrics", "search", "villages", "reservations")
+
+REQUESTS = counter("api_requests_total", "API requests, by method, route and status", ["method", "route", "status"])
+REQUEST_SECONDS = histogram("api_request_seconds", "API request handling time, by route", ["route"])
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _record(row) -> dict:
+    return {k: (None if pd.isna(v) else v) for k, v in row.items()}
+
+
+class VillageIndex:
+    """
+    P-code -> row position, first row per UC and normalised names for search.
+    Rebuilt as one unit on every frame swap, so readers never see a half-updated index.
+    """
+
+    def __init__(self):
+        self.state = None
+
+    def refresh(self, df, ucs=None):
+        codes = df["village_pcode_new"].fillna("").astype(str)
+        uc_first = df["uc_prefix"].dropna().astype(str).drop_duplicates()
+        names = (df["village_name"].fillna("").astype(str)
+                 .str.replace(r"\s+", " ", regex=True).str.strip().str.casefold())
+        self.state = {
+            "frame": df,
+            "by_pcode": dict(zip(codes, range(len(df)))),
+            "uc_rows": dict(zip(uc_first, df.index.get_indexer(uc_first.index))),
+            "names": names,
+        }
+
+
+class VillageService:
+    """
+    Request handling for the API, independent of the socket layer so it can be
+    exercised directly: `await service.handle("GET", "/villages/PK...")`.
+    """
+
+    def __init__(self, file_path=MASTERLIST_PATH, watcher=None, commit_queue=None, leases=None,
+                 reservation_ttl=RESERVATION_TTL):
+        self.file_path = file_path
+        self.watcher = watcher or MasterlistWatcher(file_path)
+        self.commit_queue = commit_queue or CommitQueue(self.watcher)
+        self.leases = leases or LeaseStore()
+        self.index = VillageIndex()
+        self.reservation_ttl = reservation_ttl
+
+    # ---- lifecycle ----
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.watcher.check)
+        self.watcher.add_listener(self.index.refresh)
+        self.watcher.start()
+        self.commit_queue.start()
+
+    async def stop(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.commit_queue.stop)
+        self.watcher.stop()
+
+    # ---- reads ----
+
+    def lookup(self, pcode):
+        state = self.index.state
+        pos = state["by_pcode"].get(pcode)
+        if pos is None:
+            raise ApiError(404, f"Village P-code '{pcode}' not found.")
+        return _record(state["frame"].iloc[pos].to_dict())
+
+    def search(self, params):
+        state = self.index.state
+        df, mask = state["frame"], None
+        query = " ".join(params.get("q", "").split()).casefold()
+        if query:
+            mask = state["names"].str.contains(query, regex=False)
+        for field in SEARCH_FIELDS:
+            if params.get(field):
+                field_mask = df[field] == params[field]
+                mask = field_mask if mask is None else mask & field_mask
+        if mask is None:
+            raise ApiError(400, f"Give 'q' or one of: {', '.join(SEARCH_FIELDS)}.")
+        try:
+            limit = min(int(params.get("limit", 50)), MAX_SEARCH_RESULTS)
+        except ValueError:
+            raise ApiError(400, "'limit' must be an integer.")
+        matches = df[mask.to_numpy()]
+        return {"total": len(matches), "villages": [_record(r) for r in matches.head(limit).to_dict("records")]}
+
+    # ---- reservations ----
+
+    async def reserve(self, uc_prefix, count):
+        if uc_prefix not in self.index.state["uc_rows"]:
+            raise ApiError(404, f"UC prefix '{uc_prefix}' not found.")
+        if not 1 <= count <= MAX_RESERVATION:
+            raise ApiError(400, f"'count' must be between 1 and {MAX_RESERVATION}.")
+
+        def create_lease(frame):
+            # Taken inside the writer so no concurrent allocation can use the block
+            current_max = int(generate_village_code(frame, uc_prefix)[len(uc_prefix):]) - 1
+            try:
+                lease = self.leases.create(RESERVATION_TEAM, uc_prefix, count, current_max,
+                                           self.reservation_ttl / 86400)
+            except ValueError as exc:
+                raise ApiError(400, str(exc))
+            return None, lease
+
+        lease = await asyncio.wrap_future(self.commit_queue.submit(create_lease))
+        return {"uc_prefix": uc_prefix, "codes": lease_codes(lease), "expires_at": lease["expires_at"],
+                "lease_id": lease["id"]}
+
+    # ---- writes ----
+
+    def _validate_village(self, item):
+        if not isinstance(item, dict):
+            raise ApiError(400, "Each village must be a JSON object.")
+        uc_prefix = str(item.get("uc_prefix") or "").strip()
+        name = str(item.get("village_name") or "").strip()
+        if not uc_prefix or not name:
+            raise ApiError(400, "'uc_prefix' and 'village_name' are required.")
+        if uc_prefix not in self.index.state["uc_rows"]:
+            raise ApiError(404, f"UC prefix '{uc_prefix}' not found.")
+        code = str(item.get("village_pcode_new") or "").strip() or None
+        if code and not code.startswith(uc_prefix):
+            raise ApiError(400, f"'{code}' is not a code under {uc_prefix}.")
+        lat, lon = item.get("latitude"), item.get("longitude")
+        if lat not in (None, "") or lon not in (None, ""):
+            try:
+                lat, lon = float(lat), float(lon)
+            except (TypeError, ValueError):
+                raise ApiError(400, f"Invalid lat/lon for '{name}'.")
+            if not (LAT_RANGE[0] <= lat <= LAT_RANGE[1] and LON_RANGE[0] <= lon <= LON_RANGE[1]):
+                raise ApiError(400, f"Coordinates for '{name}' are outside Pakistan.")
+            lat, lon = f"{lat:.6f}", f"{lon:.6f}"
+        else:
+            lat = lon = ""
+        return {"uc_prefix": uc_prefix, "village_name": name, "village_pcode_new": code,
+                "latitude": lat, "longitude": lon,
+                "enumerator": str(item.get("enumerator") or ""), "remarks": item.get("remarks")}
+
+    async def insert(self, items):
+        if not isinstance(items, list) or not items:
+            raise ApiError(400, "'villages' must be a non-empty list.")
+        villages = [self._validate_village(item) for item in items]
+        future = self.commit_queue.submit(functools.partial(self._insert, villages=villages))
+        return {"villages": await asyncio.wrap_future(future)}
+
+    def _insert(self, frame, villages):
+        """
+        Commit-queue mutation: allocates codes for `villages` against the latest frame.
+        Given codes must come from an active API reservation and not be in the masterlist
+        yet; new codes start above every active lease, as in the app.
+        """
+        today = datetime.today().strftime("%Y-%m-%d")
+        taken = set(frame["village_pcode_new"].dropna().astype(str))
+
+        # Validated against the index, but the UC may have gone since (e.g. an outside edit)
+        templates = {}
+        for uc_prefix in dict.fromkeys(v["uc_prefix"] for v in villages):
+            in_uc = frame.index[frame["uc_prefix"] == uc_prefix]
+            if in_uc.empty:
+                raise ApiError(409, f"UC prefix '{uc_prefix}' is no longer in the masterlist.")
+            templates[uc_prefix] = frame.loc[in_uc[:1]]
+        reservations = {}
+        for lease in self.leases.active(team=RESERVATION_TEAM):
+            reservations.update(dict.fromkeys(lease_codes(lease), lease["id"]))
+
+        new_codes = {}
+        for v in villages:
+            if not v["village_pcode_new"]:
+                new_codes[v["uc_prefix"]] = new_codes.get(v["uc_prefix"], 0) + 1
+        for uc_prefix, count in new_codes.items():
+            try:
+                new_codes[uc_prefix] = iter(generate_village_codes(
+                    frame, uc_prefix, count, self.leases.reserved_max(uc_prefix),
+                    ALLOCATION_POLICY, self.leases.leased_suffixes(uc_prefix)
+                ))
+            except ValueError as exc:
+                raise ApiError(400, str(exc))
+
+        rows, assigned, used = [], [], []
+        for v in villages:
+            uc_prefix, code = v["uc_prefix"], v["village_pcode_new"]
+            if code:
+                if code not in reservations:
+                    raise ApiError(400, f"'{code}' is not a current reservation for {uc_prefix}.")
+                if code in taken:
+                    raise ApiError(400, f"'{code}' has already been used.")
+                used.append((reservations[code], code))
+            else:
+                code = next(new_codes[uc_prefix])
+            taken.add(code)
+
+            row = add_new_village(templates[uc_prefix], uc_prefix, v["village_name"], code)
+            row.update(latitude=v["latitude"], longitude=v["longitude"], enumerator=v["enumerator"],
+                       remarks=v["remarks"] or f"added via API on {today}")
+            rows.append(row)
+            assigned.append({"village_name": v["village_name"], "village_pcode_new": code})
+        # Recorded before the save, so a reserved code can never be in the workbook while
+        # its lease still counts it as free
+        self.leases.mark_used(used)
+        return append_villages(frame, rows), assigned
+
+    # ---- routing ----
+
+    async def handle(self, method, target, body=b""):
+        """
+        Returns (status, payload) for one request. The payload is a dict for JSON
+        responses and a str for the /metrics text.
+        """
+        start = time.perf_counter()
+        status, payload = await self._dispatch(method, target, body)
+        route = urlsplit(target).path.strip("/").split("/")[0]
+        route = route if route in ROUTES else "other"
+        REQUESTS.labels(method, route, status).inc()
+        REQUEST_SECONDS.labels(route).observe(time.perf_counter() - start)
+        return status, payload
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        # Segments are percent-decoded, so codes and names with spaces or non-ASCII match
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ApiError(400, "Request body must be a JSON object.")
+            if parts == ["health"] and method == "GET":
+                return 200, {"status": "ok", "rows": len(self.index.state["frame"]), "version": self.watcher.version}
+            if parts == ["metrics"] and method == "GET":
+                return 200, render()
+            if parts == ["search"] and method == "GET":
+                # pandas filtering over the whole frame; kept off the event loop
+                loop = asyncio.get_running_loop()
+                return 200, await loop.run_in_executor(None, self.search, params)
+            if len(parts) == 2 and parts[0] == "villages" and method == "GET":
+                return 200, self.lookup(parts[1])
+            if parts == ["villages"] and method == "POST":
+                return 201, await self.insert(data.get("villages"))
+            if parts == ["reservations"] and method == "POST":
+                try:
+                    count = int(data.get("count", 1))
+                except (TypeError, ValueError):
+                    raise ApiError(400, "'count' must be an integer.")
+                return 201, await self.reserve(str(data.get("uc_prefix") or "").strip(), count)
+            if parts and parts[0] in ROUTES:
+                raise ApiError(405, f"{method} is not supported on {url.path}.")
+            raise ApiError(404, f"No route for {url.path}.")
+        except json.JSONDecodeError:
+            return 400, {"error": "Request body is not valid JSON."}
+        except ApiError as exc:
+            return exc.status, {"error": str(exc)}
+        except Exception as exc:
+            return 500, {"error": str(exc)}
+
+    # ---- HTTP ----
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+
+                status, payload = await self.handle(method.upper(), target, body)
+                if isinstance(payload, str):
+                    content_type, data = CONTENT_TYPE, payload.encode("utf-8")
+                else:
+                    content_type, data = "application/json", json.dumps(payload, default=str).encode("utf-8")
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=API_HOST, port=API_PORT):
+        await self.start()
+        server = await asyncio.start_server(self._connection, host, port)
+        print(f"🌐 Serving {self.file_path} on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local JSON API for village codes")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--file", default=MASTERLIST_PATH, help="Masterlist workbook")
+    args = parser.parse_args()
+    try:
+        asyncio.run(VillageService(args.file).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# app/approval_queue.py
+#
+# Pending village submissions live in a local SQLite database instead of an xlsx file.
+# Every submission is one row keyed by an integer id, so approving or rejecting is an
+# indexed UPDATE rather than a rewrite of the whole pending file.
+#
+# Approval claims rows before merging them: one UPDATE moves them from "pending" to
+# "approving" (tagged with a claim token in `note`), and only the rows that UPDATE
+# changed are appended to the masterlist. A second admin session or a double click
+# therefore finds nothing left to claim instead of appending the same villages twice.
+# Claims are timed: rows a crashed process left in "approving" go back to "pending"
+# once their claim is older than APPROVAL_CLAIM_TIMEOUT, checked when a store opens.
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from app.config import APPROVAL_CLAIM_TIMEOUT, APPROVAL_DB_PATH, LEGACY_PENDING_PATHS
+from app.rejections import RejectionHistory
+from app.updater import append_villages
+
+STATUSES = ("pending", "approving", "approved", "rejected")
+
+# Row fields copied into real columns so they can be indexed and filtered in SQL
+INDEXED_FIELDS = ["enumerator", "province", "district", "tehsil", "uc", "uc_prefix", "village_name"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    submitted_at TEXT NOT NULL,
+    decided_at TEXT,
+    note TEXT,
+    enumerator TEXT,
+    province TEXT,
+    district TEXT,
+    tehsil TEXT,
+    uc TEXT,
+    uc_prefix TEXT,
+    village_name TEXT,
+    latitude REAL,
+    longitude REAL,
+    payload TEXT NOT NULL,
+    claimed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_status ON submissions (status, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_filter ON submissions (status, district, enumerator);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+# Same bounds the Add Village and Bulk Import tabs enforce
+LAT_RANGE = (23, 37)
+LON_RANGE = (60, 77)
+
+
+def build_filter(enumerator=None, province=None, district=None, tehsil=None, uc=None,
+                 name_contains=None, valid_coords=None):
+    """
+    Turns filter arguments into one SQL predicate and its parameters, so a bulk action
+    is evaluated by SQLite in a single statement. None means "don't filter".
+    """
+    clauses, params = [], []
+    for field, value in (("enumerator", enumerator), ("province", province), ("district", district),
+                         ("tehsil", tehsil), ("uc", uc)):
+        if value:
+            clauses.append(f"{field} = ?")
+            params.append(value)
+    if name_contains:
+        clauses.append("village_name LIKE ? ESCAPE '\\'")
+        escaped = name_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.append(f"%{escaped}%")
+    coords_ok = "(latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?)"
+    if valid_coords is True:
+        clauses.append(coords_ok)
+        params += [*LAT_RANGE, *LON_RANGE]
+    elif valid_coords is False:
+        clauses.append(f"NOT COALESCE({coords_ok}, 0)")
+        params += [*LAT_RANGE, *LON_RANGE]
+    return " AND ".join(clauses) or "1", params
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and value != value) or value is pd.NA:
+        return None
+    return value
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ApprovalQueue:
+    """
+    SQLite-backed queue of village submissions with pending/approved/rejected status.
+    """
+
+    def __init__(self, db_path=APPROVAL_DB_PATH, claim_timeout=APPROVAL_CLAIM_TIMEOUT):
+        if sqlite3.sqlite_version_info < (3, 35, 0):
+            # Claims and rejections use UPDATE ... RETURNING
+            raise RuntimeError(f"The approval queue needs SQLite 3.35 or newer; this Python has {sqlite3.sqlite_version}.")
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(submissions)")}
+        if "claimed_at" not in columns:  # databases created before claims were timed
+            self._conn.execute("ALTER TABLE submissions ADD COLUMN claimed_at TEXT")
+        self._lock = threading.Lock()
+        # Same connection, same lock: history writes and VACUUM never overlap a queue transaction
+        self.history = RejectionHistory(conn=self._conn, lock=self._lock)
+        self.release_stale_claims(claim_timeout)
+
+    def submit(self, rows) -> list:
+        """
+        Queues new submissions (dicts or a DataFrame) and returns their ids.
+        """
+        records = rows.to_dict("records") if isinstance(rows, pd.DataFrame) else list(rows)
+        now = datetime.now().isoformat(timespec="seconds")
+        ids = []
+        with self._lock, self._conn:
+            for record in records:
+                record = {k: _clean(v) for k, v in record.items()}
+                cur = self._conn.execute(
+                    f"INSERT INTO submissions (submitted_at, {', '.join(INDEXED_FIELDS)}, latitude, longitude, payload) "
+                    f"VALUES (?, {', '.join('?' for _ in INDEXED_FIELDS)}, ?, ?, ?)",
+                    [now] + [record.get(f) for f in INDEXED_FIELDS]
+                    + [_to_float(record.get("latitude")), _to_float(record.get("longitude")), json.dumps(record, default=str)],
+                )
+                ids.append(cur.lastrowid)
+        return ids
+
+    def import_legacy_files(self, paths=LEGACY_PENDING_PATHS) -> int:
+        """
+        One-time migration of the old pending xlsx files into the queue.
+        """
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return 0
+        imported = 0
+        for path in paths:
+            if os.path.exists(path):
+                legacy = pd.read_excel(path, dtype=str)
+                if "remarks" in legacy.columns:
+                    legacy = legacy[~legacy["remarks"].fillna("").str.startswith("Rejected on")]
+                imported += len(self.submit(legacy))
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)",
+                               (datetime.now().isoformat(timespec="seconds"),))
+        return imported
+
+    def count(self, status="pending", filters=None) -> int:
+        where, params = build_filter(**(filters or {}))
+        return self._conn.execute(
+            f"SELECT COUNT(*) FROM submissions WHERE status = ? AND {where}", [status] + params
+        ).fetchone()[0]
+
+    def distinct(self, field, status="pending") -> list:
+        """
+        Distinct non-empty values of an indexed field, for filter dropdowns.
+        """
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"'{field}' is not a filterable field.")
+        rows = self._conn.execute(
+            f"SELECT DISTINCT {field} FROM submissions WHERE status = ? AND {field} IS NOT NULL AND {field} != '' ORDER BY {field}",
+            (status,),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def fetch(self, status="pending", ids=None, limit=None, offset=0, filters=None) -> pd.DataFrame:
+        """
+        Returns submissions as a DataFrame indexed by submission id.
+        """
+        where, params = build_filter(**(filters or {}))
+        sql = f"SELECT id, payload FROM submissions WHERE status = ? AND {where}"
+        params = [status] + params
+        if ids is not None:
+            ids = [int(i) for i in ids]
+            sql += f" AND id IN ({', '.join('?' for _ in ids)})"
+            params += ids
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [int(limit), int(offset)]
+        return self._frame(self._conn.execute(sql, params).fetchall())
+
+    @staticmethod
+    def _frame(rows) -> pd.DataFrame:
+        df = pd.DataFrame([json.loads(payload) for _, payload in rows], index=[i for i, _ in rows])
+        df.index.name = "id"
+        return df
+
+    def set_status(self, ids, status, note=None) -> int:
+        """
+        Moves pending submissions to `status`. Returns how many rows changed.
+        """
+        if status not in STATUSES:
+            raise ValueError(f"Unknown status '{status}'.")
+        ids = [int(i) for i in ids]
+        if not ids:
+            return 0
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            cur = self._conn.executemany(
+                "UPDATE submissions SET status = ?, decided_at = ?, note = ? WHERE id = ? AND status = 'pending'",
+                [(status, now, note, i) for i in ids],
+            )
+        return cur.rowcount
+
+    def _claim(self, where, params):
+        """
+        Moves the pending rows matching `where` to "approving" in one UPDATE and returns
+        (claim token, claimed rows). Rows another session already claimed or decided
+        are not matched.
+        """
+        token = uuid.uuid4().hex
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f"UPDATE submissions SET status = 'approving', note = ?, claimed_at = ? WHERE status = 'pending' AND {where} "
+                "RETURNING id, payload",
+                [token, now] + params,
+            ).fetchall()
+        return token, self._frame(sorted(rows))
+
+    def _release(self, token, status):
+        decided_at = datetime.now().isoformat(timespec="seconds") if status != "pending" else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE submissions SET status = ?, decided_at = ?, note = NULL, claimed_at = NULL "
+                "WHERE status = 'approving' AND note = ?",
+                (status, decided_at, token),
+            )
+
+    def release_stale_claims(self, timeout=APPROVAL_CLAIM_TIMEOUT) -> int:
+        """
+        Returns rows claimed more than `timeout` seconds ago (by a process that died
+        before releasing them) to pending. Returns how many were released.
+        """
+        cutoff = (datetime.now() - timedelta(seconds=timeout)).isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE submissions SET status = 'pending', note = NULL, claimed_at = NULL "
+                "WHERE status = 'approving' AND (claimed_at IS NULL OR claimed_at <= ?)",
+                (cutoff,),
+            )
+        return cur.rowcount
+
+    def _merge(self, where, params, commit) -> int:
+        token, claimed = self._claim(where, params)
+        if claimed.empty:
+            return 0
+        rows = claimed.reset_index(drop=True)
+        try:
+            commit(lambda frame: (append_villages(frame, rows), None))
+        except BaseException:
+            # Nothing was saved; the rows go back to pending for the next attempt
+            self._release(token, "pending")
+            raise
+        self._release(token, "approved")
+        return len(claimed)
+
+    def approve(self, ids, commit) -> int:
+        """
+        Claims the selected pending rows, appends them to the masterlist in one batch
+        through `commit` (CommitQueue.commit) and, once saved, marks them approved.
+        Returns the number approved, which leaves out rows already claimed or decided.
+        """
+        ids = [int(i) for i in ids]
+        if not ids:
+            return 0
+        return self._merge(f"id IN ({', '.join('?' for _ in ids)})", ids, commit)
+
+    def bulk_approve(self, filters, commit) -> int:
+        """
+        Approves every pending submission matching `filters` in one append and one save.
+        The filter is evaluated by the claiming UPDATE itself, so rows rejected or
+        approved meanwhile by another session are left alone. Returns the number claimed.
+        """
+        where, params = build_filter(**(filters or {}))
+        return self._merge(where, params, commit)
+
+    def _reject(self, where, params, note):
+        """
+        Rejects the pending rows matching `where` in one UPDATE and records exactly the
+        rows it changed in the rejection history.
+        """
+        note = note or f"Rejected on {datetime.today().strftime('%Y-%m-%d')}"
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f"UPDATE submissions SET status = 'rejected', decided_at = ?, note = ? WHERE status = 'pending' AND {where} "
+                "RETURNING id, payload",
+                [now, note] + params,
+            ).fetchall()
+        rejected = self._frame(sorted(rows))
+        self.history.append(rejected, note)
+        return len(rejected)
+
+    def bulk_reject(self, filters, note=None) -> int:
+        """
+        Rejects every pending submission matching `filters` with a single UPDATE and
+        records them in the rejection history.
+        """
+        where, params = build_filter(**(filters or {}))
+        return self._reject(where, params, note)
+
+    def reject(self, ids, note=None) -> int:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return 0
+        return self._reject(f"id IN ({', '.join('?' for _ in ids)})", ids, note)
@@ -0,0 +1,240 @@
+# app/boundaries.py
+#
+# UC boundary polygons, kept as shapely geometries keyed by uc_prefix. Boundaries come
+# from the polygon placemarks of KML uploads (Tab 7) and are stored as WKB in the same
+# SQLite database as the approval queue and leases, so they survive restarts and every
+# session sees them.
+#
+# The store keeps an STRtree of all polygons for point-in-polygon lookups, rebuilt only
+# when the table changes. It powers:
+#   locate()          uc_prefix of the polygon containing each point
+#   outside_mask()    villages whose coordinates are outside their own UC's polygon
+#   to_geojson()      the UC boundary layer of the map tab
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import STRtree
+from shapely.geometry import MultiPolygon, Polygon
+
+from app.aliases import NameResolver
+from app.config import APPROVAL_DB_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uc_boundaries (
+    uc_prefix TEXT PRIMARY KEY,
+    name TEXT,
+    source TEXT,
+    geometry BLOB NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+# A boundary is matched to the UC most of the villages inside it belong to, if at
+# least this share of them agree
+VILLAGE_MAJORITY = 0.5
+
+
+def boundary_geometry(boundary):
+    """
+    Shapely (Multi)Polygon for a boundary dict from app.kml_parser.parse_kml, or None
+    for lines and degenerate rings.
+    """
+    polygons = []
+    for outer, *holes in boundary.get("Polygons", []):
+        if len(outer) < 4:
+            continue
+        polygon = Polygon(outer, [h for h in holes if len(h) >= 4])
+        if not polygon.is_valid:
+            polygon = shapely.make_valid(polygon)
+        polygons.extend(getattr(polygon, "geoms", [polygon]))
+    polygons = [p for p in polygons if isinstance(p, Polygon) and not p.is_empty]
+    if not polygons:
+        return None
+    return polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+
+
+def _coords(df):
+    lat = pd.to_numeric(df["latitude"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(df["longitude"], errors="coerce").to_numpy(dtype=float)
+    return lat, lon
+
+
+def match_boundaries(boundaries, df, resolver=None) -> list:
+    """
+    Finds the uc_prefix of each KML boundary. The placemark's admin names (its UC field,
+    or its name) are resolved through the registry first; otherwise the UC that most
+    masterlist villages inside the polygon belong to is used.
+    Returns one dict per polygon boundary: name, uc_prefix ("" if unmatched), method,
+    villages_inside, geometry.
+    """
+    resolver = resolver or NameResolver()
+    registry = resolver.registry
+    lat, lon = _coords(df)
+    has_coords = ~(np.isnan(lat) | np.isnan(lon))
+    ucs = df["uc_prefix"].fillna("").astype(str).to_numpy()
+
+    matches = []
+    for boundary in boundaries:
+        geometry = boundary_geometry(boundary)
+        if geometry is None:
+            continue
+        uc_prefix, method = "", ""
+
+        province = resolver.province(boundary.get("Province", ""))
+        district = resolver.district(boundary.get("District", ""), province) if province else None
+        district_pcode = registry.district_code(district) if district else None
+        tehsil = resolver.tehsil(boundary.get("Tehsil", ""), district_pcode) if district_pcode else None
+        tehsil_pcode = registry.code(tehsil, district_pcode) if tehsil else None
+        if tehsil_pcode:
+            for candidate in (boundary.get("UC", ""), boundary.get("Name", "")):
+                uc = resolver.uc(candidate, tehsil_pcode) if candidate else None
+                if uc:
+                    uc_prefix, method = registry.code(uc, tehsil_pcode), "names"
+                    break
+
+        minx, miny, maxx, maxy = geometry.bounds
+        near = has_coords & (lon >= minx) & (lon <= maxx) & (lat >= miny) & (lat <= maxy)
+        inside = np.flatnonzero(near)[shapely.contains_xy(geometry, lon[near], lat[near])]
+        if not uc_prefix and len(inside):
+            counts = pd.Series(ucs[inside]).value_counts()
+            if counts.index[0] and counts.iloc[0] / len(inside) >= VILLAGE_MAJORITY:
+                uc_prefix, method = counts.index[0], "villages"
+
+        matches.append({
+            "name": boundary.get("Name", ""),
+            "uc_prefix": uc_prefix,
+            "method": method,
+            "villages_inside": len(inside),
+            "source": boundary.get("File", ""),
+            "geometry": geometry,
+        })
+    return matches
+
+
+class BoundaryStore:
+    """
+    Persistent UC polygons with a lazily rebuilt STRtree.
+    """
+
+    def __init__(self, db_path=APPROVAL_DB_PATH, conn=None):
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+        self._conn = conn
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._cache = None
+        self._writes = 0
+
+    def _data_version(self):
+        # Changes when another connection commits; our own writes reset the cache
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _load(self):
+        """
+        (uc_prefixes, names, geometries, STRtree), reloaded when the table changed.
+        """
+        with self._lock:
+            version = self._data_version()
+            if self._cache is None or self._loaded != version:
+                rows = self._conn.execute("SELECT uc_prefix, name, geometry FROM uc_boundaries ORDER BY uc_prefix").fetchall()
+                prefixes = np.array([r[0] for r in rows], dtype=object)
+                names = np.array([r[1] or "" for r in rows], dtype=object)
+                geometries = shapely.from_wkb([r[2] for r in rows]) if rows else np.array([], dtype=object)
+                shapely.prepare(geometries)
+                self._cache = (prefixes, names, geometries, STRtree(geometries))
+                self._loaded = version
+            return self._cache
+
+    @property
+    def version(self):
+        """
+        Changes whenever the stored boundaries change (for cache keys).
+        """
+        return (self._data_version(), self._writes)
+
+    def __len__(self):
+        return len(self._load()[0])
+
+    def save(self, matches) -> int:
+        """
+        Stores matched boundaries (dicts from match_boundaries with a uc_prefix),
+        replacing any earlier polygon of the same UC.
+        """
+        rows = [
+            (m["uc_prefix"], m.get("name", ""), m.get("source", ""), shapely.to_wkb(m["geometry"]),
+             datetime.now().isoformat(timespec="seconds"))
+            for m in matches if m.get("uc_prefix")
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO uc_boundaries (uc_prefix, name, source, geometry, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)", rows,
+            )
+            self._cache = None
+            self._writes += 1
+        return len(rows)
+
+    def delete(self, uc_prefix) -> bool:
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM uc_boundaries WHERE uc_prefix = ?", (uc_prefix,))
+            self._cache = None
+            self._writes += 1
+        return cur.rowcount > 0
+
+    def geometries(self) -> dict:
+        prefixes, _, geometries, _ = self._load()
+        return dict(zip(prefixes, geometries))
+
+    def locate(self, lat, lon) -> np.ndarray:
+        """
+        uc_prefix of the boundary containing each point ("" if none), in one query.
+        """
+        prefixes, _, _, tree = self._load()
+        lat = pd.to_numeric(pd.Series(lat), errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(pd.Series(lon), errors="coerce").to_numpy(dtype=float)
+        result = np.full(len(lat), "", dtype=object)
+        valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        if len(prefixes) and len(valid):
+            point_idx, polygon_idx = tree.query(shapely.points(lon[valid], lat[valid]), predicate="within")
+            point_idx, first = np.unique(point_idx, return_index=True)
+            result[valid[point_idx]] = prefixes[polygon_idx[first]]
+        return result
+
+    def outside_mask(self, df) -> pd.Series:
+        """
+        True for villages with coordinates that lie outside the stored boundary of their
+        own uc_prefix. Villages without coordinates or whose UC has no boundary are False.
+        """
+        prefixes, _, geometries, _ = self._load()
+        mask = pd.Series(False, index=df.index)
+        if not len(prefixes):
+            return mask
+        lat, lon = _coords(df)
+        ucs = df["uc_prefix"].fillna("").astype(str).to_numpy()
+        by_uc = dict(zip(prefixes, geometries))
+        checked = ~(np.isnan(lat) | np.isnan(lon)) & pd.Series(ucs).isin(by_uc).to_numpy()
+        for uc_prefix in pd.unique(ucs[checked]):
+            rows = np.flatnonzero(checked & (ucs == uc_prefix))
+            mask.iloc[rows] = ~shapely.contains_xy(by_uc[uc_prefix], lon[rows], lat[rows])
+        return mask
+
+    def to_geojson(self, uc_prefixes=None) -> dict:
+        """
+        FeatureCollection of the stored boundaries (optionally only some UCs).
+        """
+        prefixes, names, geometries, _ = self._load()
+        wanted = None if uc_prefixes is None else set(uc_prefixes)
+        features = [
+            {"type": "Feature", "properties": {"uc_prefix": p, "name": n}, "geometry": g.__geo_interface__}
+            for p, n, g in zip(prefixes, names, geometries) if wanted is None or p in wanted
+        ]
+        return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,83 @@
+# app/capacity.py
+#
+# Suffix usage, gaps and headroom per UC, tehsil and district. Village suffixes are
+# three digits, so a UC can hold at most 999 villages; since codes are issued as max+1,
+# suffixes freed by removed villages stay unused and a UC can fill up early.
+#
+#   used      distinct suffixes present in the masterlist
+#   gaps      suffixes below the highest one that are not present
+#   retired   present suffixes whose village is marked "to be deleted"
+#   headroom  suffixes left above the highest one (999 - max)
+
+import pandas as pd
+
+from app.code_generator import MAX_SUFFIX
+from app.config import CAPACITY_WARN
+
+LEVELS = {
+    "uc": ["province", "district", "tehsil", "uc", "uc_prefix"],
+    "tehsil": ["province", "district", "tehsil", "tehsil_pcode"],
+    "district": ["province", "district", "district_pcode"],
+}
+
+
+def uc_capacity(df, warn_at=CAPACITY_WARN) -> pd.DataFrame:
+    """
+    One row per uc_prefix with used/max_suffix/gaps/retired/headroom/utilisation and a
+    near_capacity flag (max_suffix >= warn_at * 999).
+    """
+    suffix = pd.to_numeric(df["village/settlement_code"], errors="coerce")
+    retired = df["remarks"].fillna("").astype(str).str.startswith("to be deleted")
+    rows = pd.DataFrame({
+        "uc_prefix": df["uc_prefix"],
+        "suffix": suffix.where(suffix.between(1, MAX_SUFFIX)),
+        "retired": retired,
+    }).dropna(subset=["uc_prefix"])
+
+    grouped = rows.groupby("uc_prefix")
+    report = pd.DataFrame({
+        "used": grouped["suffix"].nunique(),
+        "max_suffix": grouped["suffix"].max().fillna(0).astype(int),
+        "retired": grouped["retired"].sum().astype(int),
+    })
+    report["gaps"] = report["max_suffix"] - report["used"]
+    report["headroom"] = MAX_SUFFIX - report["max_suffix"]
+    report["utilisation"] = (report["max_suffix"] / MAX_SUFFIX).round(3)
+    report["near_capacity"] = report["max_suffix"] >= warn_at * MAX_SUFFIX
+
+    names = df.dropna(subset=["uc_prefix"]).drop_duplicates("uc_prefix").set_index("uc_prefix")
+    names = names[["province", "district", "tehsil", "uc", "tehsil_pcode", "district_pcode"]]
+    report = names.join(report, how="right").reset_index()
+    return report.sort_values("utilisation", ascending=False, ignore_index=True)
+
+
+def capacity_report(df, level="uc", warn_at=CAPACITY_WARN) -> pd.DataFrame:
+    """
+    Capacity per UC, tehsil or district. Higher levels add up their UCs and count how
+    many of them are near capacity; min_headroom is the fullest UC's headroom.
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level '{level}', expected one of {', '.join(LEVELS)}.")
+    ucs = uc_capacity(df, warn_at)
+    if level == "uc":
+        return ucs[LEVELS["uc"] + ["used", "max_suffix", "gaps", "retired", "headroom", "utilisation", "near_capacity"]]
+
+    report = ucs.groupby(LEVELS[level], dropna=False).agg(
+        ucs=("uc_prefix", "count"),
+        used=("used", "sum"),
+        gaps=("gaps", "sum"),
+        retired=("retired", "sum"),
+        headroom=("headroom", "sum"),
+        min_headroom=("headroom", "min"),
+        ucs_near_capacity=("near_capacity", "sum"),
+    ).reset_index()
+    return report.sort_values(["ucs_near_capacity", "min_headroom"], ascending=[False, True], ignore_index=True)
+
+
+def free_suffixes(df, uc_prefix, exclude=()) -> list:
+    """
+    Suffixes 1..999 under `uc_prefix` that are not in the masterlist, lowest first.
+    """
+    suffix = pd.to_numeric(df.loc[df["uc_prefix"] == uc_prefix, "village/settlement_code"], errors="coerce")
+    taken = set(suffix.dropna().astype(int)) | set(exclude)
+    return [s for s in range(1, MAX_SUFFIX + 1) if s not in taken]
@@ -0,0 +1,308 @@
+# app/cli.py
+#
+# Headless entry point for overnight and scripted jobs:
+#   python -m app allocate --uc PK60102012 --name "New Village"
+#   python -m app import villages.csv
+#   python -m app mark-delete PK60102012001 --reason "duplicate"
+#   python -m app export --format geojson --out villages.geojson --district Thatta
+#   python -m app validate
+#   python -m app capacity --level tehsil
+#   python -m app lease create --uc PK60102012 --count 50 --team "Team A"
+#
+# The masterlist is loaded once, every change is applied in memory and it is written
+# back at most once per command. Commands that write hold the masterlist lock from
+# load to save, so they queue behind (and are queued behind) the app's writers.
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from app.config import ALLOCATION_POLICY, LEASE_DAYS, MASTERLIST_PATH
+from app.capacity import LEVELS, capacity_report
+from app.code_generator import generate_village_code, generate_village_codes
+from app.commit_queue import masterlist_lock
+from app.data_writer import save_masterlist
+from app.exporter import EXPORTERS, export_frame
+from app.leases import LeaseStore, lease_codes
+from app.registry import get_registry
+from app.updater import add_new_village, append_villages
+from app.validator import summarise, validate_masterlist
+from app.watcher import load_masterlist_frame
+
+
+WRITE_COMMANDS = {"allocate", "import", "mark-delete"}
+
+
+def _read_list(values, file_path):
+    items = list(values or [])
+    if file_path:
+        with open(file_path, encoding="utf-8") as f:
+            items += [line.strip() for line in f]
+    return [i for i in (x.strip() for item in items for x in item.replace(",", "\n").split("\n")) if i]
+
+
+def _save(df, args):
+    if args.dry_run:
+        print("🧪 Dry run: masterlist not written.")
+        return
+    # Only the configured masterlist is snapshotted; copies edited with --file are not
+    is_masterlist = os.path.abspath(args.file) == os.path.abspath(MASTERLIST_PATH)
+    save_masterlist(df, args.file, snapshot=is_masterlist)
+    print(f"💾 Masterlist updated in: {args.file}")
+
+
+def cmd_allocate(df, args):
+    names = _read_list(args.name, args.names_file)
+    if not names:
+        print("❌ No village names given.")
+        return 1
+    if not (df["uc_prefix"] == args.uc).any():
+        print(f"❌ UC prefix '{args.uc}' not found in dataset.")
+        return 1
+
+    leases = LeaseStore()
+    try:
+        codes = generate_village_codes(df, args.uc, len(names), leases.reserved_max(args.uc),
+                                       args.policy, leases.leased_suffixes(args.uc))
+    except ValueError as exc:
+        print(f"❌ {exc}")
+        return 1
+    today = datetime.today().strftime("%Y-%m-%d")
+    rows = []
+    for name, code in zip(names, codes):
+        row = add_new_village(df, args.uc, name, code)
+        row["remarks"] = f"newly added on {today}"
+        rows.append(row)
+        print(f"🟢 {name} → {code}")
+
+    _save(append_villages(df, rows), args)
+    return 0
+
+
+def cmd_import(df, args):
+    from app.importer import import_file
+    from app.rejections import RejectionHistory
+
+    leases = LeaseStore()
+    geocoder = None
+    if args.geocode:
+        from app.geocoder import get_geocoder
+
+        geocoder = get_geocoder()
+    new_df, importer = import_file(
+        df, args.input, batch_size=args.batch_size, remarks=args.remarks,
+        rejections=None if args.no_reject_check else RejectionHistory(), leases=leases, geocoder=geocoder,
+    )
+    for message in importer.warnings:
+        print(message, file=sys.stderr)
+    if importer.skipped_rejected:
+        print(f"⏭️ Skipped {len(importer.skipped_rejected)} previously rejected villages.")
+    print(f"✅ Imported {len(importer.added)} villages.")
+    corrections = importer.resolver.report()
+    if len(corrections):
+        print(f"🔤 {len(corrections)} names did not match exactly (-v to list).")
+    if args.verbose:
+        for c in corrections.itertuples(index=False):
+            print(f"   {c.level} '{c.original}' → '{c.resolved}' ({c.match})")
+        for name, pcode in importer.added:
+            print(f"🟢 {name} → {pcode}")
+    if importer.added:
+        if not args.dry_run:
+            # Before the save, so a saved lease code is never still free in its lease
+            leases.mark_used(importer.lease_used)
+        _save(new_df, args)
+        units = get_registry().unknown_units(importer.rows)
+        if units:
+            print(f"🗂️ {len(units)} admin units are not in the registry; check and add them with "
+                  "`python -m app.registry sync --dry-run` / `python -m app.registry sync`.")
+    return 0
+
+
+def cmd_mark_delete(df, args):
+    codes = _read_list(args.codes, args.codes_file)
+    mask = df["village_pcode_new"].isin(codes)
+    found = set(df.loc[mask, "village_pcode_new"])
+    missing = [c for c in codes if c not in found]
+
+    if not found:
+        print("❌ No valid village P-codes provided.")
+        return 1
+    df.loc[mask, "remarks"] = f"to be deleted: {args.reason or 'no reason'} on {datetime.today().strftime('%Y-%m-%d')}"
+    print(f"✅ {len(found)} villages marked for deletion.")
+    if missing:
+        print(f"⚠️ The following codes were not found: {', '.join(missing)}", file=sys.stderr)
+    _save(df, args)
+    return 0
+
+
+def cmd_export(df, args):
+    for field in ("province", "district", "tehsil", "uc"):
+        value = getattr(args, field)
+        if value:
+            df = df[df[field] == value]
+
+    if args.by_district:
+        extension = EXPORTERS[args.format]["extension"]
+        for (province_name, district_name), group in df.groupby(["province", "district"]):
+            folder = os.path.join(args.by_district, province_name)
+            os.makedirs(folder, exist_ok=True)
+            export_frame(group, args.format, os.path.join(folder, f"{district_name}{extension}".replace("/", "-")))
+        print(f"✅ District-wise {args.format} files exported to '{args.by_district}'.")
+    else:
+        out = args.out or f"villages{EXPORTERS[args.format]['extension']}"
+        export_frame(df, args.format, out)
+        print(f"✅ Exported {len(df)} rows to {out}")
+    return 0
+
+
+def cmd_validate(df, args):
+    from app.boundaries import BoundaryStore
+
+    violations = validate_masterlist(df, BoundaryStore())
+    summary = summarise(violations)
+
+    print(f"🔍 {len(df)} rows checked.")
+    for row in summary.itertuples(index=False):
+        print(f"   {row.violations:>7}  {row.severity:<7}  {row.description}")
+    if args.report:
+        violations.to_csv(args.report, index=False)
+        print(f"💾 Violation report written to {args.report}")
+    return 1 if (violations["severity"] == "error").any() else 0
+
+
+def cmd_capacity(df, args):
+    report = capacity_report(df, args.level)
+    near_col = "near_capacity" if args.level == "uc" else "ucs_near_capacity"
+    if args.near_only:
+        report = report[report[near_col] > 0]
+    if args.out:
+        report.to_csv(args.out, index=False)
+        print(f"💾 Capacity report written to {args.out}")
+    else:
+        print(report.head(args.top).to_string(index=False))
+    return 0
+
+
+def cmd_lease(df, args):
+    leases = LeaseStore()
+    if args.action == "create":
+        if not args.uc or not args.team:
+            print("❌ --uc and --team are required.")
+            return 1
+        # Under the masterlist lock so no writer allocates from the block while it is taken
+        with masterlist_lock(args.file):
+            df = load_masterlist_frame(args.file)
+            if not (df["uc_prefix"] == args.uc).any():
+                print(f"❌ UC prefix '{args.uc}' not found in dataset.")
+                return 1
+            current_max = int(generate_village_code(df, args.uc)[len(args.uc):]) - 1
+            try:
+                lease = leases.create(args.team, args.uc, args.count, current_max, args.days)
+            except ValueError as exc:
+                print(f"❌ {exc}")
+                return 1
+        codes = lease_codes(lease)
+        print(f"📦 Lease {lease['id']} for {lease['team']}: {codes[0]} – {codes[-1]} ({len(codes)} codes), "
+              f"expires {lease['expires_at']}")
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write("village_pcode_new\n" + "\n".join(codes) + "\n")
+            print(f"💾 Codes written to {args.out}")
+    elif args.action == "list":
+        for lease in leases.active(args.uc, args.team):
+            print(f"{lease['id']:>5}  {lease['team']:<20} {lease['uc_prefix']} "
+                  f"{str(lease['first_suffix']).zfill(3)}-{str(lease['last_suffix']).zfill(3)}  "
+                  f"used {lease['used']}/{lease['last_suffix'] - lease['first_suffix'] + 1}  expires {lease['expires_at']}")
+    elif args.action in ("allocate", "release") and args.id is None:
+        print(f"❌ Give the lease id to {args.action}.")
+        return 1
+    elif args.action == "allocate":
+        try:
+            for code in leases.allocate(args.id, args.count):
+                print(code)
+        except ValueError as exc:
+            print(f"❌ {exc}")
+            return 1
+    elif args.action == "release":
+        if not leases.release(args.id):
+            print(f"❌ Lease {args.id} is not active.")
+            return 1
+        print(f"✅ Lease {args.id} released.")
+    elif args.action == "reclaim":
+        print(f"♻️ {leases.reclaim_expired()} unused codes from expired leases returned to the pool.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app", description="Village and admin code manager")
+    parser.add_argument("--file", default=MASTERLIST_PATH, help="Masterlist workbook")
+    parser.add_argument("--dry-run", action="store_true", help="Do not write the masterlist")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("allocate", help="Add villages to a UC and print their new codes")
+    p.add_argument("--uc", required=True, help="UC prefix, e.g. PK60102012")
+    p.add_argument("--name", action="append", help="Village name (repeatable)")
+    p.add_argument("--names-file", help="File with one village name per line")
+    p.add_argument("--policy", choices=["max", "reuse_when_full"], default=ALLOCATION_POLICY,
+                   help="What to do once the UC reaches suffix 999")
+    p.set_defaults(func=cmd_allocate)
+
+    p = sub.add_parser("import", help="Bulk import a filled template (.csv or .xlsx)")
+    p.add_argument("input")
+    p.add_argument("--batch-size", type=int, default=10000)
+    p.add_argument("--remarks", default="bulk imported")
+    p.add_argument("--no-reject-check", action="store_true", help="Do not skip previously rejected villages")
+    p.add_argument("--geocode", action="store_true", help="Fill blank province/district from the coordinates")
+    p.add_argument("-v", "--verbose", action="store_true", help="Print every allocated code")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("mark-delete", help="Mark villages as 'to be deleted'")
+    p.add_argument("codes", nargs="*")
+    p.add_argument("--codes-file", help="File with one P-code per line")
+    p.add_argument("--reason", default="")
+    p.set_defaults(func=cmd_mark_delete)
+
+    p = sub.add_parser("export", help="Export the (filtered) masterlist")
+    p.add_argument("--format", choices=list(EXPORTERS), default="csv")
+    p.add_argument("--out", help="Output file")
+    p.add_argument("--by-district", metavar="DIR", help="Write one file per district under DIR")
+    for field in ("province", "district", "tehsil", "uc"):
+        p.add_argument(f"--{field}")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("validate", help="Check the code hierarchy of the masterlist")
+    p.add_argument("--report", help="Write every violation to this CSV")
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("capacity", help="Suffix usage, gaps and headroom per UC/tehsil/district")
+    p.add_argument("--level", choices=list(LEVELS), default="uc")
+    p.add_argument("--near-only", action="store_true", help="Only units near the 999 limit")
+    p.add_argument("--top", type=int, default=20, help="Rows to print")
+    p.add_argument("--out", help="Write the full report to this CSV")
+    p.set_defaults(func=cmd_capacity)
+
+    p = sub.add_parser("lease", help="Reserve blocks of village codes for offline field teams")
+    p.add_argument("action", choices=["create", "list", "allocate", "release", "reclaim"])
+    p.add_argument("id", nargs="?", type=int, help="Lease id (allocate/release)")
+    p.add_argument("--uc", help="UC prefix")
+    p.add_argument("--team")
+    p.add_argument("--count", type=int, default=1)
+    p.add_argument("--days", type=int, default=LEASE_DAYS)
+    p.add_argument("--out", help="Write the leased codes to this CSV (create)")
+    p.set_defaults(func=cmd_lease, frame=False)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not getattr(args, "frame", True):
+        return args.func(None, args)
+    if args.command in WRITE_COMMANDS and not args.dry_run:
+        with masterlist_lock(args.file):
+            return args.func(load_masterlist_frame(args.file), args)
+    return args.func(load_masterlist_frame(args.file), args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,41 @@
 # app/code_generator.py
 
-def generate_village_code(df, uc_prefix: str) -> str:
+import functools
+import time
+
+from app.metrics import counter, histogram
+
+# village/settlement_code is zero-padded to three digits
+MAX_SUFFIX = 999
+
+GENERATE_SECONDS = histogram("code_generation_seconds", "Time to find the next free code", ["level"])
+CODES_GENERATED = counter("codes_generated_total", "Codes handed out by the code generators", ["level"])
+
+
+def _reported(level):
+    """
+    Records the call's duration and the number of codes it returned.
+    """
+    seconds, generated = GENERATE_SECONDS.labels(level), CODES_GENERATED.labels(level)
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds.observe(time.perf_counter() - start)
+            generated.inc(len(result) if isinstance(result, list) else 1)
+            return result
+        return wrapper
+    return decorate
+
+
+@_reported("village")
+def generate_village_code(df, uc_prefix: str, reserved_max: int = 0) -> str:
     """
     Generate the next full P-code for a village under the given UC prefix.
     Uses 'village/settlement_code' for numeric suffix increment.
+    Suffixes up to `reserved_max` (held by code leases) are skipped.
     """
     suffix_col = 'village/settlement_code'
 
@@ -14,12 +46,38 @@ def generate_village_code(df, uc_prefix: str) -> str:
 
     # Parse valid integer suffixes
     numeric_suffixes = [int(str(x).strip()) for x in matching if str(x).strip().isdigit()]
-    next_number = max(numeric_suffixes, default=0) + 1
+    next_number = max(numeric_suffixes + [reserved_max], default=0) + 1
     suffix = str(next_number).zfill(3)
 
     return f"{uc_prefix}{suffix}"
-# app/code_generator.py (add below existing code)
 
+
+@_reported("village")
+def generate_village_codes(df, uc_prefix: str, count: int = 1, reserved_max: int = 0,
+                           policy: str = "max", exclude=()) -> list:
+    """
+    Generate the next `count` village P-codes under the given UC prefix.
+    policy "max" continues after the highest suffix (and `reserved_max`), like
+    generate_village_code. "reuse_when_full" does the same until MAX_SUFFIX is reached and
+    then fills suffixes no longer present in the masterlist, skipping `exclude`.
+    Raises ValueError if the UC does not have `count` codes left.
+    """
+    matching = df[df['uc_prefix'] == uc_prefix]['village/settlement_code'].dropna()
+    used = {int(str(x).strip()) for x in matching if str(x).strip().isdigit()}
+    start = max(used | {reserved_max}) + 1
+    suffixes = list(range(start, min(start + count, MAX_SUFFIX + 1)))
+
+    if len(suffixes) < count and policy == "reuse_when_full":
+        taken = used | set(exclude)
+        free = (s for s in range(1, min(start, MAX_SUFFIX + 1)) if s not in taken)
+        suffixes += [s for _, s in zip(range(count - len(suffixes)), free)]
+
+    if len(suffixes) < count:
+        raise ValueError(f"UC {uc_prefix} has only {len(suffixes)} free village codes left (suffix limit {MAX_SUFFIX}).")
+    return [f"{uc_prefix}{str(s).zfill(3)}" for s in suffixes]
+
+
+@_reported("tehsil")
 def generate_tehsil_code(df, district_pcode: str) -> str:
     """
     Generates the next tehsil P-code under a district.
@@ -30,6 +88,7 @@ def generate_tehsil_code(df, district_pcode: str) -> str:
     return f"{district_pcode}{next_code}"
 
 
+@_reported("uc")
 def generate_uc_code(df, tehsil_pcode: str) -> str:
     """
     Generates the next UC P-code under a tehsil.
@@ -40,6 +99,7 @@ def generate_uc_code(df, tehsil_pcode: str) -> str:
     return f"{tehsil_pcode}{next_code}"
 
 
+@_reported("district")
 def generate_other_district_code(df, province_code: str) -> str:
     """
     For 'Other' districts, generate next available district code within the province.
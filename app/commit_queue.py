@@ -0,0 +1,149 @@
+# app/commit_queue.py
+#
+# Single writer for the masterlist. Every change (Add Village, Add Admin Unit, Mark
+# Deletion, Bulk/KML import, approvals, API inserts) is submitted as a mutation to one
+# background thread. The thread applies queued mutations in submission order against the
+# authoritative frame held by the MasterlistWatcher and saves the workbook once per
+# burst, so concurrent sessions never overwrite each other and ten quick clicks cost
+# one save instead of ten.
+#
+# A mutation is a callable `mutation(frame) -> (new_frame, result)`. It gets its own
+# shallow copy of the batch's frame and may modify it in place; its edits are kept only
+# if it returns normally with a new_frame (None when there turned out to be nothing to
+# change), so a mutation that raises halfway leaves nothing behind for the save. With
+# Copy-on-Write (always on from pandas 3) an in-place edit copies only the columns it
+# touches; older pandas gets a deep copy per mutation instead.
+# `result` (e.g. the assigned codes) is handed back to the caller through a Future.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+from app.config import COMMIT_COALESCE
+from app.data_writer import file_lock, save_masterlist
+from app.metrics import counter, gauge, histogram
+
+# Without Copy-on-Write a shallow copy would share its columns with the saved frame
+DEEP_COPY = int(pd.__version__.split(".")[0]) < 3
+
+PENDING = gauge("commit_queue_pending", "Masterlist mutations submitted and not yet applied")
+BATCH_SIZE = histogram("commit_batch_size", "Mutations applied per writer batch",
+                       buckets=(1, 2, 5, 10, 20, 50, 100, 500))
+BATCH_SECONDS = histogram("commit_batch_seconds", "Time to apply and save one writer batch")
+MUTATIONS = counter("commit_mutations_total", "Masterlist mutations, by outcome (applied, failed)", ["outcome"])
+
+
+def masterlist_lock(file_path):
+    """
+    Exclusive lock shared with other processes writing the same masterlist
+    (the main app, the admin panel and the API each run their own writer).
+    On Windows the in-process writer still serialises this server's saves.
+    """
+    return file_lock(file_path)
+
+
+class CommitQueue:
+    """
+    Queue of masterlist mutations drained by one writer thread.
+    `submit()` returns a Future; `commit()` waits for it and returns the mutation's result.
+    """
+
+    def __init__(self, watcher, save=save_masterlist, coalesce=COMMIT_COALESCE):
+        self.watcher = watcher
+        self.save = save
+        self.coalesce = coalesce
+        self.saves = 0
+        self.applied = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, mutation) -> Future:
+        future = Future()
+        PENDING.inc()
+        self._queue.put((mutation, future))
+        self.start()
+        return future
+
+    def commit(self, mutation, timeout=None):
+        return self.submit(mutation).result(timeout)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.coalesce
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return batch, False
+            if item is None:
+                return batch, True
+            batch.append(item)
+
+    def _apply(self, batch):
+        PENDING.dec(len(batch))
+        batch = [(m, f) for m, f in batch if f.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        BATCH_SIZE.observe(len(batch))
+        start = time.perf_counter()
+        try:
+            with masterlist_lock(self.watcher.file_path):
+                # Pick up saves made by other processes before applying anything
+                self.watcher.check()
+                frame = self.watcher.frame
+                done, changed = [], False
+                for mutation, future in batch:
+                    try:
+                        new_frame, result = mutation(frame.copy(deep=DEEP_COPY))
+                    except Exception as exc:
+                        future.set_exception(exc)
+                        continue
+                    if new_frame is not None:
+                        frame, changed = new_frame, True
+                    done.append((future, result))
+                if changed:
+                    self.save(frame, self.watcher.file_path)
+                    self.watcher.publish(frame)
+                    self.saves += 1
+                self.applied += len(done)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            MUTATIONS.labels("failed").inc(len(batch))
+            return
+        finally:
+            BATCH_SECONDS.observe(time.perf_counter() - start)
+        MUTATIONS.labels("applied").inc(len(done))
+        MUTATIONS.labels("failed").inc(len(batch) - len(done))
+        for future, result in done:
+            future.set_result(result)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            self._apply(batch)
+            if stop:
+                return
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="masterlist-writer", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Finishes everything already queued, then stops the writer thread.
+        """
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,65 @@
+# app/config.py
+
+import os
+
+# Location of the authoritative masterlist workbook
+MASTERLIST_PATH = os.environ.get("MASTERLIST_PATH", "data/village_masterlist.xlsx")
+
+# Excel reader used by load_and_clean_data: "openpyxl", "calamine" or "openpyxl_readonly"
+READ_ENGINE = os.environ.get("MASTERLIST_READ_ENGINE", "calamine")
+
+# Rolling masterlist snapshots written on every save (0 disables them)
+SNAPSHOT_DIR = os.environ.get("MASTERLIST_SNAPSHOT_DIR", "data/snapshots")
+SNAPSHOT_KEEP = int(os.environ.get("MASTERLIST_SNAPSHOT_KEEP", "20"))
+
+# Seconds between background checks for external edits to the masterlist
+WATCH_INTERVAL = float(os.environ.get("MASTERLIST_WATCH_INTERVAL", "5"))
+
+# Approval queue database and the xlsx files it replaces (imported once on first start)
+APPROVAL_DB_PATH = os.environ.get("APPROVAL_DB_PATH", "data/approvals.db")
+LEGACY_PENDING_PATHS = ["data/pending_approvals.xlsx", "pending_villages.xlsx"]
+LEGACY_REJECTED_PATH = "data/rejected_villages.xlsx"
+# Seconds after which rows still claimed by an approval (its process died) return to pending
+APPROVAL_CLAIM_TIMEOUT = float(os.environ.get("APPROVAL_CLAIM_TIMEOUT", "600"))
+
+# Local JSON API (python -m app.api)
+API_HOST = os.environ.get("VILLAGE_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("VILLAGE_API_PORT", "8765"))
+# Seconds a code handed out by POST /reservations stays held for its caller
+RESERVATION_TTL = float(os.environ.get("VILLAGE_API_RESERVATION_TTL", "900"))
+
+# How long the masterlist writer waits for more changes before saving, in seconds
+COMMIT_COALESCE = float(os.environ.get("MASTERLIST_COMMIT_COALESCE", "0.05"))
+
+# Default lifetime of a code-reservation lease for offline field teams, in days
+LEASE_DAYS = int(os.environ.get("LEASE_DAYS", "30"))
+
+# Village code allocation once a UC reaches suffix 999: "max" refuses, "reuse_when_full"
+# fills suffixes that are no longer in the masterlist
+ALLOCATION_POLICY = os.environ.get("ALLOCATION_POLICY", "max")
+# A unit is reported as near capacity once its highest suffix reaches this share of 999
+CAPACITY_WARN = float(os.environ.get("CAPACITY_WARN", "0.9"))
+
+# Versioned province/district/tehsil/UC code registry
+REGISTRY_PATH = os.environ.get("ADMIN_REGISTRY_PATH", "data/admin_registry.json")
+
+# Spelling variants of admin unit names (KPK, D.I. Khan, Chaghi, ...) accepted by imports
+ALIASES_PATH = os.environ.get("ADMIN_ALIASES_PATH", "data/admin_aliases.json")
+# Minimum difflib similarity for a fuzzy province/district match (0-1)
+ALIAS_FUZZY_CUTOFF = float(os.environ.get("ALIAS_FUZZY_CUTOFF", "0.8"))
+
+# Boundary polygons used to fill in missing province/district from coordinates
+PROVINCE_BOUNDARIES_PATH = os.environ.get("PROVINCE_BOUNDARIES_PATH", "data/geoBoundaries-PAK-province.geojson")
+DISTRICT_BOUNDARIES_PATH = os.environ.get("DISTRICT_BOUNDARIES_PATH", "data/pakistan_districts_province_boundries.geojson")
+
+# Per-rerun profiling panel in the app sidebar (also enabled per session with ?profile=1)
+PROFILING = os.environ.get("APP_PROFILING", "0") == "1"
+# Reruns kept in the panel and in the Chrome trace export
+PROFILING_RERUNS = int(os.environ.get("APP_PROFILING_RERUNS", "20"))
+# Record memory deltas with tracemalloc (slows allocation-heavy code while profiling)
+PROFILING_MEMORY = os.environ.get("APP_PROFILING_MEMORY", "1") == "1"
+
+# Prometheus text metrics: served by the API on /metrics, and written to this file every
+# METRICS_INTERVAL seconds when set (for the node_exporter textfile collector)
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_INTERVAL = float(os.environ.get("METRICS_INTERVAL", "15"))
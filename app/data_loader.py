@@ -1,6 +1,15 @@
 import pandas as pd
 import re
 
+from app.config import MASTERLIST_PATH, READ_ENGINE
+from app.metrics import histogram, timed
+from app.profiling import profiled
+
+LOAD_SECONDS = histogram("masterlist_load_seconds", "Time to read and clean the masterlist workbook")
+FORMAT_SECONDS = histogram("masterlist_format_seconds", "Time to zero-pad the masterlist code columns")
+
+READ_ENGINES = ("openpyxl", "calamine", "openpyxl_readonly")
+
 def clean_coordinate_strict(val):
     """
     Clean coordinates that may contain Excel formatting, stray characters, or non-numeric input.
@@ -12,13 +21,55 @@ def clean_coordinate_strict(val):
     except:
         return None
 
-def load_and_clean_data(file_path="data/village_masterlist.xlsx"):
+def _cell_to_str(value):
+    # Mirror pandas' dtype=str conversion (integral floats lose their ".0")
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _read_openpyxl_streaming(file_path, usecols=None):
+    """
+    Reads the Masterlist sheet row by row with openpyxl's read-only mode,
+    keeping only the requested columns.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb["Masterlist"].iter_rows(values_only=True)
+        header = next(rows, ())
+        wanted = [i for i, name in enumerate(header) if name is not None and (usecols is None or name in usecols)]
+        data = [[_cell_to_str(row[i]) if i < len(row) else None for i in wanted] for row in rows if any(v is not None for v in row)]
+    finally:
+        wb.close()
+    return pd.DataFrame(data, columns=[str(header[i]) for i in wanted], dtype=object)
+
+
+def read_masterlist(file_path=MASTERLIST_PATH, engine=None, usecols=None):
+    """
+    Reads the raw Masterlist sheet as strings using the configured engine.
+    """
+    engine = engine or READ_ENGINE
+    if engine not in READ_ENGINES:
+        raise ValueError(f"Unknown read engine '{engine}'. Choose from: {', '.join(READ_ENGINES)}")
+    if engine == "openpyxl_readonly":
+        return _read_openpyxl_streaming(file_path, usecols)
+    return pd.read_excel(file_path, sheet_name="Masterlist", dtype=str, engine=engine, usecols=usecols)
+
+
+@profiled()
+@timed(LOAD_SECONDS)
+def load_and_clean_data(file_path=MASTERLIST_PATH, engine=None, usecols=None):
     """
     Loads the masterlist, normalizes columns, and strictly cleans coordinate values.
     Ensures latitude/longitude are numeric and compatible with pyarrow serialization.
+    `engine` overrides the configured READ_ENGINE; `usecols` limits the columns read.
     """
     # Step 1: Load with all strings to avoid Excel typing issues
-    df = pd.read_excel(file_path, sheet_name="Masterlist", dtype=str)
+    df = read_masterlist(file_path, engine=engine, usecols=usecols)
 
     # Step 2: Normalize column names
     df.columns = (
@@ -36,19 +87,40 @@ def load_and_clean_data(file_path="data/village_masterlist.xlsx"):
     }, inplace=True)
 
     # Step 4: Strip whitespace from all string columns
-    text_columns = df.select_dtypes(include='object').columns
+    text_columns = df.select_dtypes(include=['object', 'string']).columns
     df[text_columns] = df[text_columns].apply(lambda col: col.str.strip())
 
     # Step 5: Generate uc_prefix
     if "uc/vc/nc_pcode" in df.columns:
         df["uc_prefix"] = df["uc/vc/nc_pcode"].astype(str).str.strip()
 
-    # Step 6: Strictly clean and convert lat/lon to float
-    df["latitude"] = df["latitude"].apply(clean_coordinate_strict)
-    df["longitude"] = df["longitude"].apply(clean_coordinate_strict)
-
+    # Step 6: Strictly clean and convert lat/lon to float (skipped if not read)
     # Step 7: Ensure final dtypes are float for compatibility
-    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
-    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
+    for col in ("latitude", "longitude"):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col].apply(clean_coordinate_strict), errors="coerce")
+
+    return df
+
+
+# Format all code columns consistently with leading zeros
+@profiled()
+@timed(FORMAT_SECONDS)
+def format_code_columns(df: pd.DataFrame) -> pd.DataFrame:
+    def safe_format(x, width):
+        if pd.notnull(x) and str(x).strip() != "":
+            try:
+                return str(int(float(x))).zfill(width)
+            except:
+                return str(x).zfill(width)  # fallback
+        return ""
 
+    if "district_code" in df.columns:
+        df["district_code"] = df["district_code"].apply(lambda x: safe_format(x, 2))
+    if "tehsil_code" in df.columns:
+        df["tehsil_code"] = df["tehsil_code"].apply(lambda x: safe_format(x, 2))
+    if "uc_id" in df.columns:
+        df["uc_id"] = df["uc_id"].apply(lambda x: safe_format(x, 3))
+    if "village/settlement_code" in df.columns:
+        df["village/settlement_code"] = df["village/settlement_code"].apply(lambda x: safe_format(x, 3))
     return df
@@ -0,0 +1,160 @@
+# app/data_writer.py
+
+import contextlib
+import numbers
+import os
+import stat
+import tempfile
+import warnings
+
+import pandas as pd
+import xlsxwriter
+
+from app.config import MASTERLIST_PATH, SNAPSHOT_KEEP
+from app.metrics import histogram, timed
+
+SAVE_SECONDS = histogram("masterlist_save_seconds", "Time to save the masterlist workbook, snapshot included")
+
+# Code columns are written as Excel text so leading zeros survive a round trip
+TEXT_COLUMNS = {
+    "country_pcode",
+    "province_code",
+    "province_pcode",
+    "district_code",
+    "district_pcode",
+    "tehsil_code",
+    "tehsil_pcode",
+    "uc_id",
+    "uc/vc/nc_pcode",
+    "village/settlement_code",
+    "village_pcode_new",
+    "village_pcode_old",
+    "uc_prefix",
+}
+NUMERIC_COLUMNS = {"latitude", "longitude"}
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process locks serialise writers there
+    fcntl = None
+
+
+def _is_missing(value):
+    return value is None or value is pd.NA or value is pd.NaT or value == "" or (isinstance(value, float) and value != value)
+
+
+def _write_workbook(df, path, sheet_name):
+    """
+    Streams the frame row by row through XlsxWriter's constant_memory mode.
+    Rows must be written in order, which is why pandas' column-wise writer is not used.
+    """
+    workbook = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        "strings_to_numbers": False,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    })
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        header_fmt = workbook.add_format({"bold": True, "border": 1})
+        text_fmt = workbook.add_format({"num_format": "@"})
+
+        columns = [str(c) for c in df.columns]
+        kinds = []
+        for j, col in enumerate(columns):
+            if col in TEXT_COLUMNS:
+                worksheet.set_column(j, j, None, text_fmt)
+                kinds.append("text")
+            elif col in NUMERIC_COLUMNS:
+                kinds.append("number")
+            else:
+                kinds.append("auto")
+
+        worksheet.write_row(0, 0, columns, header_fmt)
+
+        for i, row in enumerate(df.itertuples(index=False, name=None), start=1):
+            for j, value in enumerate(row):
+                if _is_missing(value):
+                    continue
+                kind = kinds[j]
+                if kind == "text":
+                    worksheet.write_string(i, j, str(value), text_fmt)
+                elif kind == "number" or (isinstance(value, numbers.Number) and not isinstance(value, bool)):
+                    try:
+                        worksheet.write_number(i, j, float(value))
+                    except (TypeError, ValueError):
+                        worksheet.write_string(i, j, str(value))
+                else:
+                    worksheet.write_string(i, j, str(value))
+    finally:
+        workbook.close()
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # some platforms (Windows directories) refuse fsync
+    finally:
+        os.close(fd)
+
+
+def _file_mode(path):
+    """
+    The permission bits for the replacement file: those of the file being replaced,
+    or 0644 for a new one (mkstemp creates 0600).
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o644
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Exclusive lock on `path` shared with other processes, held through a `{path}.lock`
+    file so the atomic replace of `path` itself does not drop it.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@timed(SAVE_SECONDS)
+def save_masterlist(df, file_path=MASTERLIST_PATH, sheet_name="Masterlist", snapshot=True):
+    """
+    Writes the masterlist to a temporary file next to `file_path`, fsyncs it and renames it
+    into place, so readers never see a half-written workbook and a crash leaves the old file.
+    A rolling snapshot is taken afterwards unless `snapshot` is False.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".masterlist-", suffix=".xlsx", dir=directory)
+    os.close(fd)
+    try:
+        _write_workbook(df, tmp_path, sheet_name)
+        os.chmod(tmp_path, _file_mode(file_path))
+        _fsync_path(tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if os.name == "posix":
+        _fsync_path(directory)
+
+    if snapshot and SNAPSHOT_KEEP > 0:
+        from app.snapshots import take_snapshot
+
+        try:
+            take_snapshot(df, source=file_path)
+        except Exception as e:
+            warnings.warn(f"Masterlist saved but snapshot failed: {e}")
+    return file_path
@@ -0,0 +1,185 @@
+# app/exporter.py
+
+import json
+import os
+import tempfile
+import time
+from xml.sax.saxutils import escape, quoteattr
+
+import pandas as pd
+
+from app.metrics import counter, histogram
+
+EXPORT_SECONDS = histogram("export_seconds", "Time to export a frame, by format", ["format"])
+EXPORT_ROWS = counter("export_rows_total", "Rows exported, by format", ["format"])
+
+DEFAULT_CHUNK_SIZE = 5000
+COORD_COLUMNS = ["latitude", "longitude"]
+
+
+def iter_chunks(df, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Yields consecutive row slices of the frame so writers never serialise more
+    than `chunk_size` rows at a time.
+    """
+    if df.empty:
+        yield df
+        return
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def _normalise_chunk(chunk):
+    """
+    Casts text columns to nullable strings and coordinates to floats so every
+    chunk shares one schema regardless of what Excel handed us.
+    """
+    out = chunk.copy()
+    for col in out.columns:
+        if col in COORD_COLUMNS:
+            out[col] = pd.to_numeric(out[col], errors="coerce")
+        else:
+            out[col] = out[col].astype("string")
+    return out
+
+
+def _point_chunk(chunk):
+    """
+    Keeps only rows with usable coordinates for the point-layer formats.
+    """
+    chunk = _normalise_chunk(chunk)
+    if not set(COORD_COLUMNS).issubset(chunk.columns):
+        raise ValueError("latitude/longitude columns are required for point exports.")
+    return chunk.dropna(subset=COORD_COLUMNS)
+
+
+def _properties(record):
+    return {k: v for k, v in record.items() if k not in COORD_COLUMNS and not pd.isna(v)}
+
+
+def write_csv(chunks, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=(i == 0))
+
+
+def write_parquet(chunks, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            chunk = _normalise_chunk(chunk)
+            if writer is None:
+                schema = pa.schema([
+                    (col, pa.float64() if col in COORD_COLUMNS else pa.string())
+                    for col in chunk.columns
+                ])
+                writer = pq.ParquetWriter(path, schema, compression="snappy")
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_geojson(chunks, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        first = True
+        for chunk in chunks:
+            for record in _point_chunk(chunk).to_dict("records"):
+                feature = {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [record["longitude"], record["latitude"]]},
+                    "properties": _properties(record),
+                }
+                f.write(("" if first else ",\n") + json.dumps(feature, ensure_ascii=False))
+                first = False
+        f.write("\n]}\n")
+
+
+def write_geopackage(chunks, path):
+    import geopandas as gpd
+
+    mode = "w"
+    for chunk in chunks:
+        chunk = _point_chunk(chunk)
+        if chunk.empty:
+            continue
+        gdf = gpd.GeoDataFrame(
+            chunk.drop(columns=COORD_COLUMNS),
+            geometry=gpd.points_from_xy(chunk["longitude"], chunk["latitude"]),
+            crs="EPSG:4326",
+        )
+        gdf.to_file(path, layer="villages", driver="GPKG", mode=mode)
+        mode = "a"
+    if mode == "w":
+        raise ValueError("No rows with valid coordinates to export.")
+
+
+def write_kml(chunks, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<kml xmlns="http://www.opengis.net/kml/2.2">\n')
+        f.write('  <Document>\n')
+        f.write('    <name>Village Masterlist</name>\n')
+        for chunk in chunks:
+            for record in _point_chunk(chunk).to_dict("records"):
+                f.write('    <Placemark>\n')
+                f.write(f'      <name>{escape(str(record.get("village_name", "") or ""))}</name>\n')
+                f.write('      <ExtendedData>\n')
+                for key, value in _properties(record).items():
+                    f.write(f'        <Data name={quoteattr(key)}><value>{escape(str(value))}</value></Data>\n')
+                f.write('      </ExtendedData>\n')
+                f.write(f'      <Point><coordinates>{record["longitude"]},{record["latitude"]},0</coordinates></Point>\n')
+                f.write('    </Placemark>\n')
+        f.write('  </Document>\n</kml>\n')
+
+
+EXPORTERS = {}
+
+
+def register_exporter(key: str, label: str, extension: str, mime: str, writer):
+    """
+    Registers an export format. `writer(chunks, path)` receives an iterator of
+    DataFrame chunks and must stream them to `path`.
+    """
+    EXPORTERS[key] = {"label": label, "extension": extension, "mime": mime, "writer": writer}
+
+
+register_exporter("csv", "CSV", ".csv", "text/csv", write_csv)
+register_exporter("parquet", "Parquet", ".parquet", "application/vnd.apache.parquet", write_parquet)
+register_exporter("geojson", "GeoJSON (points)", ".geojson", "application/geo+json", write_geojson)
+register_exporter("gpkg", "GeoPackage (points)", ".gpkg", "application/geopackage+sqlite3", write_geopackage)
+register_exporter("kml", "KML (points)", ".kml", "application/vnd.google-earth.kml+xml", write_kml)
+
+
+def export_frame(df, fmt: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """
+    Streams the frame to `path` in the requested format, chunk by chunk.
+    """
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(EXPORTERS)}")
+    start = time.perf_counter()
+    EXPORTERS[fmt]["writer"](iter_chunks(df, chunk_size), path)
+    EXPORT_SECONDS.labels(fmt).observe(time.perf_counter() - start)
+    EXPORT_ROWS.labels(fmt).inc(len(df))
+    return path
+
+
+def export_to_bytes(df, fmt: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> bytes:
+    """
+    Exports through a temporary file (GeoPackage needs a real path) and returns
+    the file contents for download buttons.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=EXPORTERS[fmt]["extension"] if fmt in EXPORTERS else "")
+    os.close(fd)
+    os.remove(tmp_path)
+    try:
+        export_frame(df, fmt, tmp_path, chunk_size)
+        with open(tmp_path, "rb") as f:
+            return f.read()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
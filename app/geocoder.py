@@ -0,0 +1,161 @@
+# app/geocoder.py
+#
+# Reverse geocoding of village coordinates to admin units, for imports whose rows have
+# coordinates but no (or partial) province/district names - typically KML files without
+# the description table.
+#
+# Each level is a layer of boundary polygons in a shapely STRtree, built once per
+# process. `locate()` looks up a whole array of points per layer in one vectorised
+# query (tens of thousands of points take a few tens of milliseconds). Polygon names
+# are mapped to registered names through the alias resolver, so "Chaghi" or
+# "Azad Jammu & Kashmir" come out as the registry spells them.
+#
+# Province and district come from the bundled GeoJSON files. UC polygons saved from KML
+# uploads (app/boundaries.py) add UC and tehsil layers with `add_uc_layers()`.
+
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import STRtree
+
+from app.aliases import NameResolver
+from app.config import DISTRICT_BOUNDARIES_PATH, PROVINCE_BOUNDARIES_PATH
+
+LEVEL_COLUMNS = {"province": "province", "district": "district", "tehsil": "tehsil", "uc": "uc"}
+
+
+def _features(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["features"]
+
+
+class ReverseGeocoder:
+    """
+    Point-in-polygon lookup of registered admin names, one STRtree per level.
+    """
+
+    def __init__(self, province_path=PROVINCE_BOUNDARIES_PATH, district_path=DISTRICT_BOUNDARIES_PATH,
+                 resolver=None):
+        self.resolver = resolver or NameResolver()
+        self.layers = {}
+
+        provinces = _features(province_path)
+        self.add_layer(
+            "province",
+            [shapely.geometry.shape(f["geometry"]) for f in provinces],
+            [self.resolver.province(f["properties"]["shapeName"]) for f in provinces],
+        )
+
+        districts = _features(district_path)
+        names = []
+        for f in districts:
+            province = self.resolver.province(f["properties"].get("province_territory", ""))
+            names.append(self.resolver.district(f["properties"].get("districts", ""), province))
+        self.add_layer("district", [shapely.geometry.shape(f["geometry"]) for f in districts], names)
+
+    def add_layer(self, level, geometries, names):
+        """
+        Indexes polygons for one level. Polygons whose name did not resolve (None) are
+        left out, so a point there stays unassigned at that level.
+        """
+        keep = [i for i, name in enumerate(names) if name]
+        geometries = np.array([geometries[i] for i in keep], dtype=object)
+        shapely.prepare(geometries)
+        self.layers[level] = (STRtree(geometries), np.array([names[i] for i in keep], dtype=object))
+
+    def add_uc_layers(self, boundaries):
+        """
+        UC layer from a BoundaryStore, plus a tehsil layer made of the union of each
+        tehsil's UC polygons. Names come from the registry.
+        """
+        registry = self.resolver.registry
+        polygons = {p: g for p, g in boundaries.geometries().items() if registry.name(p)}
+        if not polygons:
+            return
+        self.add_layer("uc", list(polygons.values()), [registry.name(p) for p in polygons])
+        by_tehsil = {}
+        for uc_prefix, geometry in polygons.items():
+            by_tehsil.setdefault(registry.parent(uc_prefix), []).append(geometry)
+        tehsils = [t for t in by_tehsil if registry.name(t)]
+        self.add_layer("tehsil", [shapely.union_all(by_tehsil[t]) for t in tehsils], [registry.name(t) for t in tehsils])
+
+    def locate(self, lat, lon) -> pd.DataFrame:
+        """
+        Returns one row per point with a column per layer holding the registered name of
+        the polygon containing it ("" outside every polygon or for missing coordinates).
+        """
+        lat = pd.to_numeric(pd.Series(lat), errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(pd.Series(lon), errors="coerce").to_numpy(dtype=float)
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        points = shapely.points(lon[valid], lat[valid])
+        rows = np.flatnonzero(valid)
+
+        result = {}
+        for level, (tree, names) in self.layers.items():
+            column = np.full(len(lat), "", dtype=object)
+            point_idx, polygon_idx = tree.query(points, predicate="within")
+            # A point on a shared border hits two polygons; keep the first
+            point_idx, first = np.unique(point_idx, return_index=True)
+            column[rows[point_idx]] = names[polygon_idx[first]]
+            result[LEVEL_COLUMNS[level]] = column
+        return pd.DataFrame(result)
+
+    def fill_missing(self, frame, lat_col="latitude", lon_col="longitude") -> pd.DataFrame:
+        """
+        Returns a copy of `frame` with blank admin columns filled from the row's
+        coordinates. Names already present are never overwritten; a district is only
+        filled when the located province agrees with the row's, and a tehsil or UC only
+        when the located district does.
+        """
+        out = frame.copy()
+        if lat_col not in out.columns or lon_col not in out.columns:
+            return out
+        blank = {c: out[c].fillna("").astype(str).str.strip() == "" if c in out.columns
+                 else pd.Series(True, index=out.index) for c in LEVEL_COLUMNS.values()}
+        needed = np.logical_or.reduce([blank[LEVEL_COLUMNS[level]].to_numpy() for level in self.layers])
+        if not needed.any():
+            return out
+
+        located = self.locate(out.loc[needed, lat_col], out.loc[needed, lon_col])
+        located.index = out.index[needed]
+        if "province" in out.columns:
+            same_province = (out.loc[needed, "province"].fillna("").astype(str).str.strip() == located["province"]) \
+                | blank["province"][needed]
+        else:
+            same_province = pd.Series(True, index=located.index)
+
+        for level in ("province", "district", "tehsil", "uc"):
+            if level not in self.layers:
+                continue
+            col = LEVEL_COLUMNS[level]
+            fill = blank[col][needed] & (located[col] != "")
+            if level == "district":
+                fill &= same_province
+            elif level != "province":
+                fill &= out.loc[needed, "district"].fillna("").astype(str).str.strip() == located["district"]
+            if col not in out.columns:
+                out[col] = ""
+            out.loc[fill[fill].index, col] = located.loc[fill, col]
+        return out
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder() -> ReverseGeocoder:
+    """
+    Process-wide geocoder with the stored UC boundaries; the GeoJSON files are read
+    and indexed on first use.
+    """
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            from app.boundaries import BoundaryStore
+
+            _geocoder = ReverseGeocoder()
+            _geocoder.add_uc_layers(BoundaryStore())
+        return _geocoder
@@ -0,0 +1,336 @@
+# app/importer.py
+
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from app.aliases import NameResolver
+from app.capacity import free_suffixes
+from app.code_generator import MAX_SUFFIX
+from app.config import ALLOCATION_POLICY
+from app.metrics import counter, histogram
+from app.registry import get_registry
+from app.rejections import normalise_name
+from app.updater import append_villages
+
+IMPORT_COLUMNS = ["province", "district", "tehsil", "uc", "village_name", "latitude", "longitude"]
+
+IMPORT_BATCH_SECONDS = histogram("import_batch_seconds", "Time to resolve and allocate codes for one import batch")
+IMPORT_ROWS = counter("import_rows_total", "Import rows processed, by outcome (added, rejected, invalid)", ["outcome"])
+
+
+def _first_by(df, keys, value_cols):
+    rows = df.dropna(subset=keys).drop_duplicates(subset=keys, keep="first")
+    values = rows[value_cols].itertuples(index=False, name=None)
+    return dict(zip(rows[keys].itertuples(index=False, name=None), values))
+
+
+def _max_code(codes, keys):
+    numeric = pd.to_numeric(codes, errors="coerce")
+    return numeric.groupby(keys).max().dropna().astype(int).to_dict()
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value).strip()
+
+
+class VillageImporter:
+    """
+    Resolves province/district/tehsil/UC names to codes and allocates village codes for
+    bulk imports. Lookup tables are built from the masterlist once and updated as rows are
+    added, so each row costs a few dict lookups instead of several DataFrame scans.
+    New rows are collected and appended in one go by `apply()`.
+    """
+
+    def __init__(self, df, remarks="bulk imported", allow_new_districts=True,
+                 validate_coords=True, rejected_lookup=None, leases=None, allocation_policy=ALLOCATION_POLICY,
+                 registry=None, resolve_names=True, geocoder=None):
+        self.remarks = f"{remarks} on {datetime.today().strftime('%Y-%m-%d')}"
+        self.allow_new_districts = allow_new_districts
+        self.validate_coords = validate_coords
+        self.rejected_lookup = rejected_lookup or {}
+        self.registry = registry or get_registry()
+        # Spelling variants ("KPK", "D.I. Khan") are mapped to registered names per batch
+        self.resolver = NameResolver(self.registry) if resolve_names else None
+        # Optional ReverseGeocoder: blank province/district are filled from coordinates
+        self.geocoder = geocoder
+
+        self.districts = {k: v[0] for k, v in _first_by(df, ["province", "district"], ["district_pcode"]).items()}
+        self.tehsils = {k: v[0] for k, v in _first_by(df, ["district_pcode", "tehsil"], ["tehsil_pcode"]).items()}
+        self.ucs = _first_by(df, ["tehsil_pcode", "uc"], ["uc_id", "uc_prefix"])
+
+        district_pcodes = df["district_pcode"].dropna().astype(str)
+        self.max_district = _max_code(district_pcodes.str[-2:], df.loc[district_pcodes.index, "province_pcode"])
+        self.max_tehsil = _max_code(df["tehsil_code"], df["district_pcode"])
+        self.max_uc = _max_code(df["uc_id"], df["tehsil_pcode"])
+        self.max_suffix = _max_code(df["village/settlement_code"], df["uc_prefix"])
+
+        # New codes start above active leases; codes taken from a lease are kept as given
+        self.leased_codes = None
+        if leases is not None:
+            for uc_prefix, top in leases.reserved_maxima().items():
+                self.max_suffix[uc_prefix] = max(self.max_suffix.get(uc_prefix, 0), top)
+            self.leased_codes = leases.leased_codes()
+            self.existing_codes = set(df["village_pcode_new"].dropna().astype(str))
+        self.lease_used = []
+
+        # Only needed once a UC runs past suffix 999
+        self._df = df
+        self._leases = leases
+        self.allocation_policy = allocation_policy
+        self._free = {}
+
+        self.rows = []
+        self.added = []
+        self.warnings = []
+        self.skipped_rejected = []
+
+    def _warn(self, message):
+        self.warnings.append(message)
+
+    def _coords(self, lat, lon, vill, row_no):
+        """
+        Returns (lat, lon) as 6-decimal strings, (None, None) if absent, or False if invalid.
+        """
+        if not (lat and lon):
+            return None, None
+        try:
+            lat_f = float(lat)
+            lon_f = float(lon)
+        except ValueError:
+            self._warn(f"⚠️ Invalid lat/lon format in row {row_no}")
+            return False
+        if not (23 <= lat_f <= 37) or not (60 <= lon_f <= 77):
+            self._warn(f"⚠️ Invalid coordinates for '{vill}' in row {row_no}")
+            return False
+        return f"{lat_f:.6f}", f"{lon_f:.6f}"
+
+    def _district(self, prov, prov_pcode, dist, row_no):
+        registered = self.registry.district_code(dist)
+        if not self.allow_new_districts:
+            return registered
+        dist_pcode = self.districts.get((prov, dist))
+        if dist_pcode:
+            return dist_pcode
+        if registered:
+            dist_pcode = registered
+            # sanity check: district code should match province
+            if not dist_pcode.startswith(prov_pcode):
+                self._warn(f"⚠️ District '{dist}' code {dist_pcode} doesn't match province {prov_pcode}. Skipping row {row_no}.")
+                return None
+        else:
+            # Truly new district → next code after both the registry and the masterlist
+            registry_max = int(self.registry.next_code(prov_pcode)[-2:]) - 1
+            next_code = max(self.max_district.get(prov_pcode, 0), registry_max) + 1
+            dist_pcode = f"{prov_pcode}{str(next_code).zfill(2)}"
+        self.districts[(prov, dist)] = dist_pcode
+        if dist_pcode[-2:].isdigit():
+            self.max_district[prov_pcode] = max(self.max_district.get(prov_pcode, 0), int(dist_pcode[-2:]))
+        return dist_pcode
+
+    def _reused_suffix(self, uc_prefix):
+        """
+        Next suffix no longer present in the masterlist, for the "reuse_when_full" policy.
+        """
+        if self.allocation_policy != "reuse_when_full":
+            return None
+        if uc_prefix not in self._free:
+            taken = {int(r["village/settlement_code"]) for r in self.rows if r["uc_prefix"] == uc_prefix}
+            if self._leases is not None:
+                taken |= self._leases.leased_suffixes(uc_prefix)
+            self._free[uc_prefix] = iter(free_suffixes(self._df, uc_prefix, taken))
+        return next(self._free[uc_prefix], None)
+
+    def _leased_code(self, code, uc_prefix, row_no):
+        """
+        Returns `code` if it is a lease code for this UC (LeaseStore.leased_codes) that is
+        not in the masterlist yet, else None.
+        """
+        if self.leased_codes is None or not code:
+            return None
+        lease_id = self.leased_codes.get(code)
+        if lease_id is None or not code.startswith(uc_prefix) or code in self.existing_codes:
+            self._warn(f"⚠️ '{code}' in row {row_no} is not an unused lease code for {uc_prefix}; a new code was assigned.")
+            return None
+        self.existing_codes.add(code)
+        self.lease_used.append((lease_id, code))
+        # An expired lease no longer raises max_suffix, so new codes must start above it here
+        self.max_suffix[uc_prefix] = max(self.max_suffix.get(uc_prefix, 0), int(code[-3:]))
+        return code
+
+    def add(self, row, row_no=None, village_field="village_name"):
+        """
+        Resolves and allocates one import row (a dict with IMPORT_COLUMNS, plus an
+        optional village_pcode_new the team took from its lease).
+        Returns the new village P-code, or None if the row was skipped.
+        """
+        prov = _text(row.get("province"))
+        dist = _text(row.get("district"))
+        teh = _text(row.get("tehsil"))
+        uc = _text(row.get("uc"))
+        vill = _text(row.get(village_field))
+
+        if not all([prov, dist, teh, uc, vill]):
+            return None
+
+        prov_pcode = self.registry.code(prov)
+        if prov_pcode is None:
+            self._warn(f"⚠️ Province '{prov}' not found (Row {row_no})")
+            return None
+        if not self.allow_new_districts and self.registry.district_code(dist) is None:
+            self._warn(f"⚠️ Invalid province/district in row {row_no}: {prov}, {dist}")
+            return None
+
+        if self.validate_coords:
+            coords = self._coords(_text(row.get("latitude")), _text(row.get("longitude")), vill, row_no)
+            if coords is False:
+                return None
+            lat, lon = coords
+        else:
+            lat, lon = row.get("latitude"), row.get("longitude")
+
+        prov_code = prov_pcode.replace("PK", "")
+
+        dist_pcode = self._district(prov, prov_pcode, dist, row_no)
+        if dist_pcode is None:
+            return None
+        dist_code = dist_pcode[-2:]
+
+        # Tehsil
+        teh_pcode = self.tehsils.get((dist_pcode, teh))
+        if teh_pcode is None:
+            next_teh = self.max_tehsil.get(dist_pcode, 0) + 1
+            teh_pcode = f"{dist_pcode}{str(next_teh).zfill(2)}"
+            self.tehsils[(dist_pcode, teh)] = teh_pcode
+            self.max_tehsil[dist_pcode] = next_teh
+        teh_code = teh_pcode[-2:]
+
+        # UC
+        uc_entry = self.ucs.get((teh_pcode, uc))
+        if uc_entry is None:
+            next_uc = self.max_uc.get(teh_pcode, 0) + 1
+            uc_entry = (str(next_uc).zfill(3), f"{teh_pcode}{str(next_uc).zfill(3)}")
+            self.ucs[(teh_pcode, uc)] = uc_entry
+            self.max_uc[teh_pcode] = next_uc
+        uc_id, uc_prefix = uc_entry
+
+        # Skip resubmissions of villages already rejected in this UC
+        if uc_prefix in self.rejected_lookup.get(normalise_name(vill), ()):
+            self.skipped_rejected.append((vill, uc_prefix))
+            return None
+
+        # Village
+        village_pcode = self._leased_code(_text(row.get("village_pcode_new")), uc_prefix, row_no)
+        if village_pcode:
+            village_code = village_pcode[-3:]
+        else:
+            next_suffix = self.max_suffix.get(uc_prefix, 0) + 1
+            if next_suffix > MAX_SUFFIX:
+                next_suffix = self._reused_suffix(uc_prefix)
+                if next_suffix is None:
+                    self._warn(f"⚠️ UC {uc_prefix} has no village codes left (suffix limit {MAX_SUFFIX}). Skipping row {row_no}.")
+                    return None
+            else:
+                self.max_suffix[uc_prefix] = next_suffix
+            village_code = str(next_suffix).zfill(3)
+            village_pcode = f"{uc_prefix}{village_code}"
+            if self.leased_codes is not None:
+                self.existing_codes.add(village_pcode)
+
+        self.rows.append({
+            "province": prov,
+            "province_code": prov_code,
+            "province_pcode": prov_pcode,
+            "district": dist,
+            "district_code": dist_code,
+            "district_pcode": dist_pcode,
+            "tehsil": teh,
+            "tehsil_code": teh_code,
+            "tehsil_pcode": teh_pcode,
+            "uc": uc,
+            "uc_id": uc_id,
+            "uc/vc/nc_pcode": uc_prefix,
+            "uc_prefix": uc_prefix,
+            "village_name": vill,
+            "village/settlement_code": village_code,
+            "village_pcode_new": village_pcode,
+            "latitude": lat,
+            "longitude": lon,
+            "remarks": self.remarks,
+        })
+        self.added.append((vill, village_pcode))
+        return village_pcode
+
+    def add_frame(self, frame, first_row_no=2, village_field="village_name"):
+        """
+        Processes a batch of import rows; row numbers default to spreadsheet numbering.
+        """
+        start = time.perf_counter()
+        added, rejected = len(self.added), len(self.skipped_rejected)
+        if self.resolver is not None:
+            frame = self.resolver.resolve_frame(frame)
+        if self.geocoder is not None:
+            frame = self.geocoder.fill_missing(frame)
+        for offset, row in enumerate(frame.to_dict("records")):
+            self.add(row, first_row_no + offset, village_field)
+
+        IMPORT_BATCH_SECONDS.observe(time.perf_counter() - start)
+        added, rejected = len(self.added) - added, len(self.skipped_rejected) - rejected
+        IMPORT_ROWS.labels("added").inc(added)
+        IMPORT_ROWS.labels("rejected").inc(rejected)
+        IMPORT_ROWS.labels("invalid").inc(len(frame) - added - rejected)
+
+    def apply(self, df):
+        """
+        Appends every accepted row to the masterlist in a single batch.
+        """
+        return append_villages(df, self.rows)
+
+
+def iter_import_batches(path, batch_size=10000):
+    """
+    Streams an import file (.csv or .xlsx) as string DataFrames of at most `batch_size` rows.
+    """
+    if path.lower().endswith(".csv"):
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=batch_size)
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        batch = []
+        for row in rows:
+            values = ["" if v is None else str(v) for v in row[:len(header)]]
+            batch.append(values + [""] * (len(header) - len(values)))
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        wb.close()
+
+
+def import_file(df, path, batch_size=10000, rejections=None, **importer_options):
+    """
+    Runs a whole import file through one VillageImporter, batch by batch.
+    `rejections` (a RejectionHistory) is consulted per batch for already-rejected villages.
+    Returns (new_df, importer).
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    importer = VillageImporter(df, **importer_options)
+    row_no = 2
+    for batch in iter_import_batches(path, batch_size):
+        if rejections is not None and "village_name" in batch.columns:
+            importer.rejected_lookup.update(rejections.lookup_names(batch["village_name"]))
+        importer.add_frame(batch, row_no)
+        row_no += len(batch)
+    return importer.apply(df), importer
@@ -0,0 +1,183 @@
+# app/kml_parser.py
+#
+# Reads village points and UC boundaries from field-app KML files (Tab 7).
+#
+# Admin names are taken from, in order of preference:
+#   ExtendedData       <Data name="District"><value>..</value></Data> and
+#                      <SchemaData><SimpleData name="District">..</SimpleData></SchemaData>
+#   HTML tables        <td>District</td><td>Thatta</td> in the description
+#   key/value lines    "District: Thatta<br>" in the description (also what
+#                      write_combined_kml in the app emits)
+#
+# Labels are matched exactly against LABELS after normalising case, spacing and
+# punctuation, so "UC" no longer matches inside labels such as "UC Code" or "Source".
+# The file is streamed with ElementTree.iterparse and each placemark is cleared once
+# read, so large KMLs are parsed in one pass without building a DOM.
+
+import html
+import re
+import xml.etree.ElementTree as ET
+
+FIELDS = ("Province", "District", "Tehsil", "UC")
+
+# normalised label -> field
+LABELS = {
+    "province": "Province",
+    "province name": "Province",
+    "district": "District",
+    "district name": "District",
+    "tehsil": "Tehsil",
+    "tehsil name": "Tehsil",
+    "taluka": "Tehsil",
+    "tehsil taluka": "Tehsil",
+    "uc": "UC",
+    "uc name": "UC",
+    "union council": "UC",
+    "union council name": "UC",
+    "uc vc nc": "UC",
+}
+
+_CELL = re.compile(r"<t[dh]\b[^>]*>(.*?)</t[dh]\s*>", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]+>")
+_LINE_BREAK = re.compile(r"<br\s*/?>|</p\s*>|</div\s*>|</li\s*>|\r?\n", re.IGNORECASE)
+_KEY_VALUE = re.compile(r"^\s*([^:=]{1,40}?)\s*[:=]\s*(.*?)\s*$", re.DOTALL)
+_LABEL_JUNK = re.compile(r"[^a-z]+")
+
+
+def _clean(text) -> str:
+    return html.unescape(_TAG.sub("", text or "")).strip()
+
+
+def _field(label):
+    return LABELS.get(_LABEL_JUNK.sub(" ", label.lower()).strip())
+
+
+def empty_fields() -> dict:
+    return dict.fromkeys(FIELDS, "")
+
+
+def parse_description(description) -> dict:
+    """
+    Admin fields from a placemark description (HTML table or "Key: value" lines).
+    Numeric values (codes in a "UC" column, say) are ignored.
+    """
+    fields = empty_fields()
+    if not description:
+        return fields
+    cells = _CELL.findall(description)
+    if cells:
+        cells = [_clean(c) for c in cells]
+        pairs = zip(cells, cells[1:])
+    else:
+        lines = map(_clean, _LINE_BREAK.split(description))
+        pairs = (m.groups() for m in map(_KEY_VALUE.match, lines) if m)
+    for label, value in pairs:
+        field = _field(label)
+        if field and value and not value.isdigit():
+            fields[field] = value
+    return fields
+
+
+def _local(tag) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _ring(text) -> list:
+    return [tuple(float(v) for v in point.split(",")[:2]) for point in (text or "").split()]
+
+
+def _polygon_rings(polygon) -> list:
+    """
+    [outer ring, *inner rings] of a Polygon element, each a list of (lon, lat).
+    """
+    outer, inner = [], []
+    for boundary in polygon:
+        side = _local(boundary.tag)
+        if side not in ("outerBoundaryIs", "innerBoundaryIs"):
+            continue
+        for elem in boundary.iter():
+            if _local(elem.tag) == "coordinates":
+                (outer if side == "outerBoundaryIs" else inner).append(_ring(elem.text))
+    return outer[:1] + inner if outer else []
+
+
+def _read_placemark(placemark):
+    """
+    (name, coordinates text, description, ExtendedData fields, polygons) of one
+    Placemark element.
+    """
+    name = coords = description = None
+    extended = empty_fields()
+    polygons = []
+    for elem in placemark.iter():
+        tag = _local(elem.tag)
+        if tag == "Polygon":
+            rings = _polygon_rings(elem)
+            if rings:
+                polygons.append(rings)
+        elif tag == "name" and name is None:
+            name = (elem.text or "").strip()
+        elif tag == "coordinates" and coords is None:
+            coords = (elem.text or "").strip()
+        elif tag == "description" and description is None:
+            description = elem.text or ""
+        elif tag in ("Data", "SimpleData"):
+            field = _field(elem.get("name", ""))
+            if field:
+                value = elem.text if tag == "SimpleData" else next(
+                    (child.text for child in elem if _local(child.tag) == "value"), None)
+                value = _clean(value)
+                if value and not value.isdigit():
+                    extended[field] = value
+    return name, coords, description, extended, polygons
+
+
+def parse_kml(source, file_name=""):
+    """
+    Parses a KML file (path or file object). Returns (villages, boundaries): a dict per
+    point placemark with File/Country/Province/District/Tehsil/UC/Village Name/Latitude/
+    Longitude, and a dict per polygon or line with File/Name/Description/Coordinates,
+    the admin fields and Polygons (a list of [outer ring, *holes] in lon/lat).
+    Points without admin information reuse the first complete set seen in the file.
+    Raises xml.etree.ElementTree.ParseError for malformed files.
+    """
+    villages, boundaries = [], []
+    fallback_admin = None
+
+    for _, elem in ET.iterparse(source, events=("end",)):
+        if _local(elem.tag) != "Placemark":
+            continue
+        name, coords, description, extended, polygons = _read_placemark(elem)
+        elem.clear()
+        if not name or not coords:
+            continue
+
+        admin = parse_description(description)
+        admin.update({k: v for k, v in extended.items() if v})
+        if any(admin.values()):
+            if fallback_admin is None and all(admin.values()):
+                fallback_admin = admin
+        elif fallback_admin:
+            admin = dict(fallback_admin)
+
+        points = coords.split()
+        if len(points) == 1:
+            lon, lat, *_ = points[0].split(",")
+            villages.append({
+                "File": file_name,
+                "Country": "Pakistan",
+                **admin,
+                "Village Name": name,
+                "Latitude": float(lat),
+                "Longitude": float(lon),
+            })
+        else:
+            boundaries.append({
+                "File": file_name,
+                "Name": name,
+                "Description": description or "",
+                "Coordinates": points,
+                **admin,
+                "Polygons": polygons,
+            })
+    return villages, boundaries
@@ -0,0 +1,206 @@
+# app/leases.py
+#
+# Code-reservation leases for field teams that work offline. A lease holds a contiguous
+# block of village suffixes under one uc_prefix for a team until it expires. Leases are
+# stored next to the approval queue in SQLite, so handing out a code from a lease is a
+# small indexed query and never touches the masterlist.
+#
+# While a lease is active, normal allocation (Add Village, bulk import, CLI, API) starts
+# above it. Once it expires or is released, the unused codes are free again.
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from app.code_generator import MAX_SUFFIX
+from app.config import APPROVAL_DB_PATH, LEASE_DAYS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    team TEXT NOT NULL,
+    uc_prefix TEXT NOT NULL,
+    first_suffix INTEGER NOT NULL,
+    last_suffix INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    released_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_leases_uc ON leases (uc_prefix, expires_at);
+CREATE TABLE IF NOT EXISTS lease_usage (
+    lease_id INTEGER NOT NULL,
+    suffix INTEGER NOT NULL,
+    used_at TEXT NOT NULL,
+    PRIMARY KEY (lease_id, suffix)
+);
+"""
+
+ACTIVE = "released_at IS NULL AND expires_at > ?"
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _dicts(cursor):
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def lease_codes(lease) -> list:
+    return [f"{lease['uc_prefix']}{str(s).zfill(3)}" for s in range(lease["first_suffix"], lease["last_suffix"] + 1)]
+
+
+class LeaseStore:
+    """
+    Persistent suffix-range leases per uc_prefix.
+    """
+
+    def __init__(self, db_path=APPROVAL_DB_PATH, conn=None):
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+        self._conn = conn
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _get(self, lease_id):
+        rows = _dicts(self._conn.execute("SELECT * FROM leases WHERE id = ?", (int(lease_id),)))
+        if not rows:
+            raise ValueError(f"Lease {lease_id} not found.")
+        return rows[0]
+
+    def reserved_max(self, uc_prefix) -> int:
+        """
+        Highest suffix held by an active lease under `uc_prefix` (0 if none).
+        """
+        row = self._conn.execute(
+            f"SELECT MAX(last_suffix) FROM leases WHERE uc_prefix = ? AND {ACTIVE}", (uc_prefix, _now())
+        ).fetchone()
+        return row[0] or 0
+
+    def reserved_maxima(self) -> dict:
+        """
+        {uc_prefix: highest leased suffix} for every UC with an active lease.
+        """
+        rows = self._conn.execute(
+            f"SELECT uc_prefix, MAX(last_suffix) FROM leases WHERE {ACTIVE} GROUP BY uc_prefix", (_now(),)
+        ).fetchall()
+        return {uc: top for uc, top in rows}
+
+    def create(self, team, uc_prefix, count, current_max, days=LEASE_DAYS) -> dict:
+        """
+        Leases `count` consecutive suffixes under `uc_prefix` to `team`, starting above
+        both `current_max` (the masterlist's highest suffix) and any active lease.
+        """
+        if count < 1:
+            raise ValueError("A lease needs at least one code.")
+        with self._lock, self._conn:
+            first = max(int(current_max), self.reserved_max(uc_prefix)) + 1
+            last = first + int(count) - 1
+            if last > MAX_SUFFIX:
+                raise ValueError(f"Only {max(MAX_SUFFIX - first + 1, 0)} codes are left under {uc_prefix}.")
+            now = datetime.now()
+            cur = self._conn.execute(
+                "INSERT INTO leases (team, uc_prefix, first_suffix, last_suffix, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (team, uc_prefix, first, last, now.isoformat(timespec="seconds"),
+                 (now + timedelta(days=days)).isoformat(timespec="seconds")),
+            )
+        return self._get(cur.lastrowid)
+
+    def active(self, uc_prefix=None, team=None) -> list:
+        sql, params = f"SELECT * FROM leases WHERE {ACTIVE}", [_now()]
+        if uc_prefix:
+            sql += " AND uc_prefix = ?"
+            params.append(uc_prefix)
+        if team:
+            sql += " AND team = ?"
+            params.append(team)
+        leases = _dicts(self._conn.execute(sql + " ORDER BY id", params))
+        for lease in leases:
+            lease["used"] = self._conn.execute(
+                "SELECT COUNT(*) FROM lease_usage WHERE lease_id = ?", (lease["id"],)
+            ).fetchone()[0]
+        return leases
+
+    def allocate(self, lease_id, count=1) -> list:
+        """
+        Hands out the lowest unused codes of an active lease and marks them used.
+        """
+        with self._lock, self._conn:
+            lease = self._get(lease_id)
+            if lease["released_at"] or lease["expires_at"] <= _now():
+                raise ValueError(f"Lease {lease_id} is no longer active.")
+            used = {r[0] for r in self._conn.execute("SELECT suffix FROM lease_usage WHERE lease_id = ?", (lease["id"],))}
+            free = [s for s in range(lease["first_suffix"], lease["last_suffix"] + 1) if s not in used][:count]
+            if len(free) < count:
+                raise ValueError(f"Lease {lease_id} has only {len(free)} unused codes left.")
+            self._conn.executemany(
+                "INSERT INTO lease_usage (lease_id, suffix, used_at) VALUES (?, ?, ?)",
+                [(lease["id"], s, _now()) for s in free],
+            )
+        return [f"{lease['uc_prefix']}{str(s).zfill(3)}" for s in free]
+
+    def leased_suffixes(self, uc_prefix) -> set:
+        """
+        Every suffix held by an active lease under `uc_prefix`.
+        """
+        return {s for lease in self.active(uc_prefix) for s in range(lease["first_suffix"], lease["last_suffix"] + 1)}
+
+    def leased_codes(self) -> dict:
+        """
+        {village_pcode: lease_id} for codes a team may have assigned in the field, so an
+        import can recognise them: every code of an active or expired lease (teams keep
+        using a lease they could not sync in time) and the handed-out codes of released
+        ones. The importer still refuses codes that are already in the masterlist.
+        """
+        codes = {}
+        for lease in _dicts(self._conn.execute("SELECT * FROM leases WHERE released_at IS NULL ORDER BY id")):
+            codes.update(dict.fromkeys(lease_codes(lease), lease["id"]))
+        used = self._conn.execute(
+            "SELECT l.id, l.uc_prefix, u.suffix FROM leases l JOIN lease_usage u ON u.lease_id = l.id "
+            "WHERE l.released_at IS NOT NULL ORDER BY l.id"
+        ).fetchall()
+        codes.update({f"{uc_prefix}{str(suffix).zfill(3)}": lease_id for lease_id, uc_prefix, suffix in used})
+        return codes
+
+    def mark_used(self, used) -> int:
+        """
+        Records (lease_id, village_pcode) pairs consumed by an import.
+        """
+        entries = [(int(lease_id), int(code[-3:]), _now()) for lease_id, code in used]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO lease_usage (lease_id, suffix, used_at) VALUES (?, ?, ?)", entries
+            )
+        return len(entries)
+
+    def release(self, lease_id) -> bool:
+        """
+        Ends a lease early; its unused codes become available to normal allocation.
+        """
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE leases SET released_at = ? WHERE id = ? AND released_at IS NULL", (_now(), int(lease_id))
+            )
+        return cur.rowcount > 0
+
+    def reclaim_expired(self) -> int:
+        """
+        Closes every expired lease. Returns how many unused codes were returned to the pool.
+        """
+        now = _now()
+        with self._lock, self._conn:
+            expired = self._conn.execute(
+                "SELECT id, last_suffix - first_suffix + 1 FROM leases WHERE released_at IS NULL AND expires_at <= ?",
+                (now,),
+            ).fetchall()
+            unused = 0
+            for lease_id, size in expired:
+                used = self._conn.execute("SELECT COUNT(*) FROM lease_usage WHERE lease_id = ?", (lease_id,)).fetchone()[0]
+                unused += size - used
+            self._conn.executemany("UPDATE leases SET released_at = ? WHERE id = ?", [(now, i) for i, _ in expired])
+        return unused
@@ -0,0 +1,284 @@
+# app/metrics.py
+#
+# Process-wide counters, gauges and histograms in the Prometheus text format, without
+# extra packages. The loader, code generators, updater, importer, exporter, commit
+# queue and API report here; the text is served by the API on GET /metrics and, when
+# METRICS_FILE is set, written to that file every METRICS_INTERVAL seconds for the
+# node_exporter textfile collector (the Streamlit app has no endpoint of its own).
+#
+#     LOADS = counter("masterlist_loads_total", "Masterlist workbook loads")
+#     LOADS.inc()
+#     SAVE_SECONDS = histogram("masterlist_save_seconds", "Time to write the workbook")
+#     with SAVE_SECONDS.time():
+#         ...
+#     IMPORT_ROWS = counter("import_rows_total", "Import rows processed", ["outcome"])
+#     IMPORT_ROWS.labels("added").inc(120)
+#
+# Metrics are created once per name: calling counter()/gauge()/histogram() again with
+# the same name returns the existing metric, so modules that are re-executed (the
+# Streamlit script) can declare them inline. Updates take an uncontended lock and a
+# few attribute operations, so they can sit on per-call paths; per-row loops should
+# still report once per batch.
+
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import METRICS_FILE, METRICS_INTERVAL
+
+# Seconds, from a cached lookup to a national-scale workbook load
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _CounterValue:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [("", (), self.value)]
+
+
+class _GaugeValue:
+    def __init__(self):
+        self.value = 0.0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        with self._lock:
+            self.value = float(value)
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """
+        Reads the value from `function()` at collection time instead (queue sizes).
+        """
+        self._function = function
+
+    def samples(self):
+        value = self.value
+        if self._function is not None:
+            try:
+                value = float(self._function())
+            except Exception:
+                value = float("nan")
+        return [("", (), value)]
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        out, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            out.append(("_bucket", (("le", _format_value(bound)),), cumulative))
+        out.append(("_sum", (), total))
+        out.append(("_count", (), cumulative))
+        return out
+
+
+class Metric:
+    """
+    A named metric with optional labels. Without labels it behaves like its single
+    value (inc/set/observe/time); with labels, `labels(*values)` returns the value
+    for that label combination.
+    """
+
+    def __init__(self, kind, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_value(self):
+        if self.kind == "counter":
+            return _CounterValue()
+        if self.kind == "gauge":
+            return _GaugeValue()
+        return _HistogramValue(self.buckets)
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}.")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_value())
+        return child
+
+    def __getattr__(self, attr):
+        # inc/dec/set/set_function/observe/time of the unlabelled value
+        if attr.startswith("_") or "_default" not in self.__dict__:
+            raise AttributeError(attr)
+        return getattr(self._default, attr)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            for suffix, extra, value in child.samples():
+                lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, kind, name, documentation, labelnames=(), **options) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric(kind, name, documentation, labelnames, **options)
+            elif metric.kind != kind or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind} {metric.labelnames}.")
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=(), registry=REGISTRY) -> Metric:
+    return registry.get_or_create("counter", name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=(), registry=REGISTRY) -> Metric:
+    return registry.get_or_create("gauge", name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY) -> Metric:
+    return registry.get_or_create("histogram", name, documentation, labelnames, buckets=buckets)
+
+
+def timed(metric):
+    """
+    Decorator observing the call's duration in a histogram (or one labelled value).
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def render(registry=REGISTRY) -> str:
+    return registry.render()
+
+
+def write_textfile(path=METRICS_FILE, registry=REGISTRY):
+    """
+    Writes the metrics to `path` atomically (temp file + rename), as the
+    node_exporter textfile collector expects.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".metrics-", suffix=".prom", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(registry.render())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def start_textfile_writer(path=METRICS_FILE, interval=METRICS_INTERVAL):
+    """
+    Rewrites the metrics file every `interval` seconds from a daemon thread (once per
+    process; a no-op when no path is configured).
+    """
+    global _writer
+    if not path:
+        return None
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            def run():
+                while True:
+                    try:
+                        write_textfile(path)
+                    except OSError:
+                        pass
+                    time.sleep(interval)
+
+            _writer = threading.Thread(target=run, name="metrics-writer", daemon=True)
+            _writer.start()
+    return _writer
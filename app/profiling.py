@@ -0,0 +1,233 @@
+# app/profiling.py
+#
+# Opt-in timing of Streamlit reruns (APP_PROFILING=1, or ?profile=1 in the app URL).
+#
+# A Profiler lives in a session's state and records one Rerun per script run: a tree of
+# named spans with their duration and, while tracemalloc is tracing, the change in
+# Python-allocated memory and the peak above the span's starting point. Code anywhere
+# in the app marks its work with
+#
+#     with span("format_code_columns"):
+#         ...
+#
+# or the @profiled decorator. Both are a single ContextVar lookup when no rerun is being
+# recorded, so they can stay on hot paths. The last PROFILING_RERUNS reruns are kept and
+# can be exported as a Chrome trace (chrome://tracing, Perfetto).
+#
+# tracemalloc is process-wide: memory figures include allocations other sessions and
+# the watcher/writer threads make during the span, and tracing slows allocation-heavy
+# code down noticeably. It is only on while some session is recording a rerun, and is
+# stopped again when the last one finishes (unless something else had started it).
+# PROFILING_MEMORY=0 records timings only.
+
+import contextvars
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import pandas as pd
+
+from app.config import PROFILING_MEMORY, PROFILING_RERUNS
+
+_active = contextvars.ContextVar("profiling_rerun", default=None)
+_NOOP = nullcontext()
+
+# Reruns recording memory right now, across sessions, and whether we started tracemalloc
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_started_tracing = False
+
+
+def _trace_memory():
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing_users += 1
+
+
+def _untrace_memory():
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        _tracing_users -= 1
+        if not _tracing_users and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+class Rerun:
+    """
+    The spans recorded during one script run, in the order they started.
+    """
+
+    def __init__(self, number, label=""):
+        self.number = number
+        self.label = label
+        self.started_at = datetime.now()
+        self._wall = time.time()
+        self._t0 = time.perf_counter()
+        self.memory = tracemalloc.is_tracing()
+        self.spans = []
+        self._stack = []
+        self.duration = None
+
+    def _now(self):
+        return time.perf_counter() - self._t0
+
+    @contextmanager
+    def span(self, name):
+        entry = {"name": name, "depth": len(self._stack), "start": self._now(), "duration": None,
+                 "mem_delta": None, "mem_peak": None}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak is reset per span; the enclosing span keeps what it had seen so far
+            if self._stack:
+                self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], peak)
+            tracemalloc.reset_peak()
+            entry["_mem"], entry["_peak"] = current, current
+        self.spans.append(entry)
+        self._stack.append(entry)
+        try:
+            yield entry
+        finally:
+            self._stack.pop()
+            entry["duration"] = self._now() - entry["start"]
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                entry["_peak"] = max(entry["_peak"], peak)
+                start = entry.pop("_mem")
+                entry["mem_delta"] = current - start
+                entry["mem_peak"] = entry["_peak"] - start
+                if self._stack:
+                    self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], entry["_peak"])
+                del entry["_peak"]
+
+    def close(self):
+        self.duration = self._now()
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        One row per span: indented name, ms, memory change and peak in MB.
+        """
+        rows = [{
+            "span": "  " * s["depth"] + s["name"],
+            "ms": round(s["duration"] * 1000, 1) if s["duration"] is not None else None,
+            "start_ms": round(s["start"] * 1000, 1),
+            "mem_delta_mb": round(s["mem_delta"] / 2**20, 2) if s["mem_delta"] is not None else None,
+            "mem_peak_mb": round(s["mem_peak"] / 2**20, 2) if s["mem_peak"] is not None else None,
+        } for s in self.spans]
+        return pd.DataFrame(rows, columns=["span", "ms", "start_ms", "mem_delta_mb", "mem_peak_mb"])
+
+    def trace_events(self, pid=1) -> list:
+        """
+        Chrome trace "complete" events, one thread row per rerun.
+        """
+        base = self._wall * 1e6
+        events = [{"name": f"rerun {self.number}", "cat": "rerun", "ph": "X", "pid": pid, "tid": self.number,
+                   "ts": base, "dur": (self.duration or 0) * 1e6, "args": {"label": self.label}}]
+        for s in self.spans:
+            args = {}
+            if s["mem_delta"] is not None:
+                args = {"mem_delta_bytes": s["mem_delta"], "mem_peak_bytes": s["mem_peak"]}
+            events.append({"name": s["name"], "cat": "span", "ph": "X", "pid": pid, "tid": self.number,
+                           "ts": base + s["start"] * 1e6, "dur": (s["duration"] or 0) * 1e6, "args": args})
+        return events
+
+
+class Profiler:
+    """
+    Keeps the last `keep` reruns of one session.
+    """
+
+    def __init__(self, keep=PROFILING_RERUNS, memory=PROFILING_MEMORY):
+        self.reruns = deque(maxlen=keep)
+        self.memory = memory
+        self._count = 0
+        self._token = None
+        self._tracing = False
+        self.current = None
+
+    def start(self, label="") -> Rerun:
+        if self.current is not None:
+            # The previous run never reached finish(); drop it so it stops holding tracing
+            self.current = None
+            self._release()
+            try:
+                _active.reset(self._token)
+            except ValueError:
+                pass  # set in another script run's context, which has ended
+        if self.memory:
+            _trace_memory()
+            self._tracing = True
+        self._count += 1
+        self.current = Rerun(self._count, label)
+        self._token = _active.set(self.current)
+        return self.current
+
+    def finish(self):
+        if self.current is None:
+            return None
+        rerun, self.current = self.current, None
+        rerun.close()
+        _active.reset(self._token)
+        self._release()
+        self.reruns.append(rerun)
+        return rerun
+
+    def _release(self):
+        if self._tracing:
+            self._tracing = False
+            _untrace_memory()
+
+    def summary(self) -> pd.DataFrame:
+        """
+        One row per kept rerun, newest first, with its slowest top-level span.
+        """
+        rows = []
+        for rerun in reversed(self.reruns):
+            top = [s for s in rerun.spans if s["depth"] == 0 and s["duration"] is not None]
+            slowest = max(top, key=lambda s: s["duration"], default=None)
+            rows.append({
+                "rerun": rerun.number,
+                "at": rerun.started_at.strftime("%H:%M:%S"),
+                "label": rerun.label,
+                "ms": round((rerun.duration or 0) * 1000, 1),
+                "slowest": f"{slowest['name']} ({slowest['duration'] * 1000:.0f} ms)" if slowest else "",
+            })
+        return pd.DataFrame(rows, columns=["rerun", "at", "label", "ms", "slowest"])
+
+    def chrome_trace(self) -> dict:
+        events = [e for rerun in self.reruns for e in rerun.trace_events(os.getpid())]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def span(name):
+    """
+    Times a block as part of the rerun being recorded; does nothing otherwise.
+    """
+    rerun = _active.get()
+    return rerun.span(name) if rerun is not None else _NOOP
+
+
+def profiled(name=None):
+    """
+    Decorator form of span(); the span is named after the function by default.
+    """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rerun = _active.get()
+            if rerun is None:
+                return func(*args, **kwargs)
+            with rerun.span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
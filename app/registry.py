@@ -0,0 +1,326 @@
+# app/registry.py
+#
+# Registry of administrative units (province -> district -> tehsil -> UC) kept in a
+# versioned JSON file, data/admin_registry.json. It replaced the hard-coded PROVINCES /
+# DISTRICTS dicts as the source of truth and also records tehsils and UCs, which used
+# to exist only implicitly in the masterlist.
+#
+# The file is loaded into flat dicts (code -> node, (parent, name) -> code) with
+# interned strings, so every lookup is O(1). New units are added with `add()` or picked
+# up from masterlist rows with `sync()`, and `save()` writes the file atomically with
+# the version bumped. Syncing is an explicit step (Add Admin Unit, the registry panel
+# in that tab, or `python -m app.registry sync`), never a side effect of saving the
+# masterlist, so units typed into the workbook by hand are only registered on purpose.
+#
+# Several processes may sync at once, so a save holds a file lock and first merges in
+# units other processes saved since this copy was loaded.
+#
+#   python -m app.registry show
+#   python -m app.registry sync      (add units found in the masterlist)
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from app.config import MASTERLIST_PATH, REGISTRY_PATH
+from app.data_writer import file_lock
+
+LEVELS = ("province", "district", "tehsil", "uc")
+CHILD_KEYS = {"province": "districts", "district": "tehsils", "tehsil": "ucs"}
+CODE_WIDTHS = {"district": 2, "tehsil": 2, "uc": 3}
+
+# masterlist columns holding each level's (name, code)
+FRAME_COLUMNS = {
+    "province": ("province", "province_pcode"),
+    "district": ("district", "district_pcode"),
+    "tehsil": ("tehsil", "tehsil_pcode"),
+    "uc": ("uc", "uc_prefix"),
+}
+
+
+class AdminRegistry:
+    """
+    In-memory view of the registry file. `nodes` maps code -> (level, name, parent code);
+    provinces have parent "".
+    """
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.version = 0
+        self.updated_at = None
+        self.nodes = {}
+        self._children = {}
+        self._by_name = {}
+        self._district_by_name = {}
+        self._signature = None
+        self._lock = threading.RLock()
+        if os.path.exists(path):
+            self.reload()
+
+    # ---- loading ----
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _insert(self, level, code, name, parent):
+        code, name, parent = sys.intern(code), sys.intern(name), sys.intern(parent)
+        self.nodes[code] = (level, name, parent)
+        self._children.setdefault(parent, []).append(code)
+        self._by_name[(parent, name)] = code
+        if level == "district":
+            self._district_by_name[name] = code
+
+    def _load(self, known_only=False):
+        """
+        Inserts the units in the file; with `known_only`, only those not loaded yet.
+        """
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        def walk(items, level, parent):
+            for item in items:
+                if not (known_only and item["code"] in self.nodes):
+                    self._insert(level, item["code"], item["name"], parent)
+                if level in CHILD_KEYS:
+                    walk(item.get(CHILD_KEYS[level], []), LEVELS[LEVELS.index(level) + 1], item["code"])
+
+        walk(data.get("provinces", []), "province", "")
+        self.version = max(self.version, data.get("version", 0)) if known_only else data.get("version", 0)
+        self.updated_at = data.get("updated_at")
+        self._signature = self._stat_signature()
+
+    def reload(self):
+        with self._lock:
+            self.nodes, self._children, self._by_name, self._district_by_name = {}, {}, {}, {}
+            self._load()
+
+    def _merge_saved(self):
+        """
+        Adds units another process saved since the last load, keeping unsaved ones.
+        Called with the file lock held.
+        """
+        if self._stat_signature() not in (None, self._signature):
+            self._load(known_only=True)
+
+    def reload_if_changed(self) -> bool:
+        if self._stat_signature() not in (None, self._signature):
+            self.reload()
+            return True
+        return False
+
+    # ---- lookups ----
+
+    def code(self, name, parent=""):
+        """
+        Code of the unit called `name` under `parent` (a province name needs no parent).
+        """
+        return self._by_name.get((parent, name))
+
+    def district_code(self, name):
+        """
+        District code by name alone (district names are unique across provinces).
+        """
+        return self._district_by_name.get(name)
+
+    def name(self, code):
+        node = self.nodes.get(code)
+        return node[1] if node else None
+
+    def level(self, code):
+        node = self.nodes.get(code)
+        return node[0] if node else None
+
+    def parent(self, code):
+        node = self.nodes.get(code)
+        return node[2] if node else None
+
+    def children(self, code="") -> list:
+        return list(self._children.get(code, []))
+
+    def child_names(self, code="") -> list:
+        return [self.nodes[c][1] for c in self._children.get(code, [])]
+
+    def provinces(self) -> dict:
+        """
+        {province name: code}, in registry order (same shape as the old PROVINCES dict).
+        """
+        return {self.nodes[c][1]: c for c in self._children.get("", [])}
+
+    def districts(self, province_code=None) -> dict:
+        """
+        {district name: code} for one province, or for all (the old DISTRICTS dict).
+        """
+        provinces = [province_code] if province_code else self._children.get("", [])
+        return {self.nodes[d][1]: d for p in provinces for d in self._children.get(p, [])}
+
+    def next_code(self, parent_code) -> str:
+        """
+        Next free child code under `parent_code` (a province, district or tehsil).
+        """
+        level = LEVELS[LEVELS.index(self.level(parent_code)) + 1]
+        width = CODE_WIDTHS[level]
+        suffixes = [int(c[len(parent_code):]) for c in self._children.get(parent_code, []) if c[len(parent_code):].isdigit()]
+        return f"{parent_code}{str(max(suffixes, default=0) + 1).zfill(width)}"
+
+    # ---- changes ----
+
+    def add(self, parent_code, name, code=None) -> str:
+        """
+        Registers a unit under `parent_code` ("" for a province) and returns its code.
+        An existing unit with the same name is returned unchanged.
+        """
+        with self._lock:
+            existing = self.code(name, parent_code)
+            if existing:
+                return existing
+            if parent_code and parent_code not in self.nodes:
+                raise ValueError(f"Parent unit '{parent_code}' is not in the registry.")
+            level = LEVELS[LEVELS.index(self.level(parent_code)) + 1] if parent_code else "province"
+            code = code or self.next_code(parent_code)
+            if code in self.nodes:
+                raise ValueError(f"Code '{code}' is already registered for '{self.nodes[code][1]}'.")
+            self._insert(level, code, name, parent_code)
+            return code
+
+    def unknown_units(self, rows) -> list:
+        """
+        Units in masterlist rows (a DataFrame or list of dicts) that the registry does not
+        know yet, parents first, as (level, code, name, parent code) tuples.
+        """
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        columns = [c for pair in FRAME_COLUMNS.values() for c in pair if c in frame.columns]
+        code_columns = [code for _, code in FRAME_COLUMNS.values() if code in frame.columns]
+        if not code_columns:
+            return []
+        with self._lock:
+            seen = set(self.nodes)
+            unknown = pd.concat([frame[c].notna() & ~frame[c].isin(seen) for c in code_columns], axis=1).any(axis=1)
+            units = []
+            for record in frame.loc[unknown, columns].drop_duplicates().to_dict("records"):
+                parent = ""
+                for level in LEVELS:
+                    name_col, code_col = FRAME_COLUMNS[level]
+                    name, code = record.get(name_col), record.get(code_col)
+                    if not isinstance(code, str) or not code or not isinstance(name, str) or not name.strip():
+                        break
+                    if code not in seen:
+                        units.append((level, code, name.strip(), parent))
+                        seen.add(code)
+                    parent = code
+            return units
+
+    def sync(self, rows) -> int:
+        """
+        Registers every unit in masterlist rows that the registry does not know yet.
+        Saves the file if anything was added and returns the number of units added.
+        """
+        with self._lock, file_lock(self.path):
+            self._merge_saved()
+            units = self.unknown_units(rows)
+            for unit in units:
+                self._insert(*unit)
+            if units:
+                self._write()
+            return len(units)
+
+    def to_dict(self) -> dict:
+        def build(code):
+            level, name, _ = self.nodes[code]
+            item = {"code": code, "name": name}
+            if level in CHILD_KEYS:
+                item[CHILD_KEYS[level]] = [build(c) for c in self._children.get(code, [])]
+            return item
+
+        return {
+            "version": self.version,
+            "updated_at": self.updated_at,
+            "provinces": [build(c) for c in self._children.get("", [])],
+        }
+
+    def save(self):
+        """
+        Writes the registry with the version bumped, merged with units other processes
+        saved meanwhile, via a temp file and atomic rename.
+        """
+        with self._lock, file_lock(self.path):
+            self._merge_saved()
+            self._write()
+
+    def _write(self):
+        """
+        Called with both the in-process and the file lock held.
+        """
+        self.version += 1
+        self.updated_at = datetime.now().isoformat(timespec="seconds")
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json.tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+                f.write("\n")
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._signature = self._stat_signature()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(path=REGISTRY_PATH) -> AdminRegistry:
+    """
+    Process-wide registry, reloaded when the file changes on disk.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None or _registry.path != path:
+            _registry = AdminRegistry(path)
+        else:
+            _registry.reload_if_changed()
+        return _registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Admin-code registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show", help="Print unit counts per level")
+    sync = sub.add_parser("sync", help="Add units found in the masterlist to the registry")
+    sync.add_argument("--file", default=MASTERLIST_PATH)
+    sync.add_argument("--dry-run", action="store_true", help="List the units without registering them")
+    args = parser.parse_args()
+
+    registry = get_registry()
+    if args.command == "sync":
+        from app.watcher import load_masterlist_frame
+
+        frame = load_masterlist_frame(args.file)
+        for level, code, name, parent in registry.unknown_units(frame):
+            print(f"   {level:<9} {code:<12} {name} (under {parent or 'country'})")
+        if args.dry_run:
+            print("🧪 Dry run: registry not written.")
+            return
+        added = registry.sync(frame)
+        print(f"✅ {added} units added (registry version {registry.version}).")
+    else:
+        counts = {level: sum(1 for n in registry.nodes.values() if n[0] == level) for level in LEVELS}
+        print(f"Registry version {registry.version} ({registry.updated_at})")
+        for level, count in counts.items():
+            print(f"   {level:<9} {count}")
+
+
+if __name__ == "__main__":
+    main()
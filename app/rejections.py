@@ -0,0 +1,143 @@
+# app/rejections.py
+#
+# History of rejected villages, stored next to the approval queue in SQLite.
+# Entries are only ever appended; a B-tree index on (name_key, uc_key) makes
+# "was this village already rejected in this UC?" an O(log n) lookup, and
+# compact() folds repeated rejections of the same village into the latest one.
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from app.config import APPROVAL_DB_PATH, LEGACY_REJECTED_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rejections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name_key TEXT NOT NULL,
+    uc_key TEXT NOT NULL,
+    village_name TEXT,
+    uc_prefix TEXT,
+    rejected_on TEXT NOT NULL,
+    reason TEXT,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rejections_key ON rejections (name_key, uc_key);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalise_name(name) -> str:
+    """
+    Case- and whitespace-insensitive key for village names.
+    """
+    if name is None or (isinstance(name, float) and name != name):
+        return ""
+    return _SPACES.sub(" ", str(name)).strip().casefold()
+
+
+def _uc_key(record) -> str:
+    uc = record.get("uc_prefix") or record.get("uc/vc/nc_pcode") or ""
+    return str(uc).strip()
+
+
+class RejectionHistory:
+    """
+    Append-only store of rejected villages keyed by (normalised name, uc_prefix).
+    """
+
+    def __init__(self, db_path=APPROVAL_DB_PATH, conn=None, lock=None):
+        """
+        `conn` and `lock` let the approval queue share its connection; the lock must
+        then be the one guarding that connection's transactions, since compact()'s
+        VACUUM fails while any transaction on it is open.
+        """
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+        self._conn = conn
+        self._conn.executescript(SCHEMA)
+        self._lock = lock or threading.Lock()
+
+    def append(self, rows, reason=None) -> int:
+        """
+        Records rejected rows (dicts or a DataFrame). Rows without a name or UC are ignored.
+        """
+        records = rows.to_dict("records") if isinstance(rows, pd.DataFrame) else list(rows)
+        now = datetime.now().isoformat(timespec="seconds")
+        entries = []
+        for record in records:
+            record = {k: (None if isinstance(v, float) and v != v else v) for k, v in record.items()}
+            name_key, uc_key = normalise_name(record.get("village_name")), _uc_key(record)
+            if name_key and uc_key:
+                entries.append((name_key, uc_key, record.get("village_name"), uc_key,
+                                record.get("rejected_on") or now, reason or record.get("remarks"),
+                                json.dumps(record, default=str)))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO rejections (name_key, uc_key, village_name, uc_prefix, rejected_on, reason, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                entries,
+            )
+        return len(entries)
+
+    def import_legacy_file(self, path=LEGACY_REJECTED_PATH) -> int:
+        """
+        One-time migration of data/rejected_villages.xlsx.
+        """
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_rejections_imported'").fetchone():
+            return 0
+        imported = self.append(pd.read_excel(path, dtype=str)) if os.path.exists(path) else 0
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_rejections_imported', ?)",
+                               (datetime.now().isoformat(timespec="seconds"),))
+        return imported
+
+    def is_rejected(self, village_name, uc_prefix) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM rejections WHERE name_key = ? AND uc_key = ? LIMIT 1",
+            (normalise_name(village_name), str(uc_prefix).strip()),
+        ).fetchone() is not None
+
+    def lookup_names(self, names) -> dict:
+        """
+        Returns {name_key: {uc_prefix, ...}} for every name in `names` that was ever rejected,
+        so a whole upload is checked with a handful of indexed queries.
+        """
+        keys = sorted({normalise_name(n) for n in names} - {""})
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT name_key, uc_key FROM rejections WHERE name_key IN ({', '.join('?' for _ in batch)})",
+                batch,
+            ).fetchall()
+            for name_key, uc_key in rows:
+                found.setdefault(name_key, set()).add(uc_key)
+        return found
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM rejections").fetchone()[0]
+
+    def compact(self) -> int:
+        """
+        Keeps only the latest rejection per (name, UC) and reclaims disk space.
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            with self._conn:
+                cur = self._conn.execute(
+                    "DELETE FROM rejections WHERE id NOT IN "
+                    "(SELECT MAX(id) FROM rejections GROUP BY name_key, uc_key)"
+                )
+            removed = cur.rowcount
+            self._conn.execute("VACUUM")
+        return removed
@@ -0,0 +1,198 @@
+# app/snapshots.py
+#
+# Rolling, deduplicated snapshots of the masterlist.
+#
+# Each snapshot is a small JSON manifest listing row chunks. Chunk boundaries are
+# content-defined (a row whose hash hits a fixed pattern closes the chunk), so an
+# insert or edit only changes the chunks around it and every other chunk is shared
+# with earlier snapshots. Chunks are stored once, gzip-compressed, under objects/.
+#
+# Manifests record the workbook they were taken of (`source`). Listing, pruning to
+# SNAPSHOT_KEEP and restoring only look at the snapshots of one workbook, so saves of
+# other files neither evict the masterlist's snapshots nor get restored over it.
+#
+#   python -m app.snapshots list [--file path]
+#   python -m app.snapshots restore [snapshot_id] [--file path]
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from app.config import MASTERLIST_PATH, SNAPSHOT_DIR, SNAPSHOT_KEEP
+
+BOUNDARY_MASK = 0x3F  # ~64 rows per chunk on average
+MAX_CHUNK_ROWS = 512
+
+
+def _objects_dir(snapshot_dir):
+    return os.path.join(snapshot_dir, "objects")
+
+
+def _atomic_write(path, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _chunk_bounds(row_hashes):
+    """
+    Splits rows into content-defined chunks and returns (start, end) pairs.
+    """
+    bounds = []
+    start = 0
+    cut_points = ((row_hashes & BOUNDARY_MASK) == 0).nonzero()[0]
+    for cut in cut_points.tolist() + [len(row_hashes) - 1]:
+        while cut - start + 1 > MAX_CHUNK_ROWS:
+            bounds.append((start, start + MAX_CHUNK_ROWS))
+            start += MAX_CHUNK_ROWS
+        if cut >= start:
+            bounds.append((start, cut + 1))
+            start = cut + 1
+    return bounds
+
+
+def _same_file(a, b) -> bool:
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def list_snapshots(snapshot_dir=SNAPSHOT_DIR, source=MASTERLIST_PATH):
+    """
+    Returns the manifests of snapshots taken of `source` (of every file if None),
+    newest first.
+    """
+    if not os.path.isdir(snapshot_dir):
+        return []
+    manifests = []
+    for name in os.listdir(snapshot_dir):
+        if name.endswith(".json"):
+            with open(os.path.join(snapshot_dir, name), encoding="utf-8") as f:
+                manifest = json.load(f)
+            if source is None or _same_file(manifest.get("source") or MASTERLIST_PATH, source):
+                manifests.append(manifest)
+    return sorted(manifests, key=lambda m: m["id"], reverse=True)
+
+
+def take_snapshot(df, snapshot_dir=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP, source=MASTERLIST_PATH):
+    """
+    Stores a snapshot of the frame, writing only chunks not already on disk.
+    Returns the snapshot id, or the previous id if nothing changed.
+    """
+    objects_dir = _objects_dir(snapshot_dir)
+    os.makedirs(objects_dir, exist_ok=True)
+
+    df = df.reset_index(drop=True)
+    columns = [str(c) for c in df.columns]
+    column_key = json.dumps(columns).encode("utf-8")
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+    chunks = []
+    for start, end in _chunk_bounds(row_hashes):
+        chunk_id = hashlib.sha1(column_key + row_hashes[start:end].tobytes()).hexdigest()
+        chunk_path = os.path.join(objects_dir, f"{chunk_id}.csv.gz")
+        if not os.path.exists(chunk_path):
+            buf = io.StringIO()
+            df.iloc[start:end].to_csv(buf, index=False, header=False)
+            _atomic_write(chunk_path, gzip.compress(buf.getvalue().encode("utf-8")))
+        chunks.append([chunk_id, end - start])
+
+    existing = list_snapshots(snapshot_dir, source)
+    if existing and existing[0]["columns"] == columns and existing[0]["chunks"] == chunks:
+        return existing[0]["id"]
+
+    snapshot_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    manifest = {
+        "id": snapshot_id,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "source": os.path.abspath(source),
+        "source_mtime": os.path.getmtime(source) if os.path.exists(source) else None,
+        "rows": len(df),
+        "columns": columns,
+        "chunks": chunks,
+    }
+    _atomic_write(os.path.join(snapshot_dir, f"{snapshot_id}.json"), json.dumps(manifest).encode("utf-8"))
+    prune_snapshots(snapshot_dir, keep, source)
+    return snapshot_id
+
+
+def prune_snapshots(snapshot_dir=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP, source=MASTERLIST_PATH):
+    """
+    Drops all but the newest `keep` manifests of `source` and deletes chunks no
+    remaining manifest (of any file) references.
+    """
+    for manifest in list_snapshots(snapshot_dir, source)[keep:]:
+        os.remove(os.path.join(snapshot_dir, f"{manifest['id']}.json"))
+
+    referenced = {chunk_id for m in list_snapshots(snapshot_dir, None) for chunk_id, _ in m["chunks"]}
+    objects_dir = _objects_dir(snapshot_dir)
+    for name in os.listdir(objects_dir):
+        if name.endswith(".csv.gz") and name[:-len(".csv.gz")] not in referenced:
+            os.remove(os.path.join(objects_dir, name))
+
+
+def load_snapshot(snapshot_id=None, snapshot_dir=SNAPSHOT_DIR, source=MASTERLIST_PATH):
+    """
+    Rebuilds the frame stored in a snapshot of `source` (the newest one by default).
+    """
+    manifests = list_snapshots(snapshot_dir, source)
+    if snapshot_id:
+        manifests = [m for m in manifests if m["id"] == snapshot_id]
+    if not manifests:
+        raise FileNotFoundError(f"Snapshot '{snapshot_id or 'latest'}' of {source} not found in {snapshot_dir}.")
+    manifest = manifests[0]
+
+    parts = []
+    for chunk_id, _ in manifest["chunks"]:
+        with gzip.open(os.path.join(_objects_dir(snapshot_dir), f"{chunk_id}.csv.gz"), "rt", encoding="utf-8") as f:
+            parts.append(pd.read_csv(f, header=None, names=manifest["columns"], dtype=str, keep_default_na=False))
+    if not parts:
+        return pd.DataFrame(columns=manifest["columns"])
+    df = pd.concat(parts, ignore_index=True)
+    return df.replace("", None)
+
+
+def restore_snapshot(snapshot_id=None, file_path=MASTERLIST_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Overwrites the masterlist with a snapshot. Unless the newest snapshot already
+    captured the current file, it is snapshotted first so a restore can be undone.
+    """
+    from app.data_loader import read_masterlist
+    from app.data_writer import save_masterlist
+
+    df = load_snapshot(snapshot_id, snapshot_dir, source=file_path)
+    if os.path.exists(file_path):
+        latest = list_snapshots(snapshot_dir, file_path)[0]
+        if latest.get("source_mtime") != os.path.getmtime(file_path):
+            take_snapshot(read_masterlist(file_path), snapshot_dir, source=file_path)
+    save_masterlist(df, file_path, snapshot=False)
+    return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Masterlist snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    listing = sub.add_parser("list", help="List stored snapshots")
+    listing.add_argument("--file", default=MASTERLIST_PATH)
+    restore = sub.add_parser("restore", help="Restore a snapshot over the masterlist")
+    restore.add_argument("snapshot_id", nargs="?", help="Snapshot id (default: newest)")
+    restore.add_argument("--file", default=MASTERLIST_PATH)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for m in list_snapshots(source=args.file):
+            print(f"{m['id']}  {m['created_at']}  {m['rows']} rows  {len(m['chunks'])} chunks")
+    else:
+        rows = restore_snapshot(args.snapshot_id, args.file)
+        print(f"✅ Restored {rows} rows to {args.file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
 # app/updater.py
 
+import pandas as pd
+
+from app.data_loader import format_code_columns
+from app.metrics import counter
+
+ROWS_APPENDED = counter("masterlist_rows_appended_total", "Village rows appended to the masterlist frame")
+MARKED_FOR_DELETION = counter("villages_marked_for_deletion_total", "Villages marked 'to be deleted'")
+
 def add_new_village(df, uc_prefix: str, village_name: str, generated_code: str) -> dict:
     """
     Creates a dictionary for a new village row under the specified UC.
@@ -46,5 +54,19 @@ def mark_village_for_deletion(df, village_code: str) -> bool:
     match = df['village_pcode_new'] == village_code
     if match.any():
         df.loc[match, 'remarks'] = 'to be deleted'
+        MARKED_FOR_DELETION.inc()
         return True
     return False
+
+
+def append_villages(df, rows) -> pd.DataFrame:
+    """
+    Appends a batch of new village rows (dicts or a DataFrame) in a single concat.
+    Only the new rows are code-formatted; the existing frame is assumed clean.
+    """
+    new_df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    if new_df.empty:
+        return df
+    new_df = format_code_columns(new_df.copy())
+    ROWS_APPENDED.inc(len(new_df))
+    return pd.concat([df, new_df], ignore_index=True)
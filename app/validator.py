@@ -0,0 +1,116 @@
+# app/validator.py
+#
+# Checks the code hierarchy of the whole masterlist in one vectorised pass:
+#
+#   village_pcode_new == uc_prefix + village/settlement_code
+#   uc_prefix starts with tehsil_pcode, tehsil_pcode with district_pcode,
+#   district_pcode with province_pcode
+#   district_pcode matches the registry (data/admin_registry.json) for the district name
+#   village/settlement_code and village_pcode_new are unique (within the UC)
+#   village coordinates lie inside the stored UC boundary, when one exists (app/boundaries.py)
+#
+#   python -m app validate            (or validate_masterlist(df) from code)
+
+import pandas as pd
+
+from app.registry import get_registry
+
+# rule -> (severity, description)
+RULES = {
+    "missing_pcode": ("error", "Village has no village_pcode_new"),
+    "pcode_mismatch": ("error", "village_pcode_new is not uc_prefix + village/settlement_code"),
+    "uc_outside_tehsil": ("error", "uc_prefix does not start with tehsil_pcode"),
+    "tehsil_outside_district": ("error", "tehsil_pcode does not start with district_pcode"),
+    "district_outside_province": ("error", "district_pcode does not start with province_pcode"),
+    "district_code_mismatch": ("error", "district_pcode differs from the registered code for the district"),
+    "unknown_district": ("warning", "District name is not in the admin code list"),
+    "duplicate_suffix": ("error", "village/settlement_code is used more than once in the UC"),
+    "duplicate_pcode": ("error", "village_pcode_new is used more than once"),
+    "outside_uc_boundary": ("warning", "Village coordinates are outside its UC boundary polygon"),
+}
+
+REPORT_COLUMNS = ["rule", "severity", "row", "village_pcode_new", "uc_prefix", "village_name", "detail"]
+
+
+def _text(df, col):
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[col].fillna("").astype(str).str.strip()
+
+
+def _starts_with(values, prefixes):
+    """
+    Row-wise values.startswith(prefixes), vectorised per prefix length
+    (codes at one level all have the same length, so this is usually a single slice).
+    """
+    result = pd.Series(False, index=values.index)
+    lengths = prefixes.str.len()
+    for length in lengths.unique():
+        rows = lengths == length
+        result[rows] = values[rows].str[:length] == prefixes[rows]
+    return result
+
+
+def validate_masterlist(df, boundaries=None) -> pd.DataFrame:
+    """
+    Returns one row per violation with REPORT_COLUMNS; empty if the masterlist is consistent.
+    `row` is the spreadsheet row number (header is row 1). Pass a BoundaryStore as
+    `boundaries` to also check coordinates against the stored UC polygons.
+    """
+    pcode = _text(df, "village_pcode_new")
+    uc_prefix = _text(df, "uc_prefix")
+    suffix = _text(df, "village/settlement_code")
+    tehsil = _text(df, "tehsil_pcode")
+    district = _text(df, "district_pcode")
+    province = _text(df, "province_pcode")
+    district_name = _text(df, "district")
+    has_name = _text(df, "village_name") != ""
+
+    registered = district_name.map(get_registry().districts())
+    known = registered.notna()
+
+    checks = {
+        "missing_pcode": (has_name & (pcode == ""), None),
+        "pcode_mismatch": ((pcode != "") & (pcode != uc_prefix + suffix), "expected " + uc_prefix + suffix),
+        "uc_outside_tehsil": ((uc_prefix != "") & ~_starts_with(uc_prefix, tehsil), "tehsil_pcode " + tehsil),
+        "tehsil_outside_district": ((tehsil != "") & ~_starts_with(tehsil, district), "district_pcode " + district),
+        "district_outside_province": ((district != "") & ~_starts_with(district, province), "province_pcode " + province),
+        "district_code_mismatch": (known & (district != registered.fillna("")), "registered " + registered.fillna("")),
+        "unknown_district": ((district_name != "") & ~known, "district " + district_name),
+        "duplicate_suffix": ((suffix != "") & pd.DataFrame({"u": uc_prefix, "s": suffix}).duplicated(keep=False),
+                             "suffix " + suffix),
+        "duplicate_pcode": ((pcode != "") & pcode.duplicated(keep=False), None),
+    }
+    if boundaries is not None:
+        checks["outside_uc_boundary"] = (boundaries.outside_mask(df), None)
+
+    reports = []
+    for rule, (mask, detail) in checks.items():
+        if not mask.any():
+            continue
+        hit = mask.to_numpy()
+        reports.append(pd.DataFrame({
+            "rule": rule,
+            "severity": RULES[rule][0],
+            "row": df.index[hit] + 2,
+            "village_pcode_new": pcode[hit].to_numpy(),
+            "uc_prefix": uc_prefix[hit].to_numpy(),
+            "village_name": _text(df, "village_name")[hit].to_numpy(),
+            "detail": detail[hit].to_numpy() if detail is not None else "",
+        }))
+    if not reports:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return pd.concat(reports, ignore_index=True)
+
+
+def summarise(violations) -> pd.DataFrame:
+    """
+    Violation counts per rule, in RULES order, including rules with no violations.
+    """
+    counts = violations["rule"].value_counts()
+    return pd.DataFrame({
+        "rule": list(RULES),
+        "severity": [RULES[r][0] for r in RULES],
+        "description": [RULES[r][1] for r in RULES],
+        "violations": [int(counts.get(r, 0)) for r in RULES],
+    })
@@ -0,0 +1,273 @@
+# app/watcher.py
+#
+# Keeps one shared, cleaned copy of the masterlist in memory and reloads it when the
+# workbook changes on disk (e.g. an admin edits it in Excel). Changes are detected by
+# polling the file's mtime/size, which works on every platform without extra packages.
+# After a reload the old and new frames are diffed by village_pcode_new and dependent
+# caches (code index, dropdown tree, map points) are refreshed only for the UCs that
+# actually changed.
+
+import os
+import threading
+
+import pandas as pd
+
+from app.config import MASTERLIST_PATH, WATCH_INTERVAL
+from app.data_loader import format_code_columns, load_and_clean_data
+from app.metrics import counter, gauge
+
+KEY_COLUMN = "village_pcode_new"
+
+ROWS = gauge("masterlist_rows", "Villages in the shared masterlist frame")
+RELOADS = counter("masterlist_reloads_total", "Reloads of the masterlist after it changed on disk")
+
+
+def load_masterlist_frame(file_path=MASTERLIST_PATH):
+    """
+    Loads the masterlist exactly as the app works with it.
+    """
+    return format_code_columns(load_and_clean_data(file_path))
+
+
+def diff_frames(old, new):
+    """
+    Compares two masterlist frames by village_pcode_new.
+    Returns added/removed/changed P-code sets and the affected uc_prefix set,
+    or None for "ucs" when the frames cannot be compared row by row.
+    """
+    if old is None or list(old.columns) != list(new.columns) or KEY_COLUMN not in new.columns:
+        return {"added": set(), "removed": set(), "changed": set(), "ucs": None}
+
+    def keyed_hashes(df):
+        hashes = pd.util.hash_pandas_object(df, index=False)
+        keys = df[KEY_COLUMN].fillna("").astype(str).to_numpy()
+        # Duplicate P-codes are folded together so they still compare as a unit
+        return hashes.groupby(keys).sum()
+
+    old_hashes = keyed_hashes(old)
+    new_hashes = keyed_hashes(new)
+
+    added = set(new_hashes.index.difference(old_hashes.index))
+    removed = set(old_hashes.index.difference(new_hashes.index))
+    common = new_hashes.index.intersection(old_hashes.index)
+    changed = set(common[new_hashes[common].to_numpy() != old_hashes[common].to_numpy()])
+
+    touched = added | removed | changed
+    ucs = set()
+    for df in (old, new):
+        rows = df[df[KEY_COLUMN].fillna("").astype(str).isin(touched)]
+        ucs.update(rows["uc_prefix"].dropna().astype(str))
+    return {"added": added, "removed": removed, "changed": changed, "ucs": ucs}
+
+
+class CodeIndex:
+    """
+    Highest numeric village suffix per uc_prefix, so the next code can be issued
+    without scanning the frame.
+    """
+
+    def __init__(self):
+        self.max_suffix = {}
+
+    @staticmethod
+    def _max_suffixes(df):
+        suffixes = pd.to_numeric(df["village/settlement_code"], errors="coerce")
+        return suffixes.groupby(df["uc_prefix"]).max().dropna().astype(int).to_dict()
+
+    def refresh(self, df, ucs=None):
+        if ucs is None:
+            self.max_suffix = self._max_suffixes(df)
+            return
+        for uc in ucs:
+            self.max_suffix.pop(uc, None)
+        self.max_suffix.update(self._max_suffixes(df[df["uc_prefix"].isin(ucs)]))
+
+    def next_code(self, uc_prefix: str, reserved_max: int = 0) -> str:
+        """
+        Next village code under `uc_prefix`, above suffixes held by leases up to `reserved_max`.
+        """
+        return f"{uc_prefix}{str(max(self.max_suffix.get(uc_prefix, 0), reserved_max) + 1).zfill(3)}"
+
+
+class DropdownTree:
+    """
+    district_pcode -> {tehsil: [uc, ...]} in first-seen order, as used by the
+    Province/District/Tehsil/UC selectors.
+    """
+
+    def __init__(self):
+        self.tree = {}
+
+    @staticmethod
+    def _build(df):
+        tree = {}
+        rows = df[["district_pcode", "tehsil", "uc"]].dropna(subset=["district_pcode", "tehsil"])
+        for district_pcode, tehsil, uc in rows.itertuples(index=False, name=None):
+            ucs = tree.setdefault(district_pcode, {}).setdefault(tehsil, {})
+            if pd.notnull(uc):
+                ucs[uc] = None
+        return {d: {t: list(u) for t, u in tehsils.items()} for d, tehsils in tree.items()}
+
+    def refresh(self, df, ucs=None):
+        if ucs is None:
+            self.tree = self._build(df)
+            return
+        # uc_prefix starts with the district P-code (PK + province digit + 2 district digits)
+        districts = {uc[:5] for uc in ucs}
+        for district_pcode in districts:
+            self.tree.pop(district_pcode, None)
+        self.tree.update(self._build(df[df["district_pcode"].isin(districts)]))
+
+    def tehsils(self, district_pcode):
+        return list(self.tree.get(district_pcode, {}))
+
+    def ucs(self, district_pcode, tehsil):
+        return self.tree.get(district_pcode, {}).get(tehsil, [])
+
+
+class PointIndex:
+    """
+    Villages whose coordinates lie inside Pakistan, with latitude/longitude as floats,
+    for the map. Only the rows of changed UCs (and rows without a uc_prefix) are cleaned
+    again after a swap; row order is not kept.
+    """
+
+    def __init__(self):
+        self._state = (None, None)
+
+    @staticmethod
+    def _clean(df):
+        points = df.copy()
+        for column in ("latitude", "longitude"):
+            # Strips anything but digits, "." and "-"; values that still do not parse are dropped
+            cleaned = points[column].astype(str).str.strip().str.replace(r"[^\d\.\-]+", "", regex=True)
+            points[column] = pd.to_numeric(cleaned, errors="coerce")
+        points = points.dropna(subset=["latitude", "longitude"])
+        return points[points["latitude"].between(23, 37) & points["longitude"].between(60, 77)]
+
+    def refresh(self, df, ucs=None):
+        _, points = self._state
+        if ucs is None or points is None:
+            points = self._clean(df)
+        else:
+            stale = points["uc_prefix"].isin(ucs) | points["uc_prefix"].isna()
+            changed = df["uc_prefix"].isin(ucs) | df["uc_prefix"].isna()
+            points = pd.concat([points[~stale], self._clean(df[changed])])
+        self._state = (df, points)
+
+    def points_for(self, frame):
+        """
+        Points of `frame`: the index if it was last refreshed with that frame, else
+        (a swap is still notifying listeners) cleaned from `frame` in full.
+        """
+        source, points = self._state
+        return points if source is frame else self._clean(frame)
+
+
+class MasterlistWatcher:
+    """
+    Owns the shared masterlist frame. `check()` reloads it if the file changed,
+    `start()` does the same from a background thread, and `publish()` installs a
+    frame the app has just saved itself so that save is not re-read from disk.
+    Listeners are called as listener(frame, ucs) after every swap, where `ucs` is
+    the set of affected uc_prefix values or None for "everything".
+    """
+
+    def __init__(self, file_path=MASTERLIST_PATH, loader=load_masterlist_frame, interval=WATCH_INTERVAL):
+        self.file_path = file_path
+        self.loader = loader
+        self.interval = interval
+        self.version = 0
+        self.last_diff = None
+        self.code_index = CodeIndex()
+        self.dropdown_tree = DropdownTree()
+        self._frame = None
+        self._signature = None
+        self._listeners = [self.code_index.refresh, self.dropdown_tree.refresh]
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self.check()
+        return self._frame
+
+    def snapshot(self):
+        """
+        Returns (version, frame) from the same swap, for caches keyed by version.
+        """
+        if self._frame is None:
+            self.check()
+        with self._lock:
+            return self.version, self._frame
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+        if self._frame is not None:
+            listener(self._frame, None)
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _swap(self, frame, signature):
+        diff = diff_frames(self._frame, frame)
+        with self._lock:
+            self._frame = frame
+            self._signature = signature
+            self.version += 1
+            self.last_diff = diff
+        ROWS.set(len(frame))
+        for listener in self._listeners:
+            listener(frame, diff["ucs"])
+        return diff
+
+    def check(self) -> bool:
+        """
+        Reloads the frame if the file changed since the last load. Returns True on reload.
+        """
+        with self._reload_lock:
+            signature = self._stat_signature()
+            if signature is None or (signature == self._signature and self._frame is not None):
+                return False
+            frame = self.loader(self.file_path)
+            # The file may have changed again while loading; the next check picks that up
+            self._swap(frame, signature)
+            RELOADS.inc()
+            return True
+
+    def publish(self, df):
+        """
+        Installs a frame that was just written to the watched file. Coordinates of newly
+        added rows are made numeric, as a reload of the saved workbook would make them.
+        """
+        frame = df.copy()
+        for col in ("latitude", "longitude"):
+            if col in frame.columns:
+                frame[col] = pd.to_numeric(frame[col], errors="coerce")
+        with self._reload_lock:
+            self._swap(frame, self._stat_signature())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # A half-saved or locked workbook (Excel holds a lock) is retried next tick
+                continue
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="masterlist-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,108 @@
+# benchmarks/bench_kml_parser.py
+#
+# Times app.kml_parser.parse_kml against the previous minidom + regex parser on a
+# generated KML with description tables, "Key: value" lines and ExtendedData:
+#   python benchmarks/bench_kml_parser.py [--placemarks N] [--repeat N]
+
+import argparse
+import io
+import os
+import re
+import statistics
+import sys
+import time
+from xml.dom import minidom
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.kml_parser import parse_kml
+
+TABLE = ("<table><tr><td>Province</td><td>Sindh</td></tr><tr><td>District</td><td>Thatta</td></tr>"
+         "<tr><td>Tehsil</td><td>Ghorabari</td></tr><tr><td>UC</td><td>Garho</td></tr>"
+         "<tr><td>Source</td><td>Survey {i}</td></tr></table>")
+LINES = "Province: Sindh<br>District: Thatta<br>Tehsil: Ghorabari<br>UC: Garho<br>File: field.kml"
+EXTENDED = ("<ExtendedData><SchemaData schemaUrl=\"#villages\"><SimpleData name=\"Province\">Sindh</SimpleData>"
+            "<SimpleData name=\"District\">Thatta</SimpleData><SimpleData name=\"Tehsil\">Ghorabari</SimpleData>"
+            "<SimpleData name=\"UC\">Garho</SimpleData></SchemaData></ExtendedData>")
+
+
+def make_kml(placemarks) -> bytes:
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2"><Document>']
+    for i in range(placemarks):
+        if i % 3 == 0:
+            body = f"<description><![CDATA[{TABLE.format(i=i)}]]></description>"
+        elif i % 3 == 1:
+            body = f"<description><![CDATA[{LINES}]]></description>"
+        else:
+            body = EXTENDED
+        lon, lat = 67.5 + (i % 1000) / 10000, 24.3 + (i // 1000) / 10000
+        parts.append(f"<Placemark><name>Village {i}</name>{body}"
+                     f"<Point><coordinates>{lon:.6f},{lat:.6f},0</coordinates></Point></Placemark>")
+    parts.append("</Document></kml>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def legacy_parse(source):
+    """
+    The parser Tab 7 used before app/kml_parser.py, for comparison.
+    """
+    def extract(desc_html):
+        fields = {"Province": "", "District": "", "Tehsil": "", "UC": ""}
+        rows = re.findall(r'<td[^>]*>(.*?)</td>', desc_html)
+        for i in range(len(rows) - 1):
+            label = rows[i].strip().lower()
+            value = rows[i + 1].strip()
+            if value.isdigit():
+                continue
+            if "province" in label:
+                fields["Province"] = value
+            elif "district" in label:
+                fields["District"] = value
+            elif "tehsil" in label:
+                fields["Tehsil"] = value
+            elif "uc" in label or "union council" in label:
+                fields["UC"] = value
+        return fields
+
+    villages = []
+    for placemark in minidom.parse(source).getElementsByTagName("Placemark"):
+        name = placemark.getElementsByTagName("name")[0].firstChild.nodeValue.strip()
+        coords = placemark.getElementsByTagName("coordinates")[0].firstChild.nodeValue.strip()
+        desc = placemark.getElementsByTagName("description")
+        admin = extract(desc[0].firstChild.nodeValue) if desc and desc[0].firstChild else {}
+        lon, lat, *_ = coords.split(",")
+        villages.append({**admin, "Village Name": name, "Latitude": float(lat), "Longitude": float(lon)})
+    return villages
+
+
+def _time(func, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(io.BytesIO(data))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the KML placemark parser")
+    parser.add_argument("--placemarks", type=int, default=30000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_kml(args.placemarks)
+    print(f"📊 {args.placemarks} placemarks, {len(data) / 1e6:.1f} MB ({args.repeat} runs each)")
+
+    legacy, old = _time(legacy_parse, data, args.repeat)
+    current, (villages, _) = _time(lambda f: parse_kml(f, "bench.kml"), data, args.repeat)
+    complete = sum(all(v[k] for k in ("Province", "District", "Tehsil", "UC")) for v in villages)
+    old_complete = sum(all(v.get(k) for k in ("Province", "District", "Tehsil", "UC")) for v in old)
+
+    print(f"{'minidom + regex':>18}: median {legacy:6.2f}s  {len(old) / legacy:9.0f} placemarks/s  "
+          f"{old_complete} with all admin fields")
+    print(f"{'kml_parser':>18}: median {current:6.2f}s  {len(villages) / current:9.0f} placemarks/s  "
+          f"{complete} with all admin fields  x{legacy / current:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
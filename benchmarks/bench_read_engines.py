@@ -0,0 +1,40 @@
+# benchmarks/bench_read_engines.py
+#
+# Compares the masterlist read engines on the real workbook:
+#   python benchmarks/bench_read_engines.py [path] [--repeat N]
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import MASTERLIST_PATH
+from app.data_loader import READ_ENGINES, load_and_clean_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark masterlist read engines")
+    parser.add_argument("path", nargs="?", default=MASTERLIST_PATH)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"📊 {args.path} ({args.repeat} runs per engine)")
+    for engine in READ_ENGINES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            df = load_and_clean_data(args.path, engine=engine)
+            timings.append(time.perf_counter() - start)
+
+        median = statistics.median(timings)
+        baseline = baseline or median
+        print(f"{engine:>18}: median {median:6.2f}s  best {min(timings):6.2f}s  "
+              f"x{baseline / median:4.1f} vs openpyxl  ({len(df)} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# benchmarks/run.py
+#
+# Times the loading, allocation, import and export paths on synthetic masterlists and
+# appends the results to benchmarks/results/history.jsonl, so a change can be compared
+# with earlier runs on the same machine:
+#   python benchmarks/run.py [--sizes 10k,100k,1m] [--repeat N] [--only NAME] [--no-record]
+#
+# Generated workbooks are cached in benchmarks/.cache/ (writing the 1M-row file takes
+# a few minutes). Each benchmark reports the median and best of --repeat runs; a median
+# more than --threshold slower than the previous recorded run is flagged.
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import pandas as pd
+
+from app.code_generator import (
+    generate_other_district_code,
+    generate_tehsil_code,
+    generate_uc_code,
+    generate_village_code,
+    generate_village_codes,
+)
+from app.data_loader import format_code_columns, load_and_clean_data
+from app.exporter import EXPORTERS, export_frame
+from app.importer import IMPORT_COLUMNS, VillageImporter
+from app.kml_parser import parse_kml
+from app.updater import add_new_village
+from synthetic import GENERATOR_VERSION, make_kml, make_masterlist, write_masterlist
+
+CACHE_DIR = os.path.join(HERE, ".cache")
+HISTORY_PATH = os.path.join(HERE, "results", "history.jsonl")
+
+# Import and KML inputs are capped so the large sizes measure lookups against a big
+# masterlist rather than a proportionally bigger input file
+IMPORT_ROWS = 1000
+KML_PLACEMARKS = 100000
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """
+    Registers a benchmark. The decorated function gets the context and returns the
+    callable to time, or (prepare, run): prepare() runs untimed before every run and
+    its result is passed to run().
+    """
+    def register(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return register
+
+
+@benchmark("load_and_clean_data")
+def bench_load(ctx):
+    return lambda: load_and_clean_data(ctx.path)
+
+
+@benchmark("format_code_columns")
+def bench_format(ctx):
+    return ctx.raw.copy, format_code_columns
+
+
+@benchmark("generate_village_code")
+def bench_village_code(ctx):
+    return lambda: generate_village_code(ctx.df, ctx.uc_prefix)
+
+
+@benchmark("generate_village_codes")
+def bench_village_codes(ctx):
+    return lambda: generate_village_codes(ctx.df, ctx.uc_prefix, count=50)
+
+
+@benchmark("generate_tehsil_code")
+def bench_tehsil_code(ctx):
+    return lambda: generate_tehsil_code(ctx.df, ctx.district_pcode)
+
+
+@benchmark("generate_uc_code")
+def bench_uc_code(ctx):
+    return lambda: generate_uc_code(ctx.df, ctx.tehsil_pcode)
+
+
+@benchmark("generate_other_district_code")
+def bench_district_code(ctx):
+    return lambda: generate_other_district_code(ctx.df, ctx.province_code)
+
+
+@benchmark("add_new_village")
+def bench_add_village(ctx):
+    code = generate_village_code(ctx.df, ctx.uc_prefix)
+    return lambda: add_new_village(ctx.df, ctx.uc_prefix, "Benchmark Village", code)
+
+
+@benchmark("bulk_import")
+def bench_import(ctx):
+    template = ctx.df.sample(min(IMPORT_ROWS, len(ctx.df)), random_state=0)[IMPORT_COLUMNS].reset_index(drop=True)
+    template["village_name"] = "Imported " + template.index.astype(str)
+
+    def run():
+        importer = VillageImporter(ctx.df)
+        importer.add_frame(template)
+        return importer.apply(ctx.df)
+    return run
+
+
+@benchmark("parse_kml")
+def bench_kml(ctx):
+    data = make_kml(ctx.df.head(KML_PLACEMARKS))
+    return lambda: parse_kml(io.BytesIO(data), "bench.kml")
+
+
+@benchmark("export_by_district")
+def bench_export(ctx):
+    extension = EXPORTERS["csv"]["extension"]
+
+    def run():
+        with tempfile.TemporaryDirectory() as out:
+            for (province_name, district_name), group in ctx.df.groupby(["province", "district"]):
+                folder = os.path.join(out, province_name)
+                os.makedirs(folder, exist_ok=True)
+                export_frame(group, "csv", os.path.join(folder, f"{district_name}{extension}".replace("/", "-")))
+    return run
+
+
+def _size(text) -> int:
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def _masterlist_path(rows, seed):
+    path = os.path.join(CACHE_DIR, f"masterlist-{rows}-{seed}-v{GENERATOR_VERSION}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        print(f"🛠️ Writing {rows}-row synthetic masterlist to {path}")
+        write_masterlist(make_masterlist(rows, seed), path)
+    return path
+
+
+def _context(rows, seed):
+    path = _masterlist_path(rows, seed)
+    raw = load_and_clean_data(path)
+    df = format_code_columns(raw.copy())
+    # The UC/tehsil/district of a row in the middle of the frame, so lookups scan past it
+    sample = df.iloc[len(df) // 2]
+    return SimpleNamespace(
+        rows=rows, path=path, raw=raw, df=df,
+        uc_prefix=sample["uc_prefix"], tehsil_pcode=sample["tehsil_pcode"],
+        district_pcode=sample["district_pcode"], province_code=sample["province_code"],
+    )
+
+
+def _time(setup, repeat):
+    prepare, run = setup if isinstance(setup, tuple) else (None, setup)
+    timings = []
+    for _ in range(repeat):
+        arg = prepare() if prepare else None
+        start = time.perf_counter()
+        run(arg) if prepare else run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def load_history(path=HISTORY_PATH) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _previous(history, result):
+    """
+    The last recorded result of the same benchmark and size on this machine.
+    """
+    for entry in reversed(history):
+        if (entry["benchmark"], entry["rows"], entry.get("host")) == \
+                (result["benchmark"], result["rows"], result["host"]):
+            return entry
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the masterlist load, allocation, import and export paths")
+    parser.add_argument("--sizes", default="10k,100k", help="comma-separated row counts, e.g. 10k,100k,1m")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", action="append", help="run only benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="flag medians this much slower than the last run")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-record", action="store_true", help="do not append the results to the history")
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    run_info = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+    }
+    selected = [(n, f) for n, f in BENCHMARKS if not args.only or any(o in n for o in args.only)]
+    results, regressions = [], []
+
+    for rows in map(_size, args.sizes.split(",")):
+        ctx = _context(rows, args.seed)
+        print(f"📊 {rows} rows ({args.repeat} runs each, commit {run_info['commit'] or '?'})")
+        for name, func in selected:
+            timings = _time(func(ctx), args.repeat)
+            result = {**run_info, "benchmark": name, "rows": rows, "repeat": args.repeat,
+                      "median": statistics.median(timings), "min": min(timings)}
+            previous = _previous(history, result)
+            change = ""
+            if previous:
+                ratio = result["median"] / previous["median"]
+                change = f"  {ratio - 1:+6.1%} vs {previous.get('commit') or previous['timestamp']}"
+                if ratio > 1 + args.threshold:
+                    change += "  ⚠️"
+                    regressions.append(f"{name} @ {rows}")
+            print(f"{name:>28}: median {result['median'] * 1000:10.2f} ms  best {result['min'] * 1000:10.2f} ms{change}")
+            results.append(result)
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+        print(f"💾 {len(results)} results appended to {args.history}")
+    if regressions:
+        print(f"⚠️ Slower than the last run by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
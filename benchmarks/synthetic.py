@@ -0,0 +1,467 @@
+# benchmarks/synthetic.py
+#
+# Synthetic masterlists, bulk-import templates and KML files for benchmarks and load
+# tests at sizes the real workbook does not reach (national scale is ~500k villages).
+#
+# The data follows the admin registry: every registered district gets a share of the
+# UCs in proportion to its area, registered tehsils and UCs are used first and further
+# ones are numbered after them, and each UC holds a skewed number of villages with
+# suffixes 001, 002, ... Village coordinates are scattered around a UC centre drawn
+# inside the district's boundary polygon, and names follow regional patterns
+# ("Goth Allah Bux Jamali", "Killi Sardar Khan", "Chak 214", "Rahimabad").
+#
+# `dirty` adds the problems real uploads have, in that share of rows each:
+#   excel_coordinates   "24.2382086°", "'67.6048014", " 24.2382086 N"
+#   missing_suffix      blank village/settlement_code
+#   unpadded_codes      "5" instead of "05" after a trip through Excel
+#   blank_coordinates   no latitude/longitude
+#   name_whitespace     stray spaces around village names
+#
+#   python benchmarks/synthetic.py 500000 out/ [--dirty 0.01] [--import-rows 5000]
+#                                  [--kml-placemarks 20000] [--boundaries] [--seed N]
+
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.registry import get_registry
+
+COLUMNS = [
+    "enumerator", "country_pcode", "province", "province_code", "province_pcode",
+    "district", "district_code", "district_pcode", "tehsil", "tehsil_code", "tehsil_pcode",
+    "uc", "uc_id", "uc/vc/nc_pcode", "village_name", "latitude", "longitude",
+    "village/settlement_code", "village_pcode_new", "village_pcode_old", "remarks",
+    "covered_in_r3_(yes/no)", "uc_prefix", "old_new",
+]
+TEMPLATE_COLUMNS = ["province", "district", "tehsil", "uc", "village_name", "latitude", "longitude", "village_pcode_new"]
+
+# Bump when the generated data changes, so cached workbooks are regenerated
+GENERATOR_VERSION = 2
+
+# Villages per UC follow a log-normal around this median, clipped to 5..999
+VILLAGES_PER_UC = 120
+UCS_PER_TEHSIL = 12
+# Spread of villages around their UC centre, in degrees
+UC_SPREAD = 0.03
+
+# Rough bounding box of Pakistan (lat, lon), for districts without a polygon
+BOUNDS = ((24.0, 37.0), (61.0, 77.0))
+
+GIVEN = [
+    "Allah Bux", "Ali", "Muhammad", "Rahim", "Karim", "Ghulam", "Nawab", "Sardar", "Haji", "Mir",
+    "Sultan", "Fateh", "Sher", "Qadir", "Gul", "Noor", "Dost", "Jan", "Bahadur", "Hussain",
+    "Umar", "Yar", "Shah", "Sikandar", "Murad", "Rasool", "Bakhsh", "Jamal", "Wali", "Pir",
+]
+CLANS = [
+    "Jamali", "Khoso", "Magsi", "Bhutto", "Soomro", "Chandio", "Mengal", "Baloch", "Kakar", "Achakzai",
+    "Yousafzai", "Afridi", "Khattak", "Mohmand", "Jutt", "Arain", "Gujjar", "Awan", "Rajput", "Malik",
+    "Sial", "Bhatti", "Abbasi", "Qureshi", "Syed", "Mughal", "Dogar", "Lashari", "Rind", "Brohi",
+]
+PLACE_SUFFIXES = ["abad", "pur", "kot", "wala", "garh", "nagar", "dero", "khel"]
+PREFIXES = {
+    "Sindh": ["Goth", "Goth", "Deh", "Mohalla"],
+    "Balochistan": ["Killi", "Killi", "Kalat", "Goth"],
+    "Punjab": ["Chak", "Basti", "Dhok", "Mauza", "Pind"],
+    "Khyber Pakhtunkhwa": ["Kalay", "Banda", "Dheri", "Killi"],
+    "Islamabad": ["Mohra", "Dhok", "Basti"],
+    "Gilgit Baltistan": ["Das", "Bala", "Payeen"],
+    "Azad Kashmir": ["Dhok", "Bandi", "Mohra"],
+}
+
+DIRTY_KINDS = ("excel_coordinates", "missing_suffix", "unpadded_codes", "blank_coordinates", "name_whitespace")
+
+
+def _place_names(rng, count, prefixes):
+    """
+    `count` village-style names: "<prefix> <given> [clan]", "<given> <clan>",
+    "<given><suffix>" or a numbered "Chak 214".
+    """
+    given = rng.choice(GIVEN, count)
+    clans = rng.choice(CLANS, count)
+    prefix = rng.choice(prefixes, count)
+    suffix = rng.choice(PLACE_SUFFIXES, count)
+    style = rng.integers(0, 10, count)
+    numbers = rng.integers(1, 600, count)
+    names = []
+    for i in range(count):
+        s = style[i]
+        if s < 4:
+            names.append(f"{prefix[i]} {given[i]} {clans[i]}")
+        elif s < 6:
+            names.append(f"{prefix[i]} {given[i]}")
+        elif s < 8:
+            names.append(f"{given[i]} {clans[i]}")
+        elif s < 9:
+            names.append(given[i].split()[0] + suffix[i])
+        else:
+            names.append(f"{prefix[i]} {numbers[i]}")
+    return names
+
+
+def _unique_names(rng, count, taken=()):
+    """
+    `count` distinct tehsil/UC names ("Sher Khoso", "Rahimabad"), numbered when the
+    combinations run out.
+    """
+    seen, out = set(taken), []
+    given = rng.choice(GIVEN, count)
+    clans = rng.choice(CLANS, count)
+    suffix = rng.choice(PLACE_SUFFIXES, count)
+    for i in range(count):
+        name = f"{given[i]} {clans[i]}" if i % 3 else given[i].split()[-1] + suffix[i]
+        if name in seen:
+            name = f"{name} {len(seen) + 1}"
+        seen.add(name)
+        out.append(name)
+    return out
+
+
+def _district_polygons(registry):
+    """
+    Registered district name -> boundary polygon, plus province name -> polygon for
+    districts the district file does not cover.
+    """
+    from app.aliases import NameResolver
+    from app.geocoder import ReverseGeocoder
+
+    geocoder = ReverseGeocoder(resolver=NameResolver(registry))
+    polygons = {}
+    for level in ("province", "district"):
+        tree, names = geocoder.layers[level]
+        polygons[level] = dict(zip(names, tree.geometries))
+    return polygons
+
+
+def _points_in(rng, polygon, count):
+    """
+    `count` uniformly random (lat, lon) inside a polygon (or the country's bounding box).
+    """
+    import shapely
+
+    if polygon is None:
+        (lat_lo, lat_hi), (lon_lo, lon_hi) = BOUNDS
+        return rng.uniform(lat_lo, lat_hi, count), rng.uniform(lon_lo, lon_hi, count)
+    minx, miny, maxx, maxy = polygon.bounds
+    lat, lon = np.empty(0), np.empty(0)
+    while len(lat) < count:
+        x = rng.uniform(minx, maxx, count * 3)
+        y = rng.uniform(miny, maxy, count * 3)
+        inside = shapely.contains_xy(polygon, x, y)
+        lat, lon = np.concatenate([lat, y[inside]]), np.concatenate([lon, x[inside]])
+    return lat[:count], lon[:count]
+
+
+def _uc_sizes(rng, rows, villages_per_uc):
+    sizes = []
+    total = 0
+    while total < rows:
+        batch = np.clip(rng.lognormal(math.log(villages_per_uc), 0.6, 1024).astype(int), 5, 999)
+        sizes.extend(batch.tolist())
+        total += int(batch.sum())
+    sizes = np.array(sizes)
+    keep = np.searchsorted(np.cumsum(sizes), rows) + 1
+    sizes = sizes[:keep]
+    sizes[-1] -= int(sizes.sum()) - rows
+    return sizes
+
+
+def make_units(rng, ucs, registry=None, polygons=None) -> pd.DataFrame:
+    """
+    One row per UC with every admin column and a centre (uc_lat, uc_lon), spread over
+    the registered districts in proportion to their area. Registered tehsils and UCs
+    of a district are used before new ones are numbered after them.
+    """
+    registry = registry or get_registry()
+    polygons = polygons or {"province": {}, "district": {}}
+    districts = []
+    for province, province_pcode in registry.provinces().items():
+        for district, district_pcode in sorted(registry.districts(province_pcode).items(), key=lambda x: x[1]):
+            polygon = polygons["district"].get(district)
+            districts.append((province, province_pcode, district, district_pcode, polygon))
+
+    # Half the UCs by area, half evenly, so small districts are not left empty
+    areas = np.array([p.area if p is not None else 0.0 for *_, p in districts])
+    weights = 0.5 / len(districts) + 0.5 * areas / (areas.sum() or 1)
+    counts = rng.multinomial(ucs, weights / weights.sum())
+
+    units = []
+    for (province, province_pcode, district, district_pcode, polygon), count in zip(districts, counts):
+        if not count:
+            continue
+        ucs_here = []
+        for tehsil_pcode in sorted(registry.children(district_pcode)):
+            for uc_prefix in sorted(registry.children(tehsil_pcode)):
+                ucs_here.append((registry.name(tehsil_pcode), tehsil_pcode, registry.name(uc_prefix), uc_prefix))
+        ucs_here = ucs_here[:count]
+
+        missing = count - len(ucs_here)
+        if missing:
+            existing = registry.children(district_pcode)
+            first_tehsil = max([int(t[-2:]) for t in existing], default=0) + 1
+            # Tehsil codes have two digits, so very large districts get bigger tehsils
+            per_tehsil = max(UCS_PER_TEHSIL, math.ceil(missing / (100 - first_tehsil)))
+            tehsil_names = _unique_names(rng, math.ceil(missing / per_tehsil), registry.child_names(district_pcode))
+            uc_names = _unique_names(rng, missing)
+            for i in range(missing):
+                t = i // per_tehsil
+                tehsil_pcode = f"{district_pcode}{first_tehsil + t:02d}"
+                ucs_here.append((tehsil_names[t], tehsil_pcode, uc_names[i], f"{tehsil_pcode}{i % per_tehsil + 1:03d}"))
+
+        if polygon is None:
+            polygon = polygons["province"].get(province)
+        lat, lon = _points_in(rng, polygon, len(ucs_here))
+        for (tehsil, tehsil_pcode, uc, uc_prefix), uc_lat, uc_lon in zip(ucs_here, lat, lon):
+            units.append({
+                "province": province, "province_code": province_pcode[2:], "province_pcode": province_pcode,
+                "district": district, "district_code": district_pcode[-2:], "district_pcode": district_pcode,
+                "tehsil": tehsil, "tehsil_code": tehsil_pcode[-2:], "tehsil_pcode": tehsil_pcode,
+                "uc": uc, "uc_id": uc_prefix[-3:], "uc_prefix": uc_prefix,
+                "uc_lat": uc_lat, "uc_lon": uc_lon,
+            })
+    return pd.DataFrame(units)
+
+
+def make_masterlist(rows, seed=0, villages_per_uc=VILLAGES_PER_UC, dirty=0.0, registry=None,
+                    realistic_coordinates=True) -> pd.DataFrame:
+    """
+    A masterlist of `rows` villages as load_and_clean_data returns it (all columns
+    strings, coordinates as text). `dirty` is the share of rows given each kind of
+    DIRTY_KINDS problem. Without `realistic_coordinates` UC centres are uniform over
+    the country's bounding box, which skips reading the boundary files.
+    """
+    rng = np.random.default_rng(seed)
+    registry = registry or get_registry()
+    polygons = _district_polygons(registry) if realistic_coordinates else None
+    sizes = _uc_sizes(rng, rows, villages_per_uc)
+    units = make_units(rng, len(sizes), registry, polygons)
+
+    uc_idx = np.repeat(np.arange(len(units)), sizes)
+    position = np.arange(rows) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    suffixes = np.array([f"{i:03d}" for i in range(1000)], dtype=object)[position + 1]
+    df = units.iloc[uc_idx].reset_index(drop=True)
+    names = np.empty(rows, dtype=object)
+    for province, idx in df.groupby("province").indices.items():
+        names[idx] = _place_names(rng, len(idx), PREFIXES.get(province, PREFIXES["Punjab"]))
+
+    lat = df["uc_lat"].to_numpy() + rng.normal(0, UC_SPREAD, rows)
+    lon = df["uc_lon"].to_numpy() + rng.normal(0, UC_SPREAD, rows)
+    df = pd.DataFrame({
+        "enumerator": "",
+        "country_pcode": "PK",
+        "province": df["province"],
+        "province_code": df["province_code"],
+        "province_pcode": df["province_pcode"],
+        "district": df["district"],
+        "district_code": df["district_code"],
+        "district_pcode": df["district_pcode"],
+        "tehsil": df["tehsil"],
+        "tehsil_code": df["tehsil_code"],
+        "tehsil_pcode": df["tehsil_pcode"],
+        "uc": df["uc"],
+        "uc_id": df["uc_id"],
+        "uc/vc/nc_pcode": df["uc_prefix"],
+        "village_name": names,
+        "latitude": pd.Series(lat.round(7)).astype(str),
+        "longitude": pd.Series(lon.round(7)).astype(str),
+        "village/settlement_code": suffixes,
+        "village_pcode_new": df["uc_prefix"] + suffixes,
+        "village_pcode_old": "",
+        "remarks": "",
+        "covered_in_r3_(yes/no)": rng.choice(np.array(["Yes", "No", ""], dtype=object), rows, p=[0.6, 0.2, 0.2]),
+        "uc_prefix": df["uc_prefix"],
+        "old_new": rng.choice(np.array(["Old", "New", ""], dtype=object), rows, p=[0.7, 0.1, 0.2]),
+    })[COLUMNS]
+    if dirty:
+        df = add_dirty_values(df, dirty, rng)
+    return df
+
+
+def add_dirty_values(df, share, rng=None) -> pd.DataFrame:
+    """
+    Returns a copy with `share` of the rows given each kind of DIRTY_KINDS problem
+    (picked independently, so a row can have several).
+    """
+    rng = rng or np.random.default_rng()
+    df = df.copy()
+    count = int(len(df) * share)
+
+    def pick():
+        return rng.choice(len(df), count, replace=False)
+
+    rows = pick()
+    lat = df["latitude"].to_numpy(dtype=object)
+    lon = df["longitude"].to_numpy(dtype=object)
+    formats = [("{}°", "{}°"), ("'{}", "'{}"), (" {} N", " {} E"), ("{} ", " {}")]
+    for i, row in enumerate(rows):
+        lat_fmt, lon_fmt = formats[i % len(formats)]
+        lat[row], lon[row] = lat_fmt.format(lat[row]), lon_fmt.format(lon[row])
+    df["latitude"], df["longitude"] = lat, lon
+
+    df.loc[df.index[pick()], "village/settlement_code"] = ""
+
+    for col in ("district_code", "tehsil_code", "uc_id"):
+        rows = df.index[pick()]
+        df.loc[rows, col] = df.loc[rows, col].astype(str).str.lstrip("0").replace("", "0")
+
+    rows = df.index[pick()]
+    df.loc[rows, ["latitude", "longitude"]] = ""
+
+    rows = df.index[pick()]
+    df.loc[rows, "village_name"] = "  " + df.loc[rows, "village_name"] + " "
+    return df
+
+
+def make_import_template(df, rows, seed=0, dirty=0.0) -> pd.DataFrame:
+    """
+    A filled bulk-import template of `rows` new villages in UCs of `df`, placed near
+    existing villages of the same UC. `dirty` is the share of rows whose province or
+    district is written as a known alias or in the wrong case, or left blank (for
+    --geocode) - the variants the name resolver and geocoder are there for.
+    """
+    from app.aliases import load_aliases
+
+    rng = np.random.default_rng(seed)
+    base = df.sample(rows, replace=len(df) < rows, random_state=seed).reset_index(drop=True)
+    lat = pd.to_numeric(base["latitude"], errors="coerce").fillna(30.0) + rng.normal(0, UC_SPREAD / 3, rows)
+    lon = pd.to_numeric(base["longitude"], errors="coerce").fillna(70.0) + rng.normal(0, UC_SPREAD / 3, rows)
+    template = pd.DataFrame({
+        "province": base["province"],
+        "district": base["district"],
+        "tehsil": base["tehsil"],
+        "uc": base["uc"],
+        "village_name": [f"Nai {name}" for name in _place_names(rng, rows, ["Basti"])],
+        "latitude": lat.round(7).astype(str),
+        "longitude": lon.round(7).astype(str),
+        "village_pcode_new": "",
+    })[TEMPLATE_COLUMNS]
+
+    count = int(rows * dirty)
+    if count:
+        aliases = load_aliases()
+        for level in ("province", "district"):
+            variants = {}
+            for alias, name in aliases.get(level, {}).items():
+                variants.setdefault(name, []).append(alias)
+            picked = rng.choice(rows, count, replace=False)
+            values = template[level].to_numpy(dtype=object)
+            for i, row in enumerate(picked):
+                name = values[row]
+                if i % 3 == 0 and name in variants:
+                    values[row] = variants[name][i % len(variants[name])]
+                elif i % 3 == 1:
+                    values[row] = f" {name.upper()} "
+                else:
+                    values[row] = ""
+            template[level] = values
+    return template
+
+
+TABLE = ("<table><tr><td>Province</td><td>{province}</td></tr><tr><td>District</td><td>{district}</td></tr>"
+         "<tr><td>Tehsil</td><td>{tehsil}</td></tr><tr><td>UC</td><td>{uc}</td></tr></table>")
+LINES = "Province: {province}<br>District: {district}<br>Tehsil: {tehsil}<br>UC: {uc}"
+EXTENDED = ("<ExtendedData><SchemaData schemaUrl=\"#villages\"><SimpleData name=\"Province\">{province}</SimpleData>"
+            "<SimpleData name=\"District\">{district}</SimpleData><SimpleData name=\"Tehsil\">{tehsil}</SimpleData>"
+            "<SimpleData name=\"UC\">{uc}</SimpleData></SchemaData></ExtendedData>")
+
+
+def _escape(text):
+    return str(text).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def make_kml(df, boundaries=False, mixed=False) -> bytes:
+    """
+    Point placemarks for the frame's villages with their admin names in "Key: value"
+    descriptions, as the app's combined KML export writes them. `mixed` cycles through
+    description tables, key/value lines and ExtendedData as field apps do.
+    `boundaries` adds a polygon placemark per UC around its villages.
+    """
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2"><Document>']
+    # KML needs plain decimal degrees; villages without coordinates are left out
+    df = df.assign(**{c: pd.to_numeric(df[c].astype(str).str.replace(r"[^\d.\-]+", "", regex=True), errors="coerce")
+                      for c in ("latitude", "longitude")}).dropna(subset=["latitude", "longitude"])
+    columns = ["province", "district", "tehsil", "uc", "village_name", "latitude", "longitude"]
+    for i, row in enumerate(df[columns].itertuples(index=False)):
+        admin = {k: _escape(getattr(row, k)) for k in ("province", "district", "tehsil", "uc")}
+        style = i % 3 if mixed else 1
+        if style == 0:
+            body = f"<description><![CDATA[{TABLE.format(**admin)}]]></description>"
+        elif style == 1:
+            body = f"<description><![CDATA[{LINES.format(**admin)}]]></description>"
+        else:
+            body = EXTENDED.format(**admin)
+        parts.append(f"<Placemark><name>{_escape(str(row.village_name).strip())}</name>{body}"
+                     f"<Point><coordinates>{row.longitude},{row.latitude},0</coordinates></Point></Placemark>")
+
+    if boundaries:
+        import shapely
+
+        for _, group in df.groupby("uc_prefix", sort=False):
+            hull = shapely.convex_hull(shapely.multipoints(np.column_stack([group["longitude"], group["latitude"]]))).buffer(0.005)
+            ring = " ".join(f"{x:.6f},{y:.6f},0" for x, y in hull.exterior.coords)
+            first = group.iloc[0]
+            admin = {k: _escape(first[k]) for k in ("province", "district", "tehsil", "uc")}
+            parts.append(f"<Placemark><name>{admin['uc']}</name>"
+                         f"<description><![CDATA[{LINES.format(**admin)}]]></description>"
+                         f"<Polygon><outerBoundaryIs><LinearRing><coordinates>{ring}</coordinates>"
+                         f"</LinearRing></outerBoundaryIs></Polygon></Placemark>")
+    parts.append("</Document></kml>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def write_masterlist(df, path):
+    """
+    Writes the frame as a masterlist workbook (no snapshot of the previous file).
+    """
+    from app.data_writer import save_masterlist
+
+    save_masterlist(df, path, snapshot=False)
+    return path
+
+
+def write_template(template, path):
+    if path.lower().endswith(".csv"):
+        template.to_csv(path, index=False)
+    else:
+        template.to_excel(path, index=False, engine="openpyxl")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic masterlist, import template and KML")
+    parser.add_argument("rows", type=int, help="villages in the masterlist")
+    parser.add_argument("out", help="output directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dirty", type=float, default=0.0, help="share of rows given each kind of dirty value")
+    parser.add_argument("--import-rows", type=int, default=0, help="also write import_template.xlsx with this many rows")
+    parser.add_argument("--import-format", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--kml-placemarks", type=int, default=0, help="also write villages.kml with this many villages")
+    parser.add_argument("--boundaries", action="store_true", help="add UC boundary polygons to the KML")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    df = make_masterlist(args.rows, args.seed, dirty=args.dirty)
+    path = write_masterlist(df, os.path.join(args.out, "masterlist.xlsx"))
+    print(f"✅ {len(df)} villages in {df['uc_prefix'].nunique()} UCs, {df['tehsil_pcode'].nunique()} tehsils "
+          f"and {df['district_pcode'].nunique()} districts written to {path}")
+
+    if args.import_rows:
+        template = make_import_template(df, args.import_rows, args.seed, args.dirty)
+        path = write_template(template, os.path.join(args.out, f"import_template.{args.import_format}"))
+        print(f"✅ {len(template)} import rows written to {path}")
+
+    if args.kml_placemarks:
+        sample = df.sample(min(args.kml_placemarks, len(df)), random_state=args.seed).sort_index()
+        path = os.path.join(args.out, "villages.kml")
+        with open(path, "wb") as f:
+            f.write(make_kml(sample, boundaries=args.boundaries, mixed=True))
+        print(f"✅ {len(sample)} placemarks written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,187 +0,0 @@
-# data/admin_codes.py
-
-PROVINCES = {
-    "Azad Kashmir": "PK1",
-    "Balochistan": "PK2",
-    "Gilgit Baltistan": "PK3",
-    "Islamabad": "PK4",
-    "Khyber Pakhtunkhwa": "PK5",
-    "Punjab": "PK6",
-    "Sindh": "PK7"
-}
-
-DISTRICTS = {
-    # Azad Kashmir
-    "Bagh": "PK101",
-    "Bhimber": "PK102",
-    "Jhelum Valley": "PK103",
-    "Haveli": "PK104",
-    "Kotli": "PK105",
-    "Mirpur": "PK106",
-    "Muzaffarabad": "PK107",
-    "Neelum": "PK108",
-    "Poonch": "PK109",
-    "Sudhnoti": "PK110",
-
-    # Balochistan
-    "Awaran": "PK201",
-    "Barkhan": "PK202",
-    "Chagai": "PK203",
-    "Dera Bugti": "PK204",
-    "Gwadar": "PK205",
-    "Harnai": "PK206",
-    "Jaffarabad": "PK207",
-    "Jhal Magsi": "PK208",
-    "Kachhi": "PK209",
-    "Kalat": "PK210",
-    "Kech": "PK211",
-    "Kharan": "PK212",
-    "Khuzdar": "PK213",
-    "Killa Abdullah": "PK214",
-    "Killa Saifullah": "PK215",
-    "Kohlu": "PK216",
-    "Lasbela": "PK217",
-    "Lehri": "PK218",
-    "Loralai": "PK219",
-    "Mastung": "PK220",
-    "Musakhel": "PK221",
-    "Nasirabad": "PK222",
-    "Nushki": "PK223",
-    "Panjgur": "PK224",
-    "Pishin": "PK225",
-    "Quetta": "PK226",
-    "Sherani": "PK227",
-    "Sibi": "PK228",
-    "Sohbatpur": "PK229",
-    "Washuk": "PK230",
-    "Zhob": "PK231",
-    "Ziarat": "PK232",
-    "Shaheed Sikandarabad": "PK233",
-    "Duki": "PK234",
-    "Chaman": "PK235",
-
-    # Gilgit Baltistan
-    "Astore": "PK301",
-    "Diamir": "PK302",
-    "Ghanche": "PK303",
-    "Ghizer": "PK304",
-    "Gilgit": "PK305",
-    "Hunza": "PK306",
-    "Skardu": "PK307",
-    "Nagar": "PK308",
-    "Kharmang": "PK309",
-    "Shigar": "PK310",
-    "Darel": "PK311",
-    "Tangir": "PK312",
-    "Gupis-Yasin": "PK313",
-    "Rondu": "PK314",
-
-    # Islamabad
-    "Islamabad": "PK401",
-
-    # Khyber Pakhtunkhwa
-    "Abbottabad": "PK501",
-    "Bajaur": "PK502",
-    "Bannu": "PK503",
-    "Batagram": "PK504",
-    "Buner": "PK505",
-    "Charsadda": "PK506",
-    "Chitral Lower": "PK507",
-    "Chitral Upper": "PK508",
-    "D. I. Khan": "PK509",
-    "Hangu": "PK510",
-    "Haripur": "PK511",
-    "Karak": "PK512",
-    "Khyber": "PK513",
-    "Kohat": "PK514",
-    "Kohistan Lower": "PK515",
-    "Kohistan Upper": "PK516",
-    "Kolai Palas Kohistan": "PK517",
-    "Kurram": "PK518",
-    "Lakki Marwat": "PK519",
-    "Lower Dir": "PK520",
-    "Malakand": "PK521",
-    "Mansehra": "PK522",
-    "Mardan": "PK523",
-    "Mohmand": "PK524",
-    "North Waziristan": "PK525",
-    "Nowshera": "PK526",
-    "Orakzai": "PK527",
-    "Peshawar": "PK528",
-    "Shangla": "PK529",
-    "South Waziristan": "PK530",
-    "Swabi": "PK531",
-    "Swat": "PK532",
-    "Tank": "PK533",
-    "Tor Ghar": "PK534",
-    "Upper Dir": "PK535",
-
-    # Punjab
-    "Attock": "PK601",
-    "Bahawalnagar": "PK602",
-    "Bahawalpur": "PK603",
-    "Bhakkar": "PK604",
-    "Chakwal": "PK605",
-    "Chiniot": "PK606",
-    "Dera Ghazi Khan": "PK607",
-    "Faisalabad": "PK608",
-    "Gujranwala": "PK609",
-    "Gujrat": "PK610",
-    "Hafizabad": "PK611",
-    "Jhang": "PK612",
-    "Jhelum": "PK613",
-    "Kasur": "PK614",
-    "Khanewal": "PK615",
-    "Khushab": "PK616",
-    "Lahore": "PK617",
-    "Layyah": "PK618",
-    "Lodhran": "PK619",
-    "Mandi Bahauddin": "PK620",
-    "Mianwali": "PK621",
-    "Multan": "PK622",
-    "Muzaffargarh": "PK623",
-    "Nankana Sahib": "PK624",
-    "Narowal": "PK625",
-    "Okara": "PK626",
-    "Pakpattan": "PK627",
-    "Rahim Yar Khan": "PK628",
-    "Rajanpur": "PK629",
-    "Rawalpindi": "PK630",
-    "Sahiwal": "PK631",
-    "Sargodha": "PK632",
-    "Sheikhupura": "PK633",
-    "Sialkot": "PK634",
-    "Toba Tek Singh": "PK635",
-    "Vehari": "PK636",
-
-    # Sindh
-    "Badin": "PK701",
-    "Central Karachi": "PK702",
-    "Dadu": "PK703",
-    "East Karachi": "PK704",
-    "Ghotki": "PK705",
-    "Hyderabad": "PK706",
-    "Jacobabad": "PK707",
-    "Jamshoro": "PK708",
-    "Kambar Shahdad Kot": "PK709",
-    "Kashmore": "PK710",
-    "Khairpur": "PK711",
-    "Korangi Karachi": "PK712",
-    "Larkana": "PK713",
-    "Malir Karachi": "PK714",
-    "Matiari": "PK715",
-    "Mirpur Khas": "PK716",
-    "Naushahro Feroze": "PK717",
-    "Sanghar": "PK718",
-    "Shaheed Benazir Abad": "PK719",
-    "Shikarpur": "PK720",
-    "South Karachi": "PK721",
-    "Sujawal": "PK722",
-    "Sukkur": "PK723",
-    "Tando Allahyar": "PK724",
-    "Tando Muhammad Khan": "PK725",
-    "Tharparkar": "PK726",
-    "Thatta": "PK727",
-    "Umer Kot": "PK728",
-    "West Karachi": "PK729"
-}
@@ -1,7 +1,10 @@
 import pandas as pd
 
+from app.config import MASTERLIST_PATH
+from app.data_writer import save_masterlist
+
 # Load your current Excel file
-file_path = "data/village_masterlist.xlsx"
+file_path = MASTERLIST_PATH
 df = pd.read_excel(file_path)
 
 # Fix formatting for specific columns
@@ -19,5 +22,5 @@ for col, width in code_columns.items():
 
 
 # Save back with corrected formatting
-df.to_excel(file_path, index=False, sheet_name="Masterlist")
+save_masterlist(df, file_path)
 print("✅ Excel formatting restored for code columns.")
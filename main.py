@@ -3,6 +3,8 @@
 from app.data_loader import load_and_clean_data
 from app.code_generator import generate_village_code
 from app.updater import add_new_village
+from app.data_writer import save_masterlist
+from app.config import MASTERLIST_PATH
 import pandas as pd
 from datetime import datetime
 
@@ -32,9 +34,8 @@ def main():
     print(f"✅ Village '{village_name}' added with code {new_code}")
 
     # Step 5: Overwrite the original masterlist
-    output_path = "data/village_masterlist.xlsx"  # Overwrite original
-    # NEW:
-    df.to_excel(output_path, index=False, sheet_name="Masterlist")
+    output_path = MASTERLIST_PATH  # Overwrite original
+    save_masterlist(df, output_path)
 
     print(f"💾 Masterlist updated in: {output_path}")
 
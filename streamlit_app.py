@@ -1,65 +1,186 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import pydeck as pdk
-import pydeck as pdk
-import geopandas as gpd
 import os
+import json
+import time
 from io import BytesIO
 
-
-
-from app.data_loader import load_and_clean_data
 from app.code_generator import (
+    MAX_SUFFIX,
     generate_village_code,
-    generate_uc_code,
-    generate_tehsil_code,
-    generate_other_district_code
+    generate_village_codes,
 )
-from app.updater import add_new_village, mark_village_for_deletion
-from data.admin_codes import PROVINCES, DISTRICTS
+from app.updater import add_new_village, append_villages
+from app.commit_queue import CommitQueue
+from app.watcher import MasterlistWatcher, PointIndex
+from app.rejections import RejectionHistory
+from app.importer import VillageImporter
+from app.leases import LeaseStore, lease_codes
+from app.exporter import EXPORTERS, export_frame, export_to_bytes
+from app.validator import summarise, validate_masterlist
+from app.capacity import LEVELS, capacity_report
+from app.config import ALLOCATION_POLICY, CAPACITY_WARN, PROFILING
+from app.aliases import NameResolver
+from app.registry import get_registry
+from app.profiling import Profiler, span
+from app.metrics import counter, gauge, start_textfile_writer
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 st.set_page_config(page_title="Admin Code Manager", layout="wide")
 
-# Format all code columns consistently with leading zeros
-def format_code_columns(df: pd.DataFrame) -> pd.DataFrame:
-    def safe_format(x, width):
-        if pd.notnull(x) and str(x).strip() != "":
-            try:
-                return str(int(float(x))).zfill(width)
-            except:
-                return str(x).zfill(width)  # fallback
-        return ""
 
-    if "district_code" in df.columns:
-        df["district_code"] = df["district_code"].apply(lambda x: safe_format(x, 2))
-    if "tehsil_code" in df.columns:
-        df["tehsil_code"] = df["tehsil_code"].apply(lambda x: safe_format(x, 2))
-    if "uc_id" in df.columns:
-        df["uc_id"] = df["uc_id"].apply(lambda x: safe_format(x, 3))
-    if "village/settlement_code" in df.columns:
-        df["village/settlement_code"] = df["village/settlement_code"].apply(lambda x: safe_format(x, 3))
-    return df
+def get_profiler():
+    # Opt-in per session (APP_PROFILING=1 or ?profile=1); reruns are kept in the session
+    if not (PROFILING or st.query_params.get("profile") == "1"):
+        return None
+    if "profiler" not in st.session_state:
+        st.session_state["profiler"] = Profiler()
+    return st.session_state["profiler"]
 
 
+profiler = get_profiler()
+if profiler:
+    profiler.start()
 
-def load_data():
-    return load_and_clean_data()
+# Sessions count as active for this long after their last rerun
+SESSION_WINDOW = 300
+
+
+@st.cache_resource
+def get_session_tracker():
+    # Session id -> time of its last rerun. The app has no /metrics endpoint, so the
+    # metrics file (METRICS_FILE) is written from a background thread started here
+    seen = {}
+    gauge("app_active_sessions", f"Sessions with a rerun in the last {SESSION_WINDOW} seconds").set_function(
+        lambda: sum(t > time.time() - SESSION_WINDOW for t in list(seen.values())))
+    start_textfile_writer()
+    return seen
+
+
+counter("app_reruns_total", "Streamlit script reruns").inc()
+ctx = get_script_run_ctx(suppress_warning=True)
+if ctx is not None:
+    sessions = get_session_tracker()
+    sessions[ctx.session_id] = time.time()
+    for session_id, last in list(sessions.items()):
+        if last < time.time() - SESSION_WINDOW:
+            sessions.pop(session_id, None)
+
+@st.cache_resource
+def get_watcher():
+    # One shared frame per server process, reloaded when the workbook changes on disk
+    return MasterlistWatcher().start()
+
+
+@st.cache_resource
+def get_point_index():
+    # Map points, re-cleaned only for the UCs a swap changed
+    index = PointIndex()
+    get_watcher().add_listener(index.refresh)
+    return index
+
+
+@st.cache_resource
+def get_rejections():
+    history = RejectionHistory()
+    history.import_legacy_file()
+    return history
+
+
+@st.cache_resource
+def get_leases():
+    return LeaseStore()
+
+
+@st.cache_resource
+def get_boundaries():
+    # UC boundary polygons saved from KML uploads
+    from app.boundaries import BoundaryStore
+    return BoundaryStore()
+
+
+@st.cache_resource
+def get_admin_registry():
+    # Province/district/tehsil/UC codes; new units are registered explicitly (Add Admin Unit)
+    return get_registry()
+
+
+@st.cache_resource
+def get_commit_queue():
+    # Every session's changes go through this one writer thread
+    return CommitQueue(get_watcher()).start()
 
-df = format_code_columns(load_data())
-df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
-df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
+
+def load_data():
+    # The shared frame, read-only: the watcher thread reloads outside edits and swaps the
+    # new frame in, so a rerun never parses the workbook (only the very first load waits)
+    return get_watcher().frame
+
+
+def commit(mutation):
+    """
+    Applies `mutation(frame) -> (frame, result)` to the authoritative masterlist via the
+    shared writer and returns `result` once it is saved.
+    """
+    with span("commit"):
+        return get_commit_queue().commit(mutation)
+
+
+@st.cache_resource(max_entries=1)
+def get_reverse_geocoder(boundaries_version):
+    # Rebuilt when UC boundaries are saved, so their UC/tehsil layers are included
+    from app.geocoder import ReverseGeocoder
+    geocoder = ReverseGeocoder(resolver=NameResolver(get_admin_registry()))
+    geocoder.add_uc_layers(get_boundaries())
+    return geocoder
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def resolve_upload(frame, registry_version, boundaries_version):
+    """
+    Maps an upload's province/district/tehsil spellings to registered names and fills
+    blank admin names from the coordinates, once per upload (and registry and
+    boundary version). Returns (resolved frame, corrections report).
+    """
+    resolver = NameResolver(get_admin_registry())
+    with span("resolve names"):
+        resolved = resolver.resolve_frame(frame)
+    with span("geocode blanks"):
+        resolved = get_reverse_geocoder(boundaries_version).fill_missing(resolved)
+    return resolved, resolver.report()
+
+
+def show_name_corrections(report):
+    if not report.empty:
+        with st.expander(f"🔤 {len(report)} names did not match exactly"):
+            st.dataframe(report, use_container_width=True)
+
+
+def show_profiling_panel(profiler):
+    rerun = profiler.reruns[-1]
+    with st.sidebar.expander(f"⏱️ Profiling (last run {rerun.duration * 1000:.0f} ms)"):
+        numbers = [r.number for r in reversed(profiler.reruns)]
+        picked = st.selectbox("Rerun", numbers, key="profiling_rerun")
+        shown = next(r for r in profiler.reruns if r.number == picked)
+        st.dataframe(shown.to_frame(), hide_index=True, use_container_width=True)
+        st.caption(f"Last {len(profiler.reruns)} reruns")
+        st.dataframe(profiler.summary(), hide_index=True, use_container_width=True)
+        st.download_button("⬇️ Chrome Trace (JSON)", json.dumps(profiler.chrome_trace()),
+                           file_name="app_trace.json", mime="application/json")
+        if st.button("🧹 Clear Reruns", key="profiling_clear"):
+            profiler.reruns.clear()
+
+
+with span("load masterlist"):
+    df = load_data()
+registry = get_admin_registry()
+with span("registry"):
+    registry.reload_if_changed()
+PROVINCES = registry.provinces()
 st.title("📍 Village and Admin Code Manager")
 
-tab1, tab2, tab3, tab4, tab5,tab6, tab7 = st.tabs([
-    "➕ Add Village",
-    "➕ Add UC / Tehsil / District",
-    "🛑 Mark Deletion",
-    "📄 View Data",
-    "📥 Bulk Import",
-    "🗺️ View on a Map",
-    "📂 KML Upload & Merge"
-])
+
 def generate_next_uc_id(df, tehsil_pcode: str) -> str:
     uc_ids = (
         df[df["tehsil_pcode"] == tehsil_pcode]["uc_id"]
@@ -72,23 +193,33 @@ def generate_next_uc_id(df, tehsil_pcode: str) -> str:
     return str(next_id).zfill(3)
 
 # TAB 1: Add Village
-with tab1:
+def show_add_village(df):
     st.header("➕ Add New Village(s)")
     province = st.selectbox("Province", list(PROVINCES.keys()))
     province_code = PROVINCES[province].replace("PK", "")
 
-    districts = {k: v for k, v in DISTRICTS.items() if v.startswith(f"PK{province_code}")}
+    districts = registry.districts(f"PK{province_code}")
     district = st.selectbox("District", list(districts.keys()))
     district_pcode = districts[district]
 
-    tehsils = df[df["district_pcode"] == district_pcode]["tehsil"].dropna().unique().tolist()
-    tehsil = st.selectbox("Tehsil", tehsils)
+    with span("dropdowns"):
+        tree = get_watcher().dropdown_tree
+        tehsils = tree.tehsils(district_pcode)
+        tehsil = st.selectbox("Tehsil", tehsils)
 
-    ucs = df[(df["district_pcode"] == district_pcode) & (df["tehsil"] == tehsil)]["uc"].dropna().unique().tolist()
-    uc = st.selectbox("UC", ucs)
+        ucs = tree.ucs(district_pcode, tehsil)
+        uc = st.selectbox("UC", ucs)
 
-    uc_df = df[(df["tehsil"] == tehsil) & (df["uc"] == uc)]
-    uc_prefix = uc_df["uc_prefix"].iloc[0] if not uc_df.empty else None
+        uc_df = df[(df["tehsil"] == tehsil) & (df["uc"] == uc)]
+        uc_prefix = uc_df["uc_prefix"].iloc[0] if not uc_df.empty else None
+
+    used_suffix = 0
+    if uc_prefix:
+        next_code = get_watcher().code_index.next_code(uc_prefix, get_leases().reserved_max(uc_prefix))
+        used_suffix = int(next_code[len(uc_prefix):]) - 1
+    if used_suffix >= CAPACITY_WARN * MAX_SUFFIX:
+        st.warning(f"⚠️ UC {uc_prefix} has used or leased suffixes up to {used_suffix:03d}; only "
+                   f"{max(MAX_SUFFIX - used_suffix, 0)} new codes are left (allocation policy: {ALLOCATION_POLICY}).")
 
     village_names_input = st.text_area("Enter Village Name(s) (For multiple villages use comma or newline separated)")
     lat_input = st.text_area("Latitude(s) (Optional, match village order)", help="Comma or newline-separated. Must be between 23 and 37 with 6 decimals.")
@@ -104,7 +235,7 @@ with tab1:
         elif (lat_values or lon_values) and (len(lat_values) != len(village_names) or len(lon_values) != len(village_names)):
             st.error("Number of latitudes/longitudes must match the number of villages.")
         else:
-            new_rows = []
+            villages_to_add = []
             valid = True
             for idx, name in enumerate(village_names):
                 lat = lat_values[idx] if idx < len(lat_values) else ""
@@ -129,23 +260,73 @@ with tab1:
                 else:
                     lat = lon = None
 
-                new_code = generate_village_code(df, uc_prefix)
-                new_row = add_new_village(df, uc_prefix, name, new_code)
-                new_row["latitude"] = lat
-                new_row["longitude"] = lon
-                new_row["remarks"] = f"newly added on {datetime.today().strftime('%Y-%m-%d')}"
-                df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                new_rows.append((name, new_code))
+                villages_to_add.append((name, lat, lon))
+
+            def add_villages(frame):
+                # Codes are assigned against the latest masterlist, not this session's copy
+                leases = get_leases()
+                new_codes = generate_village_codes(
+                    frame, uc_prefix, len(villages_to_add), leases.reserved_max(uc_prefix),
+                    ALLOCATION_POLICY, leases.leased_suffixes(uc_prefix)
+                )
+                uc_rows = frame[frame["uc_prefix"] == uc_prefix]
+                rows_to_add, added = [], []
+                for (name, lat, lon), new_code in zip(villages_to_add, new_codes):
+                    new_row = add_new_village(uc_rows, uc_prefix, name, new_code)
+                    new_row["latitude"] = lat
+                    new_row["longitude"] = lon
+                    new_row["remarks"] = f"newly added on {datetime.today().strftime('%Y-%m-%d')}"
+                    rows_to_add.append(new_row)
+                    added.append((name, new_code))
+                return append_villages(frame, rows_to_add), added
 
             if valid:
-                df = format_code_columns(df)
-                df.to_excel("data/village_masterlist.xlsx", index=False, sheet_name="Masterlist")
-                st.success(f"✅ Added {len(new_rows)} villages.")
-                for vname, vcode in new_rows:
-                    st.write(f"🟢 {vname} → {vcode}")
+                try:
+                    new_rows = commit(add_villages)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    st.success(f"✅ Added {len(new_rows)} villages.")
+                    for vname, vcode in new_rows:
+                        st.write(f"🟢 {vname} → {vcode}")
+
+    with st.expander("📦 Reserve Codes for an Offline Team"):
+        st.caption("Leased codes are skipped by normal allocation until the lease expires or is released. "
+                   "Teams enter them in the village_pcode_new column of the bulk import template.")
+        lease_team = st.text_input("Team Name", key="lease_team")
+        lease_count = st.number_input("Number of Codes", min_value=1, max_value=999, value=20, key="lease_count")
+        lease_days = st.number_input("Valid for (days)", min_value=1, value=30, key="lease_days")
+
+        if st.button("Reserve Codes"):
+            if not uc_prefix or not lease_team.strip():
+                st.error("Select a UC and enter a team name.")
+            else:
+                def create_lease(frame):
+                    # Taken inside the writer so no concurrent allocation can use the block
+                    current_max = int(generate_village_code(frame, uc_prefix)[len(uc_prefix):]) - 1
+                    return None, get_leases().create(lease_team.strip(), uc_prefix, int(lease_count), current_max, int(lease_days))
+
+                try:
+                    lease = commit(create_lease)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    codes = lease_codes(lease)
+                    st.success(f"✅ Lease {lease['id']}: {codes[0]} – {codes[-1]}, expires {lease['expires_at']}")
+                    st.download_button("⬇️ Download Leased Codes", "village_pcode_new\n" + "\n".join(codes),
+                                       file_name=f"lease_{lease['id']}_{uc_prefix}.csv", mime="text/csv")
+
+        active_leases = get_leases().active(uc_prefix) if uc_prefix else []
+        if active_leases:
+            st.dataframe(pd.DataFrame(active_leases)[["id", "team", "first_suffix", "last_suffix", "used", "expires_at"]],
+                         use_container_width=True)
+            release_id = st.selectbox("Release Lease", [l["id"] for l in active_leases], key="lease_release")
+            if st.button("Release Selected Lease"):
+                get_leases().release(release_id)
+                st.success(f"✅ Lease {release_id} released.")
 
 # TAB 2: Add Admin Levels
-with tab2:
+def show_add_admin_unit(df):
     st.header("➕ Add New UC / Tehsil / District (with village)")
 
     level = st.radio("Select Level to Add", ["UC", "Tehsil", "District"])
@@ -158,17 +339,13 @@ with tab2:
     district_pcode = None
 
     if level in ["Tehsil", "UC"]:
-        district = st.selectbox("District", [k for k, v in DISTRICTS.items() if v.startswith(f"PK{province_code}")], key="admin_district")
-        district_pcode = DISTRICTS[district]
-        district_code = district_pcode[-2:]
+        districts = registry.districts(f"PK{province_code}")
+        district = st.selectbox("District", list(districts.keys()), key="admin_district")
+        district_pcode = districts[district]
 
     if level == "UC":
-        tehsils = df[df["district_pcode"] == district_pcode]["tehsil"].dropna().unique().tolist()
-        tehsil = st.selectbox("Tehsil", tehsils, key="admin_tehsil")
-        filtered_tehsil = df[(df["district_pcode"] == district_pcode) & (df["tehsil"] == tehsil)]
-        if not filtered_tehsil.empty:
-            tehsil_pcode = filtered_tehsil["tehsil_pcode"].iloc[0]
-            tehsil_code = tehsil_pcode[-2:]
+        tehsil = st.selectbox("Tehsil", registry.child_names(district_pcode), key="admin_tehsil")
+        tehsil_pcode = registry.code(tehsil, district_pcode)
 
     new_district = st.text_input("New District Name") if level == "District" else None
     new_tehsil = st.text_input("New Tehsil Name") if level in ["Tehsil", "District"] else None
@@ -188,73 +365,85 @@ with tab2:
         if not village_list:
             st.error("⚠️ You must add at least one village.")
         else:
-            new_rows = []
             valid = True
 
-            if level == "District":
-                existing_districts = [v for v in DISTRICTS.values() if v.startswith(f"PK{province_code}")]
-                existing_codes = [int(v[-2:]) for v in existing_districts if v[-2:].isdigit()]
-                next_code = max(existing_codes, default=0) + 1
-                district_code = str(next_code).zfill(2)
-                district_pcode = f"PK{province_code}{district_code}"
-                district = new_district
-                st.success(f"✅ District '{district}' assigned code {district_pcode}")
-
-            if level in ["District", "Tehsil"]:
-                existing_tehsils = df[df["district_pcode"] == district_pcode]["tehsil_code"].dropna().astype(str).tolist()
-                numeric_tehsils = [int(t) for t in existing_tehsils if t.isdigit()]
-                next_tehsil = max(numeric_tehsils, default=0) + 1
-                tehsil_code = str(next_tehsil).zfill(2)
-                tehsil_pcode = f"{district_pcode}{tehsil_code}"
-                tehsil = new_tehsil
-                st.success(f"✅ Tehsil '{tehsil}' assigned code {tehsil_pcode}")
-
-            if level in ["District", "Tehsil", "UC"]:
-                uc_id = generate_next_uc_id(df, tehsil_pcode)
-                uc_prefix = f"{tehsil_pcode}{uc_id}"
-                st.info(f"🔢 UC Prefix assigned: {uc_prefix}")
-
-                existing_suffixes = df[df["uc_prefix"] == uc_prefix]["village/settlement_code"].dropna().astype(int).tolist()
-                start_suffix = max(existing_suffixes, default=0)
-
-                for i, v in enumerate(village_list):
-                    next_suffix = start_suffix + i + 1
-                    village_settlement_code = str(next_suffix).zfill(3)
-                    village_pcode = f"{uc_prefix}{village_settlement_code}"
+            if level == "District" and registry.district_code(new_district.strip()):
+                st.error(f"⚠️ District '{new_district.strip()}' is already registered as {registry.district_code(new_district.strip())}.")
+                valid = False
+            if level == "UC" and not tehsil_pcode:
+                st.error(f"⚠️ District '{district}' has no registered tehsil; add the tehsil first.")
+                valid = False
+
+            villages_to_add = []
+            for v_idx, v in enumerate(village_list):
+                # Latitude and Longitude validation
+                lat = lat_values[v_idx] if v_idx < len(lat_values) else ""
+                lon = lon_values[v_idx] if v_idx < len(lon_values) else ""
 
-                    # Latitude and Longitude validation
-                    lat = lat_values[i] if i < len(lat_values) else ""
-                    lon = lon_values[i] if i < len(lon_values) else ""
-
-                    if lat and lon:
-                        try:
-                            lat_f = float(lat)
-                            lon_f = float(lon)
-                            if not (23 <= lat_f <= 37) or not (60 <= lon_f <= 77):
-                                st.error(f"❌ Invalid coordinates for '{v}': Latitude must be 23-37 and Longitude 60-77")
-                                valid = False
-                                break
-                            if len(lat.split(".")[-1]) < 6 or len(lon.split(".")[-1]) < 6:
-                                st.error(f"❌ Coordinates for '{v}' must have at least 6 digits after decimal.")
-                                valid = False
-                                break
-                        except:
-                            st.error(f"❌ Coordinates for '{v}' are not valid float values.")
+                if lat and lon:
+                    try:
+                        lat_f = float(lat)
+                        lon_f = float(lon)
+                        if not (23 <= lat_f <= 37) or not (60 <= lon_f <= 77):
+                            st.error(f"❌ Invalid coordinates for '{v}': Latitude must be 23-37 and Longitude 60-77")
+                            valid = False
+                            break
+                        if len(lat.split(".")[-1]) < 6 or len(lon.split(".")[-1]) < 6:
+                            st.error(f"❌ Coordinates for '{v}' must have at least 6 digits after decimal.")
                             valid = False
                             break
-                    else:
-                        lat = lon = None
+                    except:
+                        st.error(f"❌ Coordinates for '{v}' are not valid float values.")
+                        valid = False
+                        break
+                else:
+                    lat = lon = None
+
+                villages_to_add.append((v, lat, lon))
+
+            def add_admin_unit(frame):
+                # District codes come from the registry (or the masterlist, if it has one the
+                # registry has not caught up with); tehsil, UC and village codes from the
+                # latest masterlist. The saved rows are registered after the commit.
+                if level == "District":
+                    province_districts = frame[frame["province_pcode"] == f"PK{province_code}"]["district_pcode"]
+                    taken = [int(d[-2:]) for d in province_districts.dropna().astype(str) if d[-2:].isdigit()]
+                    unit_district_pcode = max(registry.next_code(f"PK{province_code}"),
+                                              f"PK{province_code}{str(max(taken, default=0) + 1).zfill(2)}")
+                    unit_district = new_district.strip()
+                else:
+                    unit_district_pcode, unit_district = district_pcode, district
+
+                if level in ["District", "Tehsil"]:
+                    existing_tehsils = frame[frame["district_pcode"] == unit_district_pcode]["tehsil_code"].dropna().astype(str).tolist()
+                    numeric_tehsils = [int(t) for t in existing_tehsils if t.isdigit()]
+                    unit_tehsil_code = str(max(numeric_tehsils, default=0) + 1).zfill(2)
+                    unit_tehsil_pcode = f"{unit_district_pcode}{unit_tehsil_code}"
+                else:
+                    unit_tehsil_code, unit_tehsil_pcode = tehsil_pcode[-2:], tehsil_pcode
+
+                uc_id = generate_next_uc_id(frame, unit_tehsil_pcode)
+                uc_prefix = f"{unit_tehsil_pcode}{uc_id}"
+
+                existing_suffixes = frame[frame["uc_prefix"] == uc_prefix]["village/settlement_code"].dropna().astype(str).tolist()
+                start_suffix = max((int(s) for s in existing_suffixes if s.isdigit()), default=0)
+                rows_to_add, added = [], []
+
+                for i, (v, lat, lon) in enumerate(villages_to_add):
+                    next_suffix = start_suffix + i + 1
+                    village_settlement_code = str(next_suffix).zfill(3)
+                    village_pcode = f"{uc_prefix}{village_settlement_code}"
 
                     new_row = {
                         "province": province,
                         "province_code": province_code,
                         "province_pcode": f"PK{province_code}",
-                        "district": district,
-                        "district_code": district_code,
-                        "district_pcode": district_pcode,
-                        "tehsil": tehsil,
-                        "tehsil_code": tehsil_code,
-                        "tehsil_pcode": tehsil_pcode,
+                        "district": unit_district,
+                        "district_code": unit_district_pcode[-2:],
+                        "district_pcode": unit_district_pcode,
+                        "tehsil": tehsil if level == "UC" else new_tehsil,
+                        "tehsil_code": unit_tehsil_code,
+                        "tehsil_pcode": unit_tehsil_pcode,
                         "uc": new_uc,
                         "uc_id": uc_id,
                         "uc/vc/nc_pcode": uc_prefix,
@@ -267,34 +456,79 @@ with tab2:
                         "remarks": f"newly added with {level.lower()} on {datetime.today().strftime('%Y-%m-%d')}"
                     }
 
-                    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                    new_rows.append((v, village_pcode))
+                    rows_to_add.append(new_row)
+                    added.append((v, village_pcode))
+                return append_villages(frame, rows_to_add), (unit_district_pcode, unit_tehsil_pcode, uc_prefix, added)
 
-                if valid:
-                    df = format_code_columns(df)
-                    df.to_excel("data/village_masterlist.xlsx", index=False, sheet_name="Masterlist")
+            if valid:
+                try:
+                    new_district_pcode, new_tehsil_pcode, uc_prefix, new_rows = commit(add_admin_unit)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    saved = load_data()
+                    registry.sync(saved[saved["uc_prefix"] == uc_prefix])
+                    if level == "District":
+                        st.success(f"✅ District '{new_district.strip()}' assigned code {new_district_pcode} (registry v{registry.version})")
+                    if level in ["District", "Tehsil"]:
+                        st.success(f"✅ Tehsil '{new_tehsil}' assigned code {new_tehsil_pcode}")
+                    st.info(f"🔢 UC Prefix assigned: {uc_prefix}")
                     st.success(f"✅ {level} and {len(new_rows)} village(s) saved.")
                     for vname, vcode in new_rows:
                         st.write(f"🟢 {vname} → {vcode}")
 
+    with st.expander("🗂️ Units in the masterlist but not in the registry"):
+        # Rows edited into the workbook by hand (or imported) may name units the registry
+        # does not have; they are only registered once someone confirms them here
+        version, frame = get_watcher().snapshot()
+        unknown = unregistered_units(frame, version, registry.version)
+        if not unknown:
+            st.write("✅ Every unit in the masterlist is registered.")
+        else:
+            st.dataframe(pd.DataFrame(unknown, columns=["level", "code", "name", "parent"]), use_container_width=True)
+            if st.button(f"🗂️ Register {len(unknown)} units"):
+                added = registry.sync(frame)
+                st.success(f"✅ {added} units added (registry v{registry.version}).")
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def unregistered_units(_frame, version, registry_version):
+    return get_admin_registry().unknown_units(_frame)
+
 # TAB 3: Mark Deletion
-with tab3:
+def show_mark_deletion(df):
     st.header("🛑 Mark Village for Deletion")
 
     sub_tab = st.radio("Choose Deletion Method", ["By Location", "By Village P-code", "Bulk P-code Upload"])
 
+    def mark_for_deletion(codes, justification):
+        """
+        Marks the given P-codes in the latest masterlist; returns the codes that were found.
+        """
+        if not df["village_pcode_new"].isin(codes).any():
+            return set()
+        remark = f"to be deleted: {justification or 'no reason'} on {datetime.today().strftime('%Y-%m-%d')}"
+
+        def mutation(frame):
+            match = frame["village_pcode_new"].isin(codes)
+            frame.loc[match, "remarks"] = remark
+            return (frame if match.any() else None), set(frame.loc[match, "village_pcode_new"])
+
+        return commit(mutation)
+
     if sub_tab == "By Location":
         province = st.selectbox("Province (Delete)", list(PROVINCES.keys()), key="del_prov")
         province_code = PROVINCES[province].replace("PK", "")
 
-        districts = {k: v for k, v in DISTRICTS.items() if v.startswith(f"PK{province_code}")}
+        districts = registry.districts(f"PK{province_code}")
         district = st.selectbox("District", list(districts.keys()), key="del_dist")
         district_pcode = districts[district]
 
-        tehsils = df[df["district_pcode"] == district_pcode]["tehsil"].dropna().unique().tolist()
+        tree = get_watcher().dropdown_tree
+        tehsils = tree.tehsils(district_pcode)
         tehsil = st.selectbox("Tehsil", tehsils, key="del_tehsil")
 
-        ucs = df[(df["district_pcode"] == district_pcode) & (df["tehsil"] == tehsil)]["uc"].dropna().unique().tolist()
+        ucs = tree.ucs(district_pcode, tehsil)
         uc = st.selectbox("UC", ucs, key="del_uc")
 
         uc_df = df[(df["tehsil"] == tehsil) & (df["uc"] == uc)]
@@ -308,10 +542,7 @@ with tab3:
 
         if st.button("Mark as Deleted"):
             if code_to_mark and justification:
-                if mark_village_for_deletion(df, code_to_mark):
-                    idx = df[df["village_pcode_new"] == code_to_mark].index[0]
-                    df.loc[idx, "remarks"] = f"to be deleted: {justification or 'no reason'} on {datetime.today().strftime('%Y-%m-%d')}"
-                    df.to_excel("data/village_masterlist.xlsx", index=False, sheet_name="Masterlist")
+                if mark_for_deletion([code_to_mark], justification):
                     st.success(f"🛑 Village '{village}' marked for deletion.")
                 else:
                     st.warning("Village code not found.")
@@ -323,10 +554,7 @@ with tab3:
         justification = st.text_area("Justification", key="just_single")
 
         if st.button("Delete by P-code"):
-            if pcode and pcode in df["village_pcode_new"].values:
-                idx = df[df["village_pcode_new"] == pcode].index[0]
-                df.loc[idx, "remarks"] = f"to be deleted: {justification or 'no reason'} on {datetime.today().strftime('%Y-%m-%d')}"
-                df.to_excel("data/village_masterlist.xlsx", index=False, sheet_name="Masterlist")
+            if pcode and mark_for_deletion([pcode], justification):
                 st.success(f"✅ Village with code {pcode} marked for deletion.")
             else:
                 st.error("P-code not found.")
@@ -338,61 +566,97 @@ with tab3:
 
         if st.button("Apply Bulk Deletion"):
             raw_codes = [x.strip() for x in pcode_bulk.replace(",", "\n").split("\n") if x.strip()]
-            valid_codes = [c for c in raw_codes if c in df["village_pcode_new"].values]
-            missing = [c for c in raw_codes if c not in df["village_pcode_new"].values]
+            found = mark_for_deletion(raw_codes, justification) if raw_codes else set()
+            valid_codes = [c for c in raw_codes if c in found]
+            missing = [c for c in raw_codes if c not in found]
 
             if valid_codes:
-                df.loc[df["village_pcode_new"].isin(valid_codes), "remarks"] = f"to be deleted: {justification or 'no reason'} on {datetime.today().strftime('%Y-%m-%d')}"
-                df.to_excel("data/village_masterlist.xlsx", index=False, sheet_name="Masterlist")
                 st.success(f"✅ {len(valid_codes)} villages marked for deletion.")
                 if missing:
                     st.warning(f"⚠️ The following codes were not found: {', '.join(missing)}")
             else:
                 st.error("No valid village P-codes provided.")
+
 # TAB 4: View Data
-with tab4:
+def show_view_data(df):
     st.header("📄 Filter & View Dataset")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        enum_filter = st.selectbox("Enumerator", ["All"] + sorted(df["enumerator"].dropna().unique().tolist()), key="f1")
-        prov_filter = st.selectbox("Province", ["All"] + sorted(df["province"].dropna().unique().tolist()), key="f2")
-        dist_filter = st.selectbox("District", ["All"] + sorted(df["district"].dropna().unique().tolist()), key="f3")
-    with col2:
-        tehsil_filter = st.selectbox("Tehsil", ["All"] + sorted(df["tehsil"].dropna().unique().tolist()), key="f4")
-        uc_filter = st.selectbox("UC", ["All"] + sorted(df["uc"].dropna().unique().tolist()), key="f5")
-        remarks_options = ["All"] + sorted(df["remarks"].dropna().unique().tolist())
-        remarks_filter = st.selectbox("Remarks", remarks_options, key="f8")
-
-    with col3:
-        village_filter = st.text_input("Village Name", key="f6")
-        code_filter = st.text_input("Village Code", key="f7")
-
-    filtered_df = df.copy()
-    if enum_filter != "All":
-        filtered_df = filtered_df[filtered_df["enumerator"] == enum_filter]
-    if prov_filter != "All":
-        filtered_df = filtered_df[filtered_df["province"] == prov_filter]
-    if dist_filter != "All":
-        filtered_df = filtered_df[filtered_df["district"] == dist_filter]
-    if tehsil_filter != "All":
-        filtered_df = filtered_df[filtered_df["tehsil"] == tehsil_filter]
-    if uc_filter != "All":
-        filtered_df = filtered_df[filtered_df["uc"] == uc_filter]
-    if village_filter:
-        filtered_df = filtered_df[filtered_df["village_name"].str.contains(village_filter, case=False, na=False)]
-    if code_filter:
-        filtered_df = filtered_df[filtered_df["village_pcode_new"].str.contains(code_filter, case=False, na=False)]
-    if remarks_filter != "All":
-        filtered_df = filtered_df[filtered_df["remarks"] == remarks_filter]
-    st.dataframe(filtered_df)
-
-    csv = filtered_df.to_csv(index=False).encode("utf-8")
+    with span("filter dropdowns"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            enum_filter = st.selectbox("Enumerator", ["All"] + sorted(df["enumerator"].dropna().unique().tolist()), key="f1")
+            prov_filter = st.selectbox("Province", ["All"] + sorted(df["province"].dropna().unique().tolist()), key="f2")
+            dist_filter = st.selectbox("District", ["All"] + sorted(df["district"].dropna().unique().tolist()), key="f3")
+        with col2:
+            tehsil_filter = st.selectbox("Tehsil", ["All"] + sorted(df["tehsil"].dropna().unique().tolist()), key="f4")
+            uc_filter = st.selectbox("UC", ["All"] + sorted(df["uc"].dropna().unique().tolist()), key="f5")
+            remarks_options = ["All"] + sorted(df["remarks"].dropna().unique().tolist())
+            remarks_filter = st.selectbox("Remarks", remarks_options, key="f8")
+
+        with col3:
+            village_filter = st.text_input("Village Name", key="f6")
+            code_filter = st.text_input("Village Code", key="f7")
+
+    with span("apply filters"):
+        filtered_df = df
+        if enum_filter != "All":
+            filtered_df = filtered_df[filtered_df["enumerator"] == enum_filter]
+        if prov_filter != "All":
+            filtered_df = filtered_df[filtered_df["province"] == prov_filter]
+        if dist_filter != "All":
+            filtered_df = filtered_df[filtered_df["district"] == dist_filter]
+        if tehsil_filter != "All":
+            filtered_df = filtered_df[filtered_df["tehsil"] == tehsil_filter]
+        if uc_filter != "All":
+            filtered_df = filtered_df[filtered_df["uc"] == uc_filter]
+        if village_filter:
+            filtered_df = filtered_df[filtered_df["village_name"].str.contains(village_filter, case=False, na=False)]
+        if code_filter:
+            filtered_df = filtered_df[filtered_df["village_pcode_new"].str.contains(code_filter, case=False, na=False)]
+        if remarks_filter != "All":
+            filtered_df = filtered_df[filtered_df["remarks"] == remarks_filter]
+    with span("st.dataframe"):
+        st.dataframe(filtered_df)
+
+    with span("to_csv"):
+        csv = filtered_df.to_csv(index=False).encode("utf-8")
     st.download_button("⬇️ Export Filtered Data", data=csv, file_name="filtered_villages.csv", mime="text/csv")
 
-    # Button to export district-wise Excel files with selected columns only
-    if st.button("📁 Export District-wise Excel Files"):
-        import os
+    # GIS formats are built on demand since they are heavier than CSV
+    col_fmt, col_prep = st.columns([3, 1])
+    with col_fmt:
+        gis_format = st.selectbox(
+            "Other Export Formats",
+            [k for k in EXPORTERS if k != "csv"],
+            format_func=lambda k: EXPORTERS[k]["label"],
+            key="export_fmt"
+        )
+    with col_prep:
+        if st.button("⚙️ Prepare Export"):
+            try:
+                with span(f"export {gis_format}"):
+                    st.session_state["prepared_export"] = (gis_format, export_to_bytes(filtered_df, gis_format))
+            except Exception as e:
+                st.error(f"❌ Export failed: {e}")
+
+    prepared = st.session_state.get("prepared_export")
+    if prepared and prepared[0] == gis_format:
+        exporter = EXPORTERS[gis_format]
+        st.download_button(
+            f"⬇️ Download {exporter['label']}",
+            data=prepared[1],
+            file_name=f"filtered_villages{exporter['extension']}",
+            mime=exporter["mime"]
+        )
 
+    district_format = st.selectbox(
+        "District-wise Export Format",
+        ["xlsx"] + list(EXPORTERS),
+        format_func=lambda k: "Excel" if k == "xlsx" else EXPORTERS[k]["label"],
+        key="district_export_fmt"
+    )
+
+    # Button to export district-wise files with selected columns only
+    if st.button("📁 Export District-wise Files"):
         export_dir = "exports"
         os.makedirs(export_dir, exist_ok=True)
 
@@ -407,26 +671,63 @@ with tab4:
             province_folder = os.path.join(export_dir, province_name)
             os.makedirs(province_folder, exist_ok=True)
 
-            filename = f"{district_name}.xlsx".replace("/", "-")
+            extension = ".xlsx" if district_format == "xlsx" else EXPORTERS[district_format]["extension"]
+            filename = f"{district_name}{extension}".replace("/", "-")
             filepath = os.path.join(province_folder, filename)
 
             # Only include specified columns (ignore missing)
             columns_to_export = [col for col in export_columns if col in group.columns]
-            group[columns_to_export].to_excel(filepath, index=False)
-
-        st.success(f"✅ District-wise Excel files exported to '{export_dir}' folder.")
+            if district_format == "xlsx":
+                with span("to_excel"):
+                    group[columns_to_export].to_excel(filepath, index=False)
+            else:
+                try:
+                    export_frame(group[columns_to_export], district_format, filepath)
+                except ValueError as e:
+                    st.warning(f"⚠️ Skipped {district_name}: {e}")
+
+        st.success(f"✅ District-wise files exported to '{export_dir}' folder.")
+
+    with st.expander("📊 Code Capacity"):
+        capacity_level = st.radio("Level", list(LEVELS), horizontal=True, format_func=str.title, key="capacity_level")
+        if st.button("Run Capacity Report"):
+            with span("capacity report"):
+                st.session_state["capacity_report"] = (capacity_level, capacity_report(get_watcher().frame, capacity_level))
+        report = st.session_state.get("capacity_report")
+        if report and report[0] == capacity_level:
+            capacity = report[1]
+            near = int(capacity["near_capacity" if capacity_level == "uc" else "ucs_near_capacity"].sum())
+            if near:
+                st.warning(f"⚠️ {near} UC(s) have used {CAPACITY_WARN:.0%} or more of the {MAX_SUFFIX} village codes.")
+            st.dataframe(capacity, use_container_width=True)
+            st.download_button("⬇️ Download Capacity Report", capacity.to_csv(index=False).encode("utf-8"),
+                               file_name=f"capacity_{capacity_level}.csv", mime="text/csv")
+
+    with st.expander("🩺 Validate Code Hierarchy"):
+        if st.button("Run Validation"):
+            with span("validation"):
+                st.session_state["validation_report"] = validate_masterlist(get_watcher().frame, get_boundaries())
+        violations = st.session_state.get("validation_report")
+        if violations is not None:
+            if violations.empty:
+                st.success("✅ No hierarchy violations found.")
+            else:
+                st.warning(f"⚠️ {len(violations)} violations found.")
+                st.dataframe(summarise(violations), use_container_width=True)
+                st.dataframe(violations, use_container_width=True)
+                st.download_button("⬇️ Download Violation Report", violations.to_csv(index=False).encode("utf-8"),
+                                   file_name="validation_report.csv", mime="text/csv")
 
 # TAB 5: Bulk Import
-with tab5:
+def show_bulk_import(df):
     st.header("📦 Bulk Import Villages")
 
-    import io
-    from datetime import datetime
-
     # Downloadable Template
-    template_df = pd.DataFrame(columns=["province", "district", "tehsil", "uc", "village_name", "latitude", "longitude"])
-    excel_buf = io.BytesIO()
-    template_df.to_excel(excel_buf, index=False, engine='openpyxl')
+    # village_pcode_new is optional: only for codes a team took from its lease
+    template_df = pd.DataFrame(columns=["province", "district", "tehsil", "uc", "village_name", "latitude", "longitude", "village_pcode_new"])
+    excel_buf = BytesIO()
+    with span("template to_excel"):
+        template_df.to_excel(excel_buf, index=False, engine='openpyxl')
     excel_buf.seek(0)
     st.download_button(
         "⬇️ Download Template",
@@ -438,198 +739,202 @@ with tab5:
     uploaded_file = st.file_uploader("Upload Filled Template (.xlsx or .csv)", type=["xlsx", "csv"])
 
     if uploaded_file:
-        if uploaded_file.name.endswith(".csv"):
-            import_df = pd.read_csv(uploaded_file)
-        else:
-            import_df = pd.read_excel(uploaded_file)
+        with span("read upload"):
+            if uploaded_file.name.endswith(".csv"):
+                import_df = pd.read_csv(uploaded_file)
+            else:
+                import_df = pd.read_excel(uploaded_file)
 
-        import_df = import_df.fillna("").astype(str)
+            import_df = import_df.fillna("").astype(str)
+        import_df, name_report = resolve_upload(import_df, registry.version, get_boundaries().version)
+        show_name_corrections(name_report)
 
         st.subheader("📋 Preview Uploaded Data")
         st.dataframe(import_df.head(20), use_container_width=True)
 
         # Add manual trigger
         if st.button("🚀 Process Upload"):
-            new_rows = []
-            total = len(import_df)
-            progress_bar = st.progress(0, text="Importing villages...")
-
-            for idx, row in import_df.iterrows():
-                prov = row.get("province", "").strip()
-                dist = row.get("district", "").strip()
-                teh = row.get("tehsil", "").strip()
-                uc = row.get("uc", "").strip()
-                vill = row.get("village_name", "").strip()
-                lat = row.get("latitude", None).strip()
-                lon = row.get("longitude", None).strip()
-
-                if not all([prov, dist, teh, uc, vill]):
-                    continue
-
-                if prov not in PROVINCES:
-                    st.warning(f"⚠️ Province '{prov}' not found (Row {idx+2})")
-                    continue
-
-                # Validate lat/lon if present
-                if lat and lon:
-                    try:
-                        lat_f = float(lat)
-                        lon_f = float(lon)
-                        if not (23 <= lat_f <= 37) or not (60 <= lon_f <= 77):
-                            st.warning(f"⚠️ Invalid coordinates for '{vill}' in row {idx+2}")
-                            continue
+            rejected_lookup = get_rejections().lookup_names(import_df.get("village_name", []))
+
+            def import_villages(frame):
+                # Codes are allocated against the latest masterlist inside the writer
+                importer = VillageImporter(frame, remarks="bulk imported", rejected_lookup=rejected_lookup,
+                                           leases=get_leases())
+                importer.add_frame(import_df)
+                if not importer.added:
+                    return None, importer
+                # Recorded before the save: a code the lease counts as used but that never
+                # reached the workbook is only wasted, never handed out twice
+                get_leases().mark_used(importer.lease_used)
+                return importer.apply(frame), importer
+
+            with st.spinner(f"Importing {len(import_df)} villages..."):
+                importer = commit(import_villages)
+
+            for message in importer.warnings:
+                st.warning(message)
+
+            if importer.skipped_rejected:
+                st.info(f"⏭️ Skipped {len(importer.skipped_rejected)} previously rejected villages: "
+                        + ", ".join(f"{name} ({uc})" for name, uc in importer.skipped_rejected[:20]))
+
+            if importer.added:
+                st.success(f"✅ Imported {len(importer.added)} villages.")
+                for name, pcode in importer.added:
+                    st.write(f"🟢 {name} → {pcode}")
+                units = registry.unknown_units(importer.rows)
+                if units:
+                    st.info(f"🗂️ {len(units)} admin units in this import are not registered yet; "
+                            "review them under Add UC / Tehsil / District.")
+            else:
+                st.info("ℹ️ No valid villages were imported.")
 
-                        lat_str = f"{lat_f:.6f}"
-                        lon_str = f"{lon_f:.6f}"
+# The map's derived data is cached per masterlist version (and filter/label choices), so
+# reruns that change nothing on the map, and returning to it, skip the work below.
+# `_frame` is not hashed: it is the frame of that version from watcher.snapshot().
+# These are cache_resource, so every session gets the same objects back without a pickle
+# round trip of the geo frame; callers must treat the returned frames as read-only.
+@st.cache_resource(max_entries=2, show_spinner=False)
+def map_points(_frame, version):
+    """
+    Villages with coordinates inside Pakistan, and the rows sharing a location with
+    another village. Returns (points, duplicate rows, duplicate location count),
+    shared across sessions and not to be modified.
+    """
+    with span("points"):
+        geo_df = get_point_index().points_for(_frame)
+
+    with span("duplicates"):
+        duplicate_points = geo_df[geo_df.duplicated(subset=["latitude", "longitude"], keep=False)]
+        duplicate_count = duplicate_points.groupby(["latitude", "longitude"]).ngroups
+    return geo_df, duplicate_points, duplicate_count
+
+
+@st.cache_resource(max_entries=8)
+def village_layers(_frame, version, province, district, show_labels):
+    """
+    The filtered villages and their point (and label) layers. Layers only carry the
+    columns the map draws and its tooltip shows, which keeps them quick to serialise.
+    """
+    import pydeck as pdk
+
+    geo_df, _, _ = map_points(_frame, version)
+    with span("apply filters"):
+        filtered_df = geo_df
+        if province != "All":
+            filtered_df = filtered_df[filtered_df["province"] == province]
+        if district != "All":
+            filtered_df = filtered_df[filtered_df["district"] == district]
+        points = filtered_df[["longitude", "latitude", "village_name", "district"]]
+
+    with span("village layers"):
+        layers = [
+            pdk.Layer(
+                "ScatterplotLayer",
+                data=points,
+                get_position='[longitude, latitude]',
+                get_fill_color=[255, 0, 0],
+                pickable=True,
+                radius_scale=10,
+                radius_min_pixels=4,
+                radius_max_pixels=12,
+                get_radius=100
+            )
+        ]
 
-                        if len(lat_str.split(".")[1]) != 6 or len(lon_str.split(".")[1]) != 6:
-                            st.warning(f"⚠️ Coordinates in row {idx+2} must have exactly 6 decimal places.")
-                            continue
+        if show_labels:
+            layers.append(
+                pdk.Layer(
+                    "TextLayer",
+                    data=points,
+                    get_position='[longitude, latitude]',
+                    get_text="village_name",
+                    get_size=14,
+                    get_color=[0, 0, 0],
+                    get_alignment_baseline="'bottom'"
+                )
+            )
+    return filtered_df, layers
 
-                        lat = lat_str
-                        lon = lon_str
 
-                    except:
-                        st.warning(f"⚠️ Invalid lat/lon format in row {idx+2}")
-                        continue
-                else:
-                    lat = lon = None
+@st.cache_resource(max_entries=2)
+def boundary_layers(show_district_labels):
+    """
+    Province and district outline layers from the bundled GeoJSON files. Returns
+    (layers, warnings) so a missing or broken file is reported on every rerun.
+    """
+    import geopandas as gpd
+    import pydeck as pdk
 
-                prov_code = PROVINCES[prov].replace("PK", "")
-                prov_pcode = f"PK{prov_code}"
+    layers, warnings = [], []
+    with span("boundary layers"):
+        try:
+            with open("data/geoBoundaries-PAK-province.geojson", "r", encoding="utf-8") as f:
+                province_geojson = json.load(f)
+            province_gdf = gpd.GeoDataFrame.from_features(province_geojson["features"])
+            province_gdf["geometry"] = province_gdf["geometry"].buffer(0)
 
-                # District (prefer predefined codes; otherwise create a new one)
-                dist_rows = df[(df["province"] == prov) & (df["district"] == dist)]
-                if not dist_rows.empty:
-                    dist_pcode = dist_rows["district_pcode"].iloc[0]
-                    dist_code = dist_pcode[-2:]
-                else:
-                    # 1) If district exists in admin_codes.py, use that code
-                    if dist in DISTRICTS:
-                        dist_pcode = DISTRICTS[dist]
-                        # sanity check: district code should match province
-                        if not dist_pcode.startswith(prov_pcode):
-                            st.warning(f"⚠️ District '{dist}' code {dist_pcode} doesn't match province {prov_pcode}. Skipping row {idx+2}.")
-                            continue
-                        dist_code = dist_pcode[-2:]
-                    else:
-                        # 2) Truly new district → generate next code based on what's already in df for this province
-                        existing_pcodes = (
-                            df.loc[df["province_pcode"] == prov_pcode, "district_pcode"]
-                              .dropna().astype(str)
-                        )
-                        codes = [int(pc[-2:]) for pc in existing_pcodes if pc[-2:].isdigit()]
-                        next_code = (max(codes) + 1) if codes else 1
-                        dist_code = str(next_code).zfill(2)
-                        dist_pcode = f"{prov_pcode}{dist_code}"
-
-                    # Ensure a minimal district row exists so later rows in this same import see it
-                    if df[df["district_pcode"] == dist_pcode].empty:
-                        df = pd.concat([df, pd.DataFrame([{
-                            "province": prov,
-                            "province_code": prov_code,
-                            "province_pcode": prov_pcode,
-                            "district": dist,
-                            "district_code": dist_code,
-                            "district_pcode": dist_pcode
-                        }])], ignore_index=True)
-
-                # Tehsil
-                teh_rows = df[(df["district_pcode"] == dist_pcode) & (df["tehsil"] == teh)]
-                if not teh_rows.empty:
-                    teh_pcode = teh_rows["tehsil_pcode"].iloc[0]
-                    teh_code = teh_pcode[-2:]
-                else:
-                    existing_tehsils = df[df["district_pcode"] == dist_pcode]["tehsil_code"].dropna().astype(str)
-                    next_teh = max([int(t) for t in existing_tehsils if t.isdigit()] + [0]) + 1
-                    teh_code = str(next_teh).zfill(2)
-                    teh_pcode = f"{dist_pcode}{teh_code}"
-
-                # UC
-                uc_rows = df[(df["tehsil_pcode"] == teh_pcode) & (df["uc"] == uc)]
-                if not uc_rows.empty:
-                    uc_id = uc_rows["uc_id"].iloc[0]
-                    uc_prefix = uc_rows["uc_prefix"].iloc[0]
-                else:
-                    uc_ids = df[df["tehsil_pcode"] == teh_pcode]["uc_id"].dropna().astype(str).str.zfill(3)
-                    next_uc = max([int(uid) for uid in uc_ids if uid.isdigit()] + [0]) + 1
-                    uc_id = str(next_uc).zfill(3)
-                    uc_prefix = f"{teh_pcode}{uc_id}"
-
-                # Village
-                suffixes = df[df["uc_prefix"] == uc_prefix]["village/settlement_code"].dropna().astype(int).tolist()
-                next_suffix = max(suffixes, default=0) + 1
-                village_code = str(next_suffix).zfill(3)
-                village_pcode = f"{uc_prefix}{village_code}"
-
-                new_row = {
-                    "province": prov,
-                    "province_code": prov_code,
-                    "province_pcode": prov_pcode,
-                    "district": dist,
-                    "district_code": dist_code,
-                    "district_pcode": dist_pcode,
-                    "tehsil": teh,
-                    "tehsil_code": teh_code,
-                    "tehsil_pcode": teh_pcode,
-                    "uc": uc,
-                    "uc_id": uc_id,
-                    "uc/vc/nc_pcode": uc_prefix,
-                    "uc_prefix": uc_prefix,
-                    "village_name": vill,
-                    "village/settlement_code": village_code,
-                    "village_pcode_new": village_pcode,
-                    "latitude": lat,
-                    "longitude": lon,
-                    "remarks": f"bulk imported on {datetime.today().strftime('%Y-%m-%d')}"
-                }
-
-                df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                new_rows.append((vill, village_pcode))
-
-                # Progress bar
-                progress = (idx + 1) / total
-                progress_bar.progress(progress, text=f"Processing village {idx + 1} of {total}")
-
-            progress_bar.empty()
-
-            if new_rows:
-                df = format_code_columns(df)
-                df.to_excel("data/village_masterlist.xlsx", index=False, sheet_name="Masterlist")
-                st.success(f"✅ Imported {len(new_rows)} villages.")
-                for name, pcode in new_rows:
-                    st.write(f"🟢 {name} → {pcode}")
-            else:
-                st.info("ℹ️ No valid villages were imported.")
+            layers.append(
+                pdk.Layer(
+                    "GeoJsonLayer",
+                    data=province_gdf.__geo_interface__,
+                    stroked=True,
+                    filled=False,
+                    get_line_color=[0, 128, 255],
+                    get_line_width=30,
+                    line_width_min_pixels=1.5
+                )
+            )
+        except Exception as e:
+            warnings.append(f"⚠️ Province boundary error: {e}")
 
-import pandas as pd
-from io import BytesIO
-import streamlit as st
-import pydeck as pdk
-import geopandas as gpd
-import json
-import re
+        try:
+            with open("data/geoBoundaries-PAK-ADM2 (1)district.geojson", "r", encoding="utf-8") as f:
+                district_geojson = json.load(f)
 
-# Begin Tab 6 logic
-with tab6:
-    st.header("🗺️ Villages Map Viewer")
+            layers.append(
+                pdk.Layer(
+                    "GeoJsonLayer",
+                    data=district_geojson,
+                    stroked=True,
+                    filled=False,
+                    get_line_color=[0, 255, 0],
+                    get_line_width=2,
+                    line_width_min_pixels=1
+                )
+            )
+
+            if show_district_labels:
+                district_gdf = gpd.GeoDataFrame.from_features(district_geojson["features"])
+                district_gdf["lon"] = district_gdf.geometry.centroid.x
+                district_gdf["lat"] = district_gdf.geometry.centroid.y
+                district_gdf["name"] = district_gdf["shapeName"] if "shapeName" in district_gdf.columns else district_gdf.iloc[:, 0]
+
+                layers.append(
+                    pdk.Layer(
+                        "TextLayer",
+                        data=pd.DataFrame(district_gdf[["lon", "lat", "name"]]),
+                        get_position='[lon, lat]',
+                        get_text="name",
+                        get_size=12,
+                        get_color=[0, 100, 0],
+                        get_alignment_baseline="'top'"
+                    )
+                )
+        except Exception as e:
+            warnings.append(f"⚠️ District boundary error: {e}")
+    return layers, warnings
 
-    def clean_coordinate_strict(val):
-        try:
-            val = str(val).strip()
-            val = re.sub(r"[^\d\.\-]+", "", val)
-            return float(val)
-        except:
-            return None
 
-    df["latitude"] = df["latitude"].apply(clean_coordinate_strict)
-    df["longitude"] = df["longitude"].apply(clean_coordinate_strict)
+# TAB 6: Map
+def show_map(df):
+    # pydeck is only needed here, so it loads on the first map view
+    import pydeck as pdk
 
-    geo_df = df.dropna(subset=["latitude", "longitude"])
-    geo_df = geo_df[
-        (geo_df["latitude"].between(23, 37)) &
-        (geo_df["longitude"].between(60, 77))
-    ]
+    st.header("🗺️ Villages Map Viewer")
+
+    version, frame = get_watcher().snapshot()
+    geo_df, duplicate_points, duplicate_count = map_points(frame, version)
 
     if "tab6_province" not in st.session_state:
         st.session_state["tab6_province"] = "All"
@@ -651,6 +956,9 @@ with tab6:
     with col3:
         show_village_labels = st.checkbox("📝 Show Village Names", value=False)
         show_district_labels = st.checkbox("🏷️ Show District Names", value=False)
+        show_uc_boundaries = st.checkbox("🔷 Show UC Boundaries", value=False,
+                                         disabled=len(get_boundaries()) == 0,
+                                         help="UC polygons saved from KML uploads")
 
     if st.button("🔄 Reset Filters"):
         st.session_state["tab6_province"] = "All"
@@ -661,11 +969,7 @@ with tab6:
     st.session_state["tab6_province"] = selected_prov
     st.session_state["tab6_district"] = selected_dist
 
-    filtered_df = geo_df.copy()
-    if selected_prov != "All":
-        filtered_df = filtered_df[filtered_df["province"] == selected_prov]
-    if selected_dist != "All":
-        filtered_df = filtered_df[filtered_df["district"] == selected_dist]
+    filtered_df, point_layers = village_layers(frame, version, selected_prov, selected_dist, show_village_labels)
 
     colA, colB = st.columns([1.5, 5])
     with colA:
@@ -677,6 +981,7 @@ with tab6:
         - 🔴 Red Dots: Villages  
         - <span style='color:blue;'>───</span> Province Boundaries  
         - <span style='color:green;'>───</span> District Boundaries  
+        - <span style='color:purple;'>───</span> UC Boundaries (saved from KML uploads)  
         """, unsafe_allow_html=True)
 
     if not filtered_df.empty:
@@ -724,101 +1029,37 @@ with tab6:
     else:
         map_style = selected_style_value
 
-    # Village points
-    layers.append(
-        pdk.Layer(
-            "ScatterplotLayer",
-            data=filtered_df,
-            get_position='[longitude, latitude]',
-            get_fill_color=[255, 0, 0],
-            pickable=True,
-            radius_scale=10,
-            radius_min_pixels=4,
-            radius_max_pixels=12,
-            get_radius=100
-        )
-    )
-
-    if show_village_labels:
-        layers.append(
-            pdk.Layer(
-                "TextLayer",
-                data=filtered_df,
-                get_position='[longitude, latitude]',
-                get_text="village_name",
-                get_size=14,
-                get_color=[0, 0, 0],
-                get_alignment_baseline="'bottom'"
-            )
-        )
+    layers.extend(point_layers)
 
-    try:
-        with open("data/geoBoundaries-PAK-province.geojson", "r", encoding="utf-8") as f:
-            province_geojson = json.load(f)
-        province_gdf = gpd.GeoDataFrame.from_features(province_geojson["features"])
-        province_gdf["geometry"] = province_gdf["geometry"].buffer(0)
+    outlines, outline_warnings = boundary_layers(show_district_labels)
+    layers.extend(outlines)
+    for warning in outline_warnings:
+        st.warning(warning)
 
+    if show_uc_boundaries:
+        uc_geojson = get_boundaries().to_geojson(filtered_df["uc_prefix"].dropna().unique())
         layers.append(
             pdk.Layer(
                 "GeoJsonLayer",
-                data=province_gdf.__geo_interface__,
+                data=uc_geojson,
                 stroked=True,
-                filled=False,
-                get_line_color=[0, 128, 255],
-                get_line_width=30,
-                line_width_min_pixels=1.5
-            )
-        )
-    except Exception as e:
-        st.warning(f"⚠️ Province boundary error: {e}")
-
-    try:
-        with open("data/geoBoundaries-PAK-ADM2 (1)district.geojson", "r", encoding="utf-8") as f:
-            district_geojson = json.load(f)
-
-        layers.append(
-            pdk.Layer(
-                "GeoJsonLayer",
-                data=district_geojson,
-                stroked=True,
-                filled=False,
-                get_line_color=[0, 255, 0],
+                filled=True,
+                get_fill_color=[128, 0, 128, 25],
+                get_line_color=[128, 0, 128],
                 get_line_width=2,
                 line_width_min_pixels=1
             )
         )
 
-        if show_district_labels:
-            district_gdf = gpd.GeoDataFrame.from_features(district_geojson["features"])
-            district_gdf["lon"] = district_gdf.geometry.centroid.x
-            district_gdf["lat"] = district_gdf.geometry.centroid.y
-            district_gdf["name"] = district_gdf["shapeName"] if "shapeName" in district_gdf.columns else district_gdf.iloc[:, 0]
-
-            layers.append(
-                pdk.Layer(
-                    "TextLayer",
-                    data=district_gdf,
-                    get_position='[lon, lat]',
-                    get_text="name",
-                    get_size=12,
-                    get_color=[0, 100, 0],
-                    get_alignment_baseline="'top'"
-                )
-            )
-    except Exception as e:
-        st.warning(f"⚠️ District boundary error: {e}")
-
-    st.pydeck_chart(pdk.Deck(
-        map_style=map_style,
-        initial_view_state=view_state,
-        layers=layers,
-        tooltip={"text": "Village: {village_name}\nDistrict: {district}"}
-    ), use_container_width=True, height=750)
+    with span("pydeck"):
+        st.pydeck_chart(pdk.Deck(
+            map_style=map_style,
+            initial_view_state=view_state,
+            layers=layers,
+            tooltip={"text": "Village: {village_name}\nDistrict: {district}"}
+        ), use_container_width=True, height=750)
 
     st.subheader("📌 Duplicate Village Points")
-    duplicate_points = geo_df[geo_df.duplicated(subset=["latitude", "longitude"], keep=False)]
-    duplicate_count = duplicate_points.groupby(["latitude", "longitude"]).ngroups
-
     st.markdown(f"**🔁 Duplicate Locations Found:** `{duplicate_count}`")
     if duplicate_count > 0:
         st.dataframe(duplicate_points.reset_index(drop=True))
@@ -834,90 +1075,22 @@ with tab6:
         st.info("No exact duplicate coordinates found.")
 
 
-#TAB 7 CODE HERE
-with tab7:
+# TAB 7: KML Upload
+def show_kml_upload(df):
     import io
-    import re
-    import os
-    import zipfile
-    import tempfile
-    from xml.dom import minidom
+    import xml.etree.ElementTree as ET
+    from app.boundaries import match_boundaries
+    from app.kml_parser import parse_kml
 
     st.header("📂 KML Upload & Merge")
     uploaded_kmls = st.file_uploader("Upload KML files", type=["kml"], accept_multiple_files=True)
 
-    from data.admin_codes import PROVINCES, DISTRICTS
-    from app.code_generator import generate_tehsil_code, generate_uc_code
-    from datetime import datetime
-
-    def extract_text_from_description(desc_html):
-        fields = {"Province": "", "District": "", "Tehsil": "", "UC": ""}
-        rows = re.findall(r'<td[^>]*>(.*?)</td>', desc_html)
-        for i in range(len(rows) - 1):
-            label = rows[i].strip().lower()
-            value = rows[i + 1].strip()
-            if value.isdigit():
-                continue
-            if "province" in label:
-                fields["Province"] = value
-            elif "district" in label:
-                fields["District"] = value
-            elif "tehsil" in label:
-                fields["Tehsil"] = value
-            elif "uc" in label or "union council" in label:
-                fields["UC"] = value
-        return fields
-
     def parse_kml_file(file):
-        village_data = []
-        boundary_data = []
         try:
-            xmldoc = minidom.parse(file)
-            placemarks = xmldoc.getElementsByTagName("Placemark")
-            fallback_admin = None
-
-            for placemark in placemarks:
-                name_node = placemark.getElementsByTagName("name")
-                coords_node = placemark.getElementsByTagName("coordinates")
-                desc_node = placemark.getElementsByTagName("description")
-
-                if not name_node or not coords_node or not coords_node[0].firstChild:
-                    continue
-
-                name = name_node[0].firstChild.nodeValue.strip()
-                coords_text = coords_node[0].firstChild.nodeValue.strip()
-                coords_split = coords_text.split()
-
-                if desc_node and desc_node[0].firstChild:
-                    desc_html = desc_node[0].firstChild.nodeValue
-                    admin_fields = extract_text_from_description(desc_html)
-                    if not fallback_admin and all(admin_fields.values()):
-                        fallback_admin = admin_fields
-                else:
-                    admin_fields = fallback_admin or {"Province": "", "District": "", "Tehsil": "", "UC": ""}
-
-                if len(coords_split) == 1:
-                    lon, lat, *_ = coords_split[0].split(',')
-                    village_data.append({
-                        "File": file.name,
-                        "Country": "Pakistan",
-                        "Province": admin_fields.get("Province", ""),
-                        "District": admin_fields.get("District", ""),
-                        "Tehsil": admin_fields.get("Tehsil", ""),
-                        "UC": admin_fields.get("UC", ""),
-                        "Village Name": name,
-                        "Latitude": float(lat),
-                        "Longitude": float(lon)
-                    })
-                else:
-                    boundary_data.append({
-                        "Name": name,
-                        "Description": desc_node[0].firstChild.nodeValue if desc_node and desc_node[0].firstChild else "",
-                        "Coordinates": coords_split
-                    })
-        except Exception as e:
+            return parse_kml(file, file.name)
+        except (ET.ParseError, ValueError) as e:
             st.error(f"❌ Failed to parse {file.name}: {e}")
-        return village_data, boundary_data
+            return [], []
 
     def write_combined_kml(villages, boundaries):
         kml_buffer = io.StringIO()
@@ -958,7 +1131,8 @@ with tab7:
 
     if uploaded_kmls and st.button("📥 Process Files"):
         for file in uploaded_kmls:
-            villages, boundaries = parse_kml_file(file)
+            with span(f"parse {file.name}"):
+                villages, boundaries = parse_kml_file(file)
             if villages:
                 df_v = pd.DataFrame(villages)
                 csv_outputs[file.name.replace(".kml", "_villages.csv")] = df_v.to_csv(index=False).encode("utf-8")
@@ -968,6 +1142,24 @@ with tab7:
         if all_villages:
             st.session_state["parsed_kml_villages"] = all_villages
             st.success(f"✅ Processed {len(uploaded_kmls)} KML file(s).")
+        st.session_state["parsed_kml_boundaries"] = all_boundaries
+        with span("match boundaries"):
+            st.session_state["kml_boundary_matches"] = match_boundaries(all_boundaries, df, NameResolver(registry))
+
+    all_boundaries = st.session_state.get("parsed_kml_boundaries", [])
+
+    # UC boundary polygons are kept per uc_prefix for the map and containment checks
+    boundary_matches = st.session_state.get("kml_boundary_matches")
+    if boundary_matches:
+        st.subheader("🔷 UC Boundaries")
+        st.dataframe(pd.DataFrame([{k: v for k, v in m.items() if k != "geometry"} for m in boundary_matches]),
+                     use_container_width=True)
+        matched = [m for m in boundary_matches if m["uc_prefix"]]
+        st.caption(f"{len(matched)} of {len(boundary_matches)} polygons matched to a UC "
+                   f"({len(get_boundaries())} UC boundaries stored).")
+        if matched and st.button("💾 Save UC Boundaries"):
+            saved = get_boundaries().save(matched)
+            st.success(f"✅ Saved {saved} UC boundaries.")
 
     # Step 2: Show preview & allow download + import
     if "parsed_kml_villages" in st.session_state:
@@ -975,91 +1167,81 @@ with tab7:
 
         # Downloads (moved above success message)
         st.subheader("⬇️ Download Outputs")
-        merged_csv = import_df.to_csv(index=False).encode("utf-8")
-        merged_kml = write_combined_kml(st.session_state["parsed_kml_villages"], all_boundaries)
+        with span("merged outputs"):
+            merged_csv = import_df.to_csv(index=False).encode("utf-8")
+            merged_kml = write_combined_kml(st.session_state["parsed_kml_villages"], all_boundaries)
 
         st.download_button("📄 Download Merged CSV", merged_csv, "kml_villages.csv", mime="text/csv")
         st.download_button("🌐 Download Combined KML", merged_kml, "kml_output.kml", mime="application/vnd.google-earth.kml+xml")
 
+        kml_rows = import_df.rename(columns={
+            "Province": "province", "District": "district", "Tehsil": "tehsil", "UC": "uc",
+            "Village Name": "village_name", "Latitude": "latitude", "Longitude": "longitude"
+        })
+        kml_rows, name_report = resolve_upload(kml_rows, registry.version, get_boundaries().version)
+
         st.subheader("📋 Preview Extracted Villages")
         st.dataframe(import_df)
+        show_name_corrections(name_report)
 
         if st.button("➕ Add Extracted Villages to Masterlist"):
-            new_rows = []
-            for idx, row in import_df.iterrows():
-                prov = row["Province"].strip()
-                dist = row["District"].strip()
-                teh = row["Tehsil"].strip()
-                uc = row["UC"].strip()
-                vill = row["Village Name"].strip()
-                lat = row["Latitude"]
-                lon = row["Longitude"]
-
-                if not all([prov, dist, teh, uc, vill]):
-                    continue
-
-                if prov not in PROVINCES or dist not in DISTRICTS:
-                    st.warning(f"⚠️ Invalid province/district in row {idx+1}: {prov}, {dist}")
-                    continue
-
-                prov_code = PROVINCES[prov].replace("PK", "")
-                prov_pcode = f"PK{prov_code}"
-                dist_pcode = DISTRICTS[dist]
-                dist_code = dist_pcode[-2:]
-
-                # Tehsil
-                teh_rows = df[(df["district_pcode"] == dist_pcode) & (df["tehsil"] == teh)]
-                if not teh_rows.empty:
-                    teh_pcode = teh_rows["tehsil_pcode"].iloc[0]
-                    teh_code = teh_pcode[-2:]
-                else:
-                    teh_code = generate_tehsil_code(df, dist_pcode)[-2:]
-                    teh_pcode = f"{dist_pcode}{teh_code}"
-
-                # UC
-                uc_rows = df[(df["tehsil_pcode"] == teh_pcode) & (df["uc"] == uc)]
-                if not uc_rows.empty:
-                    uc_id = uc_rows["uc_id"].iloc[0]
-                    uc_prefix = uc_rows["uc_prefix"].iloc[0]
-                else:
-                    uc_id = generate_uc_code(df, teh_pcode)[-3:]
-                    uc_prefix = f"{teh_pcode}{uc_id}"
-
-                # Village
-                suffixes = df[df["uc_prefix"] == uc_prefix]["village/settlement_code"].dropna().astype(int).tolist()
-                next_suffix = max(suffixes, default=0) + 1
-                village_code = str(next_suffix).zfill(3)
-                village_pcode = f"{uc_prefix}{village_code}"
-
-                new_row = {
-                    "province": prov,
-                    "province_code": prov_code,
-                    "province_pcode": prov_pcode,
-                    "district": dist,
-                    "district_code": dist_code,
-                    "district_pcode": dist_pcode,
-                    "tehsil": teh,
-                    "tehsil_code": teh_code,
-                    "tehsil_pcode": teh_pcode,
-                    "uc": uc,
-                    "uc_id": uc_id,
-                    "uc/vc/nc_pcode": uc_prefix,
-                    "uc_prefix": uc_prefix,
-                    "village_name": vill,
-                    "village/settlement_code": village_code,
-                    "village_pcode_new": village_pcode,
-                    "latitude": lat,
-                    "longitude": lon,
-                    "remarks": f"from KML on {datetime.today().strftime('%Y-%m-%d')}"
-                }
-
-                df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                new_rows.append((vill, village_pcode))
-
-            if new_rows:
-                df = format_code_columns(df)
-                df.to_excel("data/village_masterlist.xlsx", index=False, sheet_name="Masterlist")
-                st.success(f"✅ {len(new_rows)} villages added to masterlist.")
-                for name, pcode in new_rows:
+            rejected_lookup = get_rejections().lookup_names(import_df["Village Name"])
+
+            def import_kml_villages(frame):
+                importer = VillageImporter(
+                    frame,
+                    remarks="from KML",
+                    allow_new_districts=False,
+                    validate_coords=False,
+                    rejected_lookup=rejected_lookup,
+                    leases=get_leases()
+                )
+                importer.add_frame(kml_rows, first_row_no=1)
+                if not importer.added:
+                    return None, importer
+                get_leases().mark_used(importer.lease_used)
+                return importer.apply(frame), importer
+
+            importer = commit(import_kml_villages)
+
+            for message in importer.warnings:
+                st.warning(message)
+
+            if importer.skipped_rejected:
+                st.info(f"⏭️ Skipped {len(importer.skipped_rejected)} previously rejected villages: "
+                        + ", ".join(f"{name} ({uc})" for name, uc in importer.skipped_rejected[:20]))
+
+            if importer.added:
+                st.success(f"✅ {len(importer.added)} villages added to masterlist.")
+                for name, pcode in importer.added:
                     st.write(f"🟢 {name} → {pcode}")
 
+# Only the selected view runs on a rerun (st.tabs would run all seven), so the map and
+# KML views' geo libraries and per-rerun work are skipped until one of them is opened
+VIEWS = {
+    "➕ Add Village": show_add_village,
+    "➕ Add UC / Tehsil / District": show_add_admin_unit,
+    "🛑 Mark Deletion": show_mark_deletion,
+    "📄 View Data": show_view_data,
+    "📥 Bulk Import": show_bulk_import,
+    "🗺️ View on a Map": show_map,
+    "📂 KML Upload & Merge": show_kml_upload,
+}
+VIEW_SLUGS = {func.__name__.removeprefix("show_"): label for label, func in VIEWS.items()}
+
+if "view" not in st.session_state:
+    # ?view=map etc. opens a view directly
+    st.session_state["view"] = VIEW_SLUGS.get(st.query_params.get("view"), next(iter(VIEWS)))
+view = st.radio("View", list(VIEWS), key="view", horizontal=True, label_visibility="collapsed")
+st.query_params["view"] = VIEWS[view].__name__.removeprefix("show_")
+
+try:
+    with span(view):
+        VIEWS[view](df)
+finally:
+    # Also on errors and st.rerun(), so the rerun always releases memory tracing
+    if profiler:
+        profiler.finish()
+
+if profiler:
+    show_profiling_panel(profiler)
@@ -0,0 +1,41 @@
+# tests/conftest.py
+#
+# Shared fixtures: a small synthetic masterlist (benchmarks/synthetic.py) written to a
+# temporary workbook, so tests never touch data/.
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from synthetic import make_masterlist, write_masterlist  # noqa: E402
+
+from app.data_writer import save_masterlist  # noqa: E402
+from app.watcher import MasterlistWatcher  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def synthetic_frame():
+    return make_masterlist(300, seed=1, villages_per_uc=20, realistic_coordinates=False)
+
+
+@pytest.fixture
+def masterlist_path(tmp_path, synthetic_frame):
+    path = str(tmp_path / "masterlist.xlsx")
+    write_masterlist(synthetic_frame, path)
+    return path
+
+
+@pytest.fixture
+def watcher(masterlist_path):
+    watcher = MasterlistWatcher(masterlist_path)
+    watcher.check()
+    return watcher
+
+
+def save_without_snapshot(df, file_path):
+    return save_masterlist(df, file_path, snapshot=False)
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.api import ApiError, VillageService
+from app.commit_queue import CommitQueue
+from app.leases import LeaseStore
+
+from conftest import save_without_snapshot
+
+
+@pytest.fixture
+def service(tmp_path, watcher, masterlist_path):
+    service = VillageService(masterlist_path, watcher=watcher,
+                             commit_queue=CommitQueue(watcher, save=save_without_snapshot, coalesce=0),
+                             leases=LeaseStore(str(tmp_path / "approvals.db")))
+    asyncio.run(service.start())
+    yield service
+    asyncio.run(service.stop())
+
+
+def test_lookup_decodes_path_segments(service, watcher):
+    code = watcher.frame["village_pcode_new"].iloc[0]
+    status, payload = asyncio.run(service.handle("GET", "/villages/%" + format(ord(code[0]), "X") + code[1:]))
+    assert status == 200
+    assert payload["village_pcode_new"] == code
+
+
+def test_insert_into_a_uc_that_disappeared_is_a_conflict(service, watcher):
+    uc_prefix = watcher.frame["uc_prefix"].iloc[0]
+    villages = [service._validate_village({"uc_prefix": uc_prefix, "village_name": "Late"})]
+    frame = watcher.frame[watcher.frame["uc_prefix"] != uc_prefix]
+    with pytest.raises(ApiError) as exc:
+        service._insert(frame, villages)
+    assert exc.value.status == 409
+
+
+def test_reserved_codes_are_inserted_once(service, watcher):
+    uc_prefix = watcher.frame["uc_prefix"].iloc[0]
+    status, reserved = asyncio.run(service.handle("POST", "/reservations", b'{"uc_prefix": "%s", "count": 2}' % uc_prefix.encode()))
+    assert status == 201
+    code = reserved["codes"][0]
+    body = b'{"villages": [{"uc_prefix": "%s", "village_name": "Reserved", "village_pcode_new": "%s"}]}' % (
+        uc_prefix.encode(), code.encode())
+    assert asyncio.run(service.handle("POST", "/villages", body))[0] == 201
+    status, payload = asyncio.run(service.handle("POST", "/villages", body))
+    assert status == 400 and "already been used" in payload["error"]
+    assert asyncio.run(service.handle("GET", f"/villages/{code}"))[1]["village_name"] == "Reserved"
+
+
+def test_lease_usage_is_recorded_even_if_the_save_fails(tmp_path, watcher, masterlist_path):
+    def failing_save(df, file_path):
+        raise OSError("disk full")
+
+    service = VillageService(masterlist_path, watcher=watcher,
+                             commit_queue=CommitQueue(watcher, save=failing_save, coalesce=0),
+                             leases=LeaseStore(str(tmp_path / "approvals.db")))
+    asyncio.run(service.start())
+    uc_prefix = watcher.frame["uc_prefix"].iloc[0]
+    _, reserved = asyncio.run(service.handle("POST", "/reservations", b'{"uc_prefix": "%s"}' % uc_prefix.encode()))
+    body = b'{"villages": [{"uc_prefix": "%s", "village_name": "Lost", "village_pcode_new": "%s"}]}' % (
+        uc_prefix.encode(), reserved["codes"][0].encode())
+    assert asyncio.run(service.handle("POST", "/villages", body))[0] == 500
+    asyncio.run(service.stop())
+    assert service.leases.active(uc_prefix)[0]["used"] == 1
@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app.approval_queue import ApprovalQueue
+from app.commit_queue import CommitQueue
+
+from conftest import save_without_snapshot
+
+
+def submission(frame, i):
+    row = frame.iloc[0].to_dict()
+    code = str(900 + i)
+    row.update({
+        "village_name": f"Submitted {i}",
+        "village/settlement_code": code,
+        "village_pcode_new": row["uc_prefix"] + code,
+        "enumerator": "team a" if i % 2 else "team b",
+    })
+    return row
+
+
+@pytest.fixture
+def approvals(tmp_path):
+    return ApprovalQueue(str(tmp_path / "approvals.db"))
+
+
+def test_concurrent_approvals_append_each_row_once(approvals, watcher):
+    ids = approvals.submit([submission(watcher.frame, i) for i in range(4)])
+    before = len(watcher.frame)
+    queue = CommitQueue(watcher, save=save_without_snapshot, coalesce=0.05).start()
+    counts = []
+    threads = [threading.Thread(target=lambda: counts.append(approvals.approve(ids, queue.commit)))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue.stop()
+
+    assert sorted(counts) == [0, 0, 0, 4]
+    assert len(watcher.frame) == before + 4
+    assert approvals.count("approved") == 4
+    assert approvals.count("pending") == 0
+
+
+def test_failed_commit_returns_rows_to_pending(approvals, watcher):
+    ids = approvals.submit([submission(watcher.frame, i) for i in range(2)])
+
+    def failing_commit(mutation):
+        raise OSError("workbook is locked")
+
+    with pytest.raises(OSError):
+        approvals.approve(ids, failing_commit)
+    assert approvals.count("pending") == 2
+    assert approvals.count("approving") == 0
+
+
+def test_bulk_approve_skips_rows_decided_meanwhile(approvals, watcher):
+    ids = approvals.submit([submission(watcher.frame, i) for i in range(6)])
+    assert approvals.reject(ids[:2], note="duplicate") == 2
+    queue = CommitQueue(watcher, save=save_without_snapshot, coalesce=0).start()
+    assert approvals.bulk_approve({}, queue.commit) == 4
+    queue.stop()
+    assert approvals.count("approved") == 4
+    assert approvals.count("rejected") == 2
+
+
+def test_bulk_reject_records_history_once(approvals, watcher):
+    approvals.submit([submission(watcher.frame, i) for i in range(4)])
+    assert approvals.bulk_reject({"enumerator": "team a"}, note="out of area") == 2
+    assert approvals.bulk_reject({"enumerator": "team a"}) == 0
+    assert approvals.history.count() == 2
+    uc_prefix = watcher.frame["uc_prefix"].iloc[0]
+    assert approvals.history.is_rejected("Submitted 1", uc_prefix)
+    assert not approvals.history.is_rejected("Submitted 0", uc_prefix)
+
+
+def test_stale_claims_return_to_pending_on_open(tmp_path, watcher):
+    path = str(tmp_path / "approvals.db")
+    crashed = ApprovalQueue(path)
+    crashed.submit([submission(watcher.frame, i) for i in range(3)])
+    # Claimed, then the process died before releasing
+    crashed._claim("1", [])
+    assert crashed.count("approving") == 3
+
+    assert ApprovalQueue(path).count("approving") == 3
+    reopened = ApprovalQueue(path, claim_timeout=0)
+    assert reopened.count("pending") == 3
+    assert reopened.count("approving") == 0
+
+
+def test_old_databases_get_the_claim_column(tmp_path):
+    path = str(tmp_path / "approvals.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE submissions (id INTEGER PRIMARY KEY AUTOINCREMENT, status TEXT NOT NULL DEFAULT 'pending', "
+                 "submitted_at TEXT NOT NULL, decided_at TEXT, note TEXT, enumerator TEXT, province TEXT, district TEXT, "
+                 "tehsil TEXT, uc TEXT, uc_prefix TEXT, village_name TEXT, latitude REAL, longitude REAL, payload TEXT NOT NULL)")
+    conn.execute("INSERT INTO submissions (status, submitted_at, note, payload) VALUES ('approving', '2024-01-01', 'x', '{}')")
+    conn.commit()
+    conn.close()
+
+    assert ApprovalQueue(path).count("pending") == 1
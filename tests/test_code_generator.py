@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from app.code_generator import MAX_SUFFIX, generate_village_code, generate_village_codes
+
+
+def uc_frame(suffixes, uc_prefix="PK10101001"):
+    return pd.DataFrame({
+        "uc_prefix": uc_prefix,
+        "village/settlement_code": [str(s).zfill(3) for s in suffixes],
+    })
+
+
+def test_next_code_continues_after_highest_suffix():
+    df = uc_frame([1, 2, 7])
+    assert generate_village_code(df, "PK10101001") == "PK10101001008"
+    assert generate_village_code(df, "PK10101002") == "PK10101002001"
+    assert generate_village_codes(df, "PK10101001", count=3) == [
+        "PK10101001008", "PK10101001009", "PK10101001010",
+    ]
+
+
+def test_reserved_max_is_skipped():
+    df = uc_frame([1, 2])
+    assert generate_village_code(df, "PK10101001", reserved_max=20) == "PK10101001021"
+    assert generate_village_codes(df, "PK10101001", count=2, reserved_max=20) == ["PK10101001021", "PK10101001022"]
+
+
+def test_max_policy_refuses_past_the_limit():
+    df = uc_frame([1, MAX_SUFFIX - 1])
+    with pytest.raises(ValueError, match="only 1 free"):
+        generate_village_codes(df, "PK10101001", count=2)
+
+
+def test_reuse_when_full_fills_gaps_after_the_limit():
+    df = uc_frame([1, 2, 4, MAX_SUFFIX - 1])
+    codes = generate_village_codes(df, "PK10101001", count=4, policy="reuse_when_full", exclude={5})
+    assert codes == ["PK10101001999", "PK10101001003", "PK10101001006", "PK10101001007"]
+
+
+def test_reuse_when_full_raises_when_nothing_is_free():
+    df = uc_frame(range(1, MAX_SUFFIX + 1))
+    with pytest.raises(ValueError):
+        generate_village_codes(df, "PK10101001", policy="reuse_when_full")
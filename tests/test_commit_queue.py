@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from app.commit_queue import CommitQueue
+from app.updater import add_new_village, append_villages
+from app.watcher import load_masterlist_frame
+
+from conftest import save_without_snapshot
+
+
+def add_one(uc_prefix, name):
+    def mutation(frame):
+        code = f"{uc_prefix}{int(frame.loc[frame['uc_prefix'] == uc_prefix, 'village/settlement_code'].astype(int).max()) + 1:03d}"
+        row = add_new_village(frame[frame["uc_prefix"] == uc_prefix], uc_prefix, name, code)
+        return append_villages(frame, [row]), code
+    return mutation
+
+
+def test_concurrent_commits_get_unique_codes(watcher, masterlist_path):
+    queue = CommitQueue(watcher, save=save_without_snapshot, coalesce=0.05).start()
+    uc_prefix = watcher.frame["uc_prefix"].iloc[0]
+    before = len(watcher.frame)
+    results, errors = [], []
+
+    def worker(i):
+        try:
+            results.append(queue.commit(add_one(uc_prefix, f"Concurrent {i}"), timeout=60))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue.stop()
+
+    assert not errors
+    assert len(set(results)) == 50
+    assert queue.saves < 50
+    saved = load_masterlist_frame(masterlist_path)
+    assert len(saved) == before + 50
+    assert saved["village_pcode_new"].is_unique
+
+
+def test_failing_mutation_leaves_no_edits(watcher, masterlist_path):
+    queue = CommitQueue(watcher, save=save_without_snapshot, coalesce=0.3)
+    uc_prefix = watcher.frame["uc_prefix"].iloc[0]
+
+    def half_applied(frame):
+        frame.loc[:, "remarks"] = "should not be saved"
+        frame.loc[frame.index[0], "village_name"] = "Half applied"
+        raise ValueError("invalid change")
+
+    # submit() starts the writer, which waits out the 0.3 s coalescing window,
+    # so all three land in one batch
+    good_before = queue.submit(add_one(uc_prefix, "Before"))
+    bad = queue.submit(half_applied)
+    good_after = queue.submit(add_one(uc_prefix, "After"))
+    queue.stop()
+
+    with pytest.raises(ValueError):
+        bad.result(timeout=60)
+    assert good_after.result(timeout=60) != good_before.result(timeout=60)
+    assert queue.saves == 1
+
+    saved = load_masterlist_frame(masterlist_path)
+    assert not (saved["remarks"] == "should not be saved").any()
+    assert "Half applied" not in set(saved["village_name"])
+    assert {"Before", "After"} <= set(saved["village_name"])
+    assert not (watcher.frame["remarks"] == "should not be saved").any()
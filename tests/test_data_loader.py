@@ -0,0 +1,19 @@
+import warnings
+
+from synthetic import write_masterlist
+
+from app.data_loader import load_and_clean_data
+
+
+def test_text_columns_are_stripped(tmp_path, synthetic_frame):
+    df = synthetic_frame.head(20).copy()
+    df.loc[0, "village_name"] = "  Padded Name "
+    df.loc[1, "district"] = " Bagh"
+    path = str(tmp_path / "masterlist.xlsx")
+    write_masterlist(df, path)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        loaded = load_and_clean_data(path)
+    assert loaded.loc[0, "village_name"] == "Padded Name"
+    assert loaded.loc[1, "district"] == "Bagh"
@@ -0,0 +1,14 @@
+import pytest
+
+from app.exporter import EXPORTERS, export_to_bytes
+
+
+@pytest.mark.parametrize("fmt", sorted(EXPORTERS))
+def test_every_format_exports_the_synthetic_masterlist(synthetic_frame, fmt):
+    assert export_to_bytes(synthetic_frame.head(50), fmt, chunk_size=20)
+
+
+@pytest.mark.parametrize("fmt", ["geojson", "kml"])
+def test_point_formats_need_coordinates(synthetic_frame, fmt):
+    with pytest.raises(ValueError, match="latitude/longitude"):
+        export_to_bytes(synthetic_frame.drop(columns=["latitude", "longitude"]), fmt)
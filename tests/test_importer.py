@@ -0,0 +1,108 @@
+import pandas as pd
+import pytest
+
+from app.importer import VillageImporter, import_file
+from app.leases import LeaseStore
+
+
+def import_row(frame, i=0, **changes):
+    source = frame.iloc[i]
+    row = {col: source[col] for col in ("province", "district", "tehsil", "uc")}
+    row.update(village_name="Imported", latitude="30.1", longitude="70.2")
+    row.update(changes)
+    return row
+
+
+def uc_max(frame, uc_prefix):
+    return int(frame.loc[frame["uc_prefix"] == uc_prefix, "village/settlement_code"].astype(int).max())
+
+
+def test_rows_in_existing_ucs_continue_their_codes(synthetic_frame):
+    uc_prefix = synthetic_frame["uc_prefix"].iloc[0]
+    importer = VillageImporter(synthetic_frame)
+    first = importer.add(import_row(synthetic_frame, village_name="One"))
+    second = importer.add(import_row(synthetic_frame, village_name="Two"))
+    top = uc_max(synthetic_frame, uc_prefix)
+    assert (first, second) == (f"{uc_prefix}{top + 1:03d}", f"{uc_prefix}{top + 2:03d}")
+
+    new_df = importer.apply(synthetic_frame)
+    assert len(new_df) == len(synthetic_frame) + 2
+    assert new_df["village_pcode_new"].is_unique
+
+
+def test_new_uc_and_tehsil_get_next_codes(synthetic_frame):
+    row = synthetic_frame.iloc[0]
+    importer = VillageImporter(synthetic_frame)
+    new_uc = importer.add(import_row(synthetic_frame, uc="Brand New UC"))
+    new_tehsil = importer.add(import_row(synthetic_frame, tehsil="Brand New Tehsil", uc="Another UC"))
+
+    ucs = synthetic_frame.loc[synthetic_frame["tehsil_pcode"] == row["tehsil_pcode"], "uc_id"].astype(int)
+    assert new_uc == f"{row['tehsil_pcode']}{ucs.max() + 1:03d}001"
+    tehsils = synthetic_frame.loc[synthetic_frame["district_pcode"] == row["district_pcode"], "tehsil_code"].astype(int)
+    assert new_tehsil == f"{row['district_pcode']}{tehsils.max() + 1:02d}001001"
+
+
+def test_invalid_and_rejected_rows_are_skipped(synthetic_frame):
+    uc_prefix = synthetic_frame["uc_prefix"].iloc[0]
+    importer = VillageImporter(synthetic_frame, rejected_lookup={"imported": {uc_prefix}})
+    assert importer.add(import_row(synthetic_frame)) is None
+    assert importer.skipped_rejected == [("Imported", uc_prefix)]
+    assert importer.add(import_row(synthetic_frame, village_name="Far away", latitude="10"), row_no=7) is None
+    assert importer.add(import_row(synthetic_frame, village_name="No province", province="Atlantis")) is None
+    assert importer.rows == []
+    assert any("row 7" in w for w in importer.warnings)
+
+
+def test_lease_codes_are_kept_and_allocation_starts_above_leases(tmp_path, synthetic_frame):
+    uc_prefix = synthetic_frame["uc_prefix"].iloc[0]
+    top = uc_max(synthetic_frame, uc_prefix)
+    leases = LeaseStore(str(tmp_path / "approvals.db"))
+    lease = leases.create("team a", uc_prefix, 3, current_max=top)
+
+    importer = VillageImporter(synthetic_frame, leases=leases)
+    leased = f"{uc_prefix}{top + 2:03d}"
+    assert importer.add(import_row(synthetic_frame, village_name="From lease", village_pcode_new=leased)) == leased
+    assert importer.add(import_row(synthetic_frame, village_name="Fresh")) == f"{uc_prefix}{top + 4:03d}"
+    # The same lease code twice is not accepted; the row gets a new code instead
+    assert importer.add(import_row(synthetic_frame, village_name="Again", village_pcode_new=leased)) == f"{uc_prefix}{top + 5:03d}"
+    assert importer.lease_used == [(lease["id"], leased)]
+
+
+@pytest.mark.parametrize("policy, expected", [("max", None), ("reuse_when_full", "001")])
+def test_full_ucs_follow_the_allocation_policy(synthetic_frame, policy, expected):
+    uc_prefix = synthetic_frame["uc_prefix"].iloc[0]
+    # Suffix 001 becomes 999: the UC is full, and 001 is free again
+    df = synthetic_frame.copy()
+    in_uc = df.index[df["uc_prefix"] == uc_prefix]
+    df.loc[in_uc[0], ["village/settlement_code", "village_pcode_new"]] = ["999", f"{uc_prefix}999"]
+
+    importer = VillageImporter(df, allocation_policy=policy)
+    code = importer.add(import_row(df, int(in_uc[0])))
+    assert (code[-3:] if code else None) == expected
+
+
+def test_import_file_streams_batches(tmp_path, synthetic_frame):
+    path = str(tmp_path / "import.csv")
+    pd.DataFrame([import_row(synthetic_frame, i * 40, village_name=f"Village {i}") for i in range(5)]).to_csv(path, index=False)
+    new_df, importer = import_file(synthetic_frame, path, batch_size=2)
+    assert len(importer.added) == 5
+    assert len(new_df) == len(synthetic_frame) + 5
+    with pytest.raises(FileNotFoundError):
+        import_file(synthetic_frame, str(tmp_path / "missing.csv"))
+
+
+def test_codes_of_expired_leases_are_still_recognised(tmp_path, synthetic_frame):
+    uc_prefix = synthetic_frame["uc_prefix"].iloc[0]
+    top = uc_max(synthetic_frame, uc_prefix)
+    leases = LeaseStore(str(tmp_path / "approvals.db"))
+    lease = leases.create("team a", uc_prefix, 3, current_max=top, days=-1)
+
+    importer = VillageImporter(synthetic_frame, leases=leases)
+    fresh = importer.add(import_row(synthetic_frame, village_name="Fresh"))
+    assert fresh == f"{uc_prefix}{top + 1:03d}"
+    # The field team used the first code of the lapsed lease too: it is taken now
+    assert importer.add(import_row(synthetic_frame, village_name="Clash", village_pcode_new=fresh)) != fresh
+    leased = f"{uc_prefix}{top + 3:03d}"
+    assert importer.add(import_row(synthetic_frame, village_name="From lease", village_pcode_new=leased)) == leased
+    assert importer.add(import_row(synthetic_frame, village_name="After")) == f"{uc_prefix}{top + 4:03d}"
+    assert importer.lease_used == [(lease["id"], leased)]
@@ -0,0 +1,60 @@
+import pytest
+
+from app.leases import LeaseStore
+
+
+@pytest.fixture
+def leases(tmp_path):
+    return LeaseStore(str(tmp_path / "approvals.db"))
+
+
+def test_leases_start_above_masterlist_and_each_other(leases):
+    first = leases.create("team a", "PK10101001", 5, current_max=12)
+    second = leases.create("team b", "PK10101001", 3, current_max=12)
+    assert (first["first_suffix"], first["last_suffix"]) == (13, 17)
+    assert (second["first_suffix"], second["last_suffix"]) == (18, 20)
+    assert leases.reserved_max("PK10101001") == 20
+    assert leases.reserved_max("PK10101002") == 0
+    assert leases.reserved_maxima() == {"PK10101001": 20}
+
+
+def test_lease_cannot_pass_the_suffix_limit(leases):
+    with pytest.raises(ValueError, match="Only 2 codes"):
+        leases.create("team a", "PK10101001", 5, current_max=997)
+    with pytest.raises(ValueError):
+        leases.create("team a", "PK10101001", 0, current_max=1)
+
+
+def test_allocate_hands_out_unused_codes_once(leases):
+    lease = leases.create("team a", "PK10101001", 3, current_max=0)
+    assert leases.allocate(lease["id"], 2) == ["PK10101001001", "PK10101001002"]
+    leases.mark_used([(lease["id"], "PK10101001003")])
+    with pytest.raises(ValueError, match="only 0 unused"):
+        leases.allocate(lease["id"])
+    assert leases.active(team="team a")[0]["used"] == 3
+
+
+def test_released_and_expired_leases_free_their_codes(leases):
+    released = leases.create("team a", "PK10101001", 3, current_max=0)
+    leases.allocate(released["id"])
+    assert leases.leased_codes() == {f"PK1010100100{i}": released["id"] for i in (1, 2, 3)}
+    assert leases.release(released["id"])
+    assert not leases.release(released["id"])
+    assert leases.reserved_max("PK10101001") == 0
+    with pytest.raises(ValueError, match="no longer active"):
+        leases.allocate(released["id"])
+
+    expired = leases.create("team b", "PK10101002", 4, current_max=0, days=-1)
+    leases.mark_used([(expired["id"], "PK10101002001")])
+    assert leases.leased_suffixes("PK10101002") == set()
+    assert leases.reclaim_expired() == 3
+
+
+def test_leased_codes_keep_field_codes_matchable(leases):
+    expired = leases.create("team a", "PK10101001", 2, current_max=0, days=-1)
+    released = leases.create("team b", "PK10101002", 3, current_max=0)
+    leases.allocate(released["id"])
+    leases.release(released["id"])
+    assert leases.leased_codes() == {
+        "PK10101001001": expired["id"], "PK10101001002": expired["id"], "PK10101002001": released["id"],
+    }
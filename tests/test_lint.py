@@ -0,0 +1,30 @@
+# Undefined names, unused imports and unreachable leftovers fail the suite instead of
+# surfacing at runtime (needs `pip install pyflakes`).
+
+import os
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+pyflakes_api = pytest.importorskip("pyflakes.api")
+from pyflakes.reporter import Reporter  # noqa: E402
+
+CHECKED = ["app", "data", "benchmarks", "tests", "streamlit_app.py", "admin_approval.py", "main.py", "fix_excel_format.py"]
+
+
+def python_files():
+    for entry in CHECKED:
+        path = os.path.join(ROOT, entry)
+        if path.endswith(".py"):
+            yield path
+            continue
+        for directory, _, names in os.walk(path):
+            yield from (os.path.join(directory, n) for n in sorted(names) if n.endswith(".py"))
+
+
+@pytest.mark.parametrize("path", sorted(python_files()), ids=lambda p: os.path.relpath(p, ROOT))
+def test_pyflakes_clean(path, capsys):
+    warnings = pyflakes_api.checkPath(path, Reporter(sys.stdout, sys.stderr))
+    assert warnings == 0, capsys.readouterr().out
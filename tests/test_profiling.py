@@ -0,0 +1,33 @@
+import tracemalloc
+
+from app.profiling import Profiler, span
+
+
+def test_memory_tracing_stops_when_the_last_session_finishes():
+    assert not tracemalloc.is_tracing()
+    first, second = Profiler(memory=True), Profiler(memory=True)
+
+    first.start()
+    second.start()
+    with span("work"):
+        data = [0] * 100_000
+    first.finish()
+    assert tracemalloc.is_tracing()
+    second.finish()
+
+    assert not tracemalloc.is_tracing()
+    assert second.reruns[-1].spans[0]["mem_delta"] > 0
+    del data
+
+
+def test_an_unfinished_rerun_does_not_keep_tracing_on():
+    profiler = Profiler(memory=True)
+    profiler.start()
+    profiler.start()
+    profiler.finish()
+
+    assert not tracemalloc.is_tracing()
+    assert len(profiler.reruns) == 1
+    with span("after"):
+        pass
+    assert profiler.reruns[0].spans == []
@@ -0,0 +1,46 @@
+import shutil
+
+from app.registry import AdminRegistry
+
+from conftest import ROOT
+
+
+def tehsil_row(registry, name, code):
+    district = registry.district_code("Bagh")
+    return {"province": "Azad Kashmir", "province_pcode": "PK1", "district": "Bagh",
+            "district_pcode": district, "tehsil": name, "tehsil_pcode": f"{district}{code}"}
+
+
+def test_syncs_from_separate_copies_keep_each_others_units(tmp_path):
+    path = str(tmp_path / "admin_registry.json")
+    shutil.copy(f"{ROOT}/data/admin_registry.json", path)
+    # Two processes (app and API) with their own copy of the registry
+    first, second = AdminRegistry(path), AdminRegistry(path)
+
+    assert first.sync([tehsil_row(first, "First Tehsil", "91")]) == 1
+    assert second.sync([tehsil_row(second, "Second Tehsil", "92")]) == 1
+    second.add(second.district_code("Bagh"), "Unsaved Tehsil", second.district_code("Bagh") + "93")
+    assert first.sync([tehsil_row(first, "Third Tehsil", "94")]) == 1
+    second.save()
+
+    saved = AdminRegistry(path)
+    bagh = saved.district_code("Bagh")
+    assert {"First Tehsil", "Second Tehsil", "Third Tehsil", "Unsaved Tehsil"} <= set(saved.child_names(bagh))
+    assert saved.version == first.version + 1
+
+
+def test_unknown_units_lists_parents_first_without_writing(tmp_path):
+    path = str(tmp_path / "admin_registry.json")
+    shutil.copy(f"{ROOT}/data/admin_registry.json", path)
+    registry = AdminRegistry(path)
+    tehsil = tehsil_row(registry, "New Tehsil", "91")
+    uc = dict(tehsil, uc="New UC", uc_prefix=f"{tehsil['tehsil_pcode']}001")
+    before = open(path).read()
+
+    units = registry.unknown_units([uc, uc, tehsil])
+
+    assert [(level, code) for level, code, _, _ in units] == [("tehsil", tehsil["tehsil_pcode"]), ("uc", uc["uc_prefix"])]
+    assert units[1][3] == tehsil["tehsil_pcode"]
+    assert open(path).read() == before
+    assert registry.sync([uc]) == 2
+    assert registry.unknown_units([uc]) == []
@@ -0,0 +1,38 @@
+import pytest
+
+from app.snapshots import list_snapshots, load_snapshot, take_snapshot
+
+
+def test_snapshot_round_trip_and_dedup(tmp_path, synthetic_frame):
+    snaps, source = str(tmp_path / "snaps"), str(tmp_path / "masterlist.xlsx")
+    first = take_snapshot(synthetic_frame, snaps, source=source)
+    assert take_snapshot(synthetic_frame, snaps, source=source) == first
+
+    edited = synthetic_frame.copy()
+    edited.loc[5, "village_name"] = "Renamed"
+    second = take_snapshot(edited, snaps, source=source)
+    assert second != first
+    assert [m["id"] for m in list_snapshots(snaps, source)] == [second, first]
+
+    restored = load_snapshot(first, snaps, source=source)
+    assert list(restored.columns) == list(synthetic_frame.columns)
+    assert (restored.fillna("").to_numpy() == synthetic_frame.fillna("").to_numpy()).all()
+    assert load_snapshot(None, snaps, source=source).loc[5, "village_name"] == "Renamed"
+
+
+def test_snapshots_are_kept_and_pruned_per_source(tmp_path, synthetic_frame):
+    snaps = str(tmp_path / "snaps")
+    main, other = str(tmp_path / "masterlist.xlsx"), str(tmp_path / "copy.xlsx")
+    take_snapshot(synthetic_frame, snaps, keep=2, source=other)
+    for i in range(3):
+        edited = synthetic_frame.copy()
+        edited.loc[0, "village_name"] = f"Edit {i}"
+        take_snapshot(edited, snaps, keep=2, source=main)
+
+    assert len(list_snapshots(snaps, main)) == 2
+    assert len(list_snapshots(snaps, other)) == 1
+    assert len(list_snapshots(snaps, None)) == 3
+    other_id = list_snapshots(snaps, other)[0]["id"]
+    assert len(load_snapshot(other_id, snaps, source=other)) == len(synthetic_frame)
+    with pytest.raises(FileNotFoundError):
+        load_snapshot(other_id, snaps, source=main)
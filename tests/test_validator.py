@@ -0,0 +1,53 @@
+from app.validator import RULES, summarise, validate_masterlist
+
+
+def rules(df):
+    return set(validate_masterlist(df)["rule"])
+
+
+def test_synthetic_masterlist_is_consistent(synthetic_frame):
+    assert validate_masterlist(synthetic_frame).empty
+
+
+def test_pcode_mismatch(synthetic_frame):
+    df = synthetic_frame.copy()
+    df.loc[3, "village/settlement_code"] = "998"
+    report = validate_masterlist(df)
+    hit = report[report["rule"] == "pcode_mismatch"]
+    assert list(hit["row"]) == [5]
+    assert hit["detail"].iloc[0] == "expected " + df.loc[3, "uc_prefix"] + "998"
+
+
+def test_hierarchy_rules(synthetic_frame):
+    df = synthetic_frame.copy()
+    df.loc[0, "tehsil_pcode"] = "PK99999"
+    df.loc[1, "district_pcode"] = "PK999"
+    df.loc[2, "province_pcode"] = "PK9"
+    assert {"uc_outside_tehsil", "tehsil_outside_district", "district_outside_province"} <= rules(df)
+
+
+def test_registry_rules(synthetic_frame):
+    df = synthetic_frame.copy()
+    df.loc[0, "district"] = "Nowhere"
+    df.loc[1, "district_pcode"] = df.loc[1, "district_pcode"][:-2] + "99"
+    found = rules(df)
+    assert {"unknown_district", "district_code_mismatch"} <= found
+
+
+def test_duplicates_and_missing(synthetic_frame):
+    df = synthetic_frame.copy()
+    df.loc[1, ["village/settlement_code", "village_pcode_new"]] = df.loc[0, ["village/settlement_code", "village_pcode_new"]].to_numpy()
+    df.loc[2, "village_pcode_new"] = None
+    report = validate_masterlist(df)
+    assert set(report.loc[report["rule"] == "duplicate_pcode", "row"]) == {2, 3}
+    assert set(report.loc[report["rule"] == "duplicate_suffix", "row"]) == {2, 3}
+    assert list(report.loc[report["rule"] == "missing_pcode", "row"]) == [4]
+
+
+def test_summarise_lists_every_rule(synthetic_frame):
+    df = synthetic_frame.copy()
+    df.loc[0, "village_pcode_new"] = "PK0"
+    summary = summarise(validate_masterlist(df))
+    assert list(summary["rule"]) == list(RULES)
+    assert summary.set_index("rule").loc["pcode_mismatch", "violations"] == 1
+    assert summary["violations"].sum() == 1
@@ -0,0 +1,42 @@
+from app.updater import append_villages
+from app.watcher import PointIndex
+
+
+def sorted_points(points):
+    return points.sort_values("village_pcode_new").reset_index(drop=True)
+
+
+def test_point_index_refreshes_changed_ucs_only(watcher):
+    index = PointIndex()
+    watcher.add_listener(index.refresh)
+    frame = watcher.frame
+    uc_prefix = frame["uc_prefix"].iloc[0]
+
+    edited = frame.copy()
+    in_uc = edited.index[edited["uc_prefix"] == uc_prefix]
+    edited.loc[in_uc[0], "latitude"] = 10.0      # now outside Pakistan
+    edited.loc[in_uc[1], "longitude"] = 70.5
+    new_row = edited.loc[in_uc[2]].to_dict()
+    new_row.update({"village_name": "New", "village_pcode_new": uc_prefix + "998", "village/settlement_code": "998"})
+    edited = append_villages(edited.drop(index=in_uc[3]), [new_row])
+    watcher.publish(edited)
+
+    assert watcher.last_diff["ucs"] == {uc_prefix}
+    published = watcher.frame
+    points = index.points_for(published)
+    assert sorted_points(points).equals(sorted_points(PointIndex._clean(published)))
+    assert edited.loc[in_uc[0], "village_pcode_new"] not in set(points["village_pcode_new"])
+
+
+def test_point_index_falls_back_for_other_frames(synthetic_frame):
+    index = PointIndex()
+    index.refresh(synthetic_frame.head(10))
+    assert len(index.points_for(synthetic_frame)) == len(PointIndex._clean(synthetic_frame))
+
+
+def test_next_code_starts_above_leases(watcher):
+    uc_prefix = watcher.frame["uc_prefix"].iloc[0]
+    top = watcher.code_index.max_suffix[uc_prefix]
+    assert watcher.code_index.next_code(uc_prefix) == f"{uc_prefix}{top + 1:03d}"
+    assert watcher.code_index.next_code(uc_prefix, reserved_max=top + 5) == f"{uc_prefix}{top + 6:03d}"
+    assert watcher.code_index.next_code("PK99999999") == "PK99999999001"